@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class DatabaseConfig(AppConfig):
+    """Project-wide database tooling: the SQLite backend, the replica router and their commands."""
+    name = 'agpkart.db'
+    label = 'agpkart_db'
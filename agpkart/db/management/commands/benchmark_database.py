@@ -0,0 +1,118 @@
+import random
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+BENCHMARK_ALIAS = 'benchmark'
+# The settings before the tuned backend: the stock engine, a connection per
+# request, deferred transactions.
+BASELINE = {'ENGINE': 'django.db.backends.sqlite3', 'CONN_MAX_AGE': 0, 'OPTIONS': {}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare read and write throughput of the stock SQLite settings with the tuned DATABASES['default'] "
+        "profile, on scratch database files, with threads mixing storefront reads and admin writes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+        parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run.")
+        parser.add_argument("--rows", type=int, default=10_000)
+        parser.add_argument("--write-ratio", type=float, default=0.1, help="Share of requests that write.")
+
+    def handle(self, *args, **options):
+        tuned = {key: settings.DATABASES['default'][key] for key in ('ENGINE', 'CONN_MAX_AGE', 'OPTIONS')}
+        directory = Path(tempfile.mkdtemp())
+        try:
+            for label, profile in (('baseline', BASELINE), ('tuned', tuned)):
+                name = directory / f'{label}.sqlite3'
+                with self._database(profile, name):
+                    self._seed(options["rows"])
+                for threads in options["threads"]:
+                    with self._database(profile, name):
+                        reads, writes, errors, elapsed = self._run(
+                            threads, options["seconds"], options["rows"], options["write_ratio"],
+                        )
+                    self.stdout.write(
+                        f"{label:<8} {threads:>2} threads  {reads / elapsed:8.0f} reads/s  "
+                        f"{writes / elapsed:7.0f} writes/s  {errors:>4} locked"
+                    )
+        finally:
+            shutil.rmtree(directory)
+
+    @contextmanager
+    def _database(self, profile, name):
+        """Make BENCHMARK_ALIAS a connection to `name` with the given profile while the block runs."""
+        # configure_settings fills in the defaults of a DATABASES entry.
+        connections.settings[BENCHMARK_ALIAS] = connections.configure_settings(
+            {'default': {**profile, 'NAME': name}}
+        )['default']
+        try:
+            yield
+        finally:
+            connections[BENCHMARK_ALIAS].close()
+            del connections[BENCHMARK_ALIAS]
+            del connections.settings[BENCHMARK_ALIAS]
+
+    def _seed(self, rows):
+        with connections[BENCHMARK_ALIAS].cursor() as cursor:
+            cursor.execute("CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT NOT NULL, stock INTEGER NOT NULL)")
+            cursor.execute("CREATE TABLE audit (id INTEGER PRIMARY KEY, item_id INTEGER NOT NULL, at REAL NOT NULL)")
+        with transaction.atomic(using=BENCHMARK_ALIAS), connections[BENCHMARK_ALIAS].cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO item (id, name, stock) VALUES (%s, %s, %s)",
+                [(pk, f"item {pk}", 100) for pk in range(1, rows + 1)],
+            )
+
+    def _run(self, threads, seconds, rows, write_ratio):
+        counts = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def client():
+            reads = writes = errors = 0
+            rng = random.Random()
+            connection = connections[BENCHMARK_ALIAS]
+            while time.perf_counter() < deadline:
+                pk = rng.randint(1, rows)
+                try:
+                    if rng.random() < write_ratio:
+                        # An admin edit: an update and an audit row in one transaction.
+                        with transaction.atomic(using=BENCHMARK_ALIAS), connection.cursor() as cursor:
+                            cursor.execute("SELECT stock FROM item WHERE id = %s", [pk])
+                            cursor.execute("UPDATE item SET stock = stock - 1 WHERE id = %s", [pk])
+                            cursor.execute("INSERT INTO audit (item_id, at) VALUES (%s, %s)", [pk, time.time()])
+                        writes += 1
+                    else:
+                        # A storefront page: a lookup and a short listing.
+                        with connection.cursor() as cursor:
+                            cursor.execute("SELECT name, stock FROM item WHERE id = %s", [pk])
+                            cursor.fetchone()
+                            cursor.execute("SELECT id, name FROM item WHERE id >= %s ORDER BY id LIMIT 20", [pk])
+                            cursor.fetchall()
+                        reads += 1
+                except OperationalError:
+                    errors += 1
+                # The end of a request: only persistent connections survive it.
+                connection.close_if_unusable_or_obsolete()
+            connection.close()
+            with lock:
+                counts['reads'] += reads
+                counts['writes'] += writes
+                counts['errors'] += errors
+
+        workers = [threading.Thread(target=client) for _ in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return counts['reads'], counts['writes'], counts['errors'], time.perf_counter() - started
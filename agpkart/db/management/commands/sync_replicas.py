@@ -0,0 +1,43 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into every alias in DATABASE_REPLICAS with the online backup API; "
+        "a stand-in for replication when developing and testing locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, help="Keep copying every this many seconds.")
+
+    def handle(self, *args, **options):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            raise CommandError("DATABASE_REPLICAS is empty.")
+        for alias in [DEFAULT_DB_ALIAS, *replicas]:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f"Database '{alias}' is not SQLite; use the server's own replication.")
+        while True:
+            started = time.perf_counter()
+            self.sync(replicas)
+            self.stdout.write(self.style.SUCCESS(
+                f"Copied the primary to {len(replicas)} replicas in {time.perf_counter() - started:.2f}s."
+            ))
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
+
+    def sync(self, replicas):
+        primary = connections[DEFAULT_DB_ALIAS]
+        primary.ensure_connection()
+        for alias in replicas:
+            # Readers reopen the file after the copy.
+            connections[alias].close()
+            with closing(sqlite3.connect(connections[alias].settings_dict['NAME'])) as target:
+                primary.connection.backup(target)
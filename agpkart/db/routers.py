@@ -0,0 +1,125 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# The job queue claims and finishes work in the same breath; a stale read
+# there runs a job twice.
+PRIMARY_ONLY_APPS = {'jobs'}
+# After a request writes, the browser's next requests read from the
+# primary for this long, so a redirect after a POST shows what was saved.
+PIN_COOKIE = 'pin_primary'
+PIN_SECONDS = 10
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class _Scope:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_scope = ContextVar('replica_scope', default=None)
+_primary_reads = ContextVar('primary_reads', default=False)
+
+
+@contextmanager
+def request_scope(pinned=False):
+    """
+    Route the block as one request: reads may go to a replica until the
+    first write, and to the primary from then on.
+    """
+    scope = _Scope(pinned)
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def pin_primary():
+    """
+    Send the rest of the current request's reads to the primary. Outside a
+    request_scope there is nothing to pin, so a command or worker thread
+    never ends up on the primary for good; one that reads back its own
+    writes opens a scope per unit of work, or uses read_from_primary().
+    """
+    scope = _scope.get()
+    if scope is not None:
+        scope.pinned = True
+        scope.wrote = True
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Send the block's reads to the primary without pinning the rest of the
+    request. For reads whose results are stored: a shared cache or derived
+    rows built from a lagging replica would outlive the lag. Also usable
+    as a decorator.
+    """
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+
+def is_pinned():
+    scope = _scope.get()
+    # Reads inside a transaction on the primary must see its own writes.
+    return (
+        (scope is not None and scope.pinned)
+        or _primary_reads.get()
+        or connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes go to the primary; reads go to a random alias from
+    settings.DATABASE_REPLICAS until the request writes, and to the primary
+    after that. With no replicas configured every query stays on default.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas or model._meta.app_label in PRIMARY_ONLY_APPS or is_pinned():
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related objects come from wherever their instance did.
+            return instance._state.db
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary along with the data.
+        return db not in getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaPinningMiddleware:
+    """
+    Give each request its own routing scope. Unsafe methods, and browsers
+    that wrote in the last PIN_SECONDS, read from the primary throughout.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+        with request_scope(pinned) as scope:
+            response = self.get_response(request)
+        if scope.wrote and getattr(settings, 'DATABASE_REPLICAS', []):
+            response.set_cookie(PIN_COOKIE, '1', max_age=PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
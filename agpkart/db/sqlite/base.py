@@ -0,0 +1,104 @@
+"""
+SQLite backend tuned for a production site: WAL and the pragmas below on
+every new connection, a bounded, backed-off retry for statements that
+still find the database locked once busy_timeout has run out, and
+transactions that begin IMMEDIATE on request (see
+agpkart.db.transactions.atomic_write) while the rest stay deferred.
+
+    DATABASES['default'] = {
+        'ENGINE': 'agpkart.db.sqlite',
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'pragmas': {'cache_size': -32000},  # merged over PRAGMAS
+            'lock_retries': 5,
+        },
+        ...
+    }
+"""
+import random
+import re
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    # Readers no longer block the writer or each other.
+    'journal_mode': 'WAL',
+    # WAL stays consistent with fsync at checkpoints only; a power cut can
+    # lose the last commits, never corrupt the file.
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,  # KiB, per connection
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+LOCK_RETRIES = 5
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 1.0
+PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+
+def is_locked(exc):
+    """Whether a sqlite3 error is lock contention: 'database is locked' or 'database table is locked'."""
+    return isinstance(exc, base.Database.OperationalError) and 'locked' in str(exc)
+
+
+def retry_delay(attempt):
+    """Exponential backoff with full jitter, so waiting writers do not retry in step."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+class RetryingCursorWrapper(base.SQLiteCursorWrapper):
+    lock_retries = LOCK_RETRIES
+
+    def execute(self, query, params=None):
+        attempt = 0
+        while True:
+            try:
+                return super().execute(query, params)
+            except base.Database.OperationalError as exc:
+                # Inside a transaction the whole transaction has to be
+                # retried, which only the caller can do.
+                if not is_locked(exc) or self.connection.in_transaction or attempt >= self.lock_retries:
+                    raise
+            time.sleep(retry_delay(attempt))
+            attempt += 1
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Set by atomic_write() for the transaction it is about to begin.
+    begin_immediate = False
+
+    def get_connection_params(self):
+        options = self.settings_dict['OPTIONS']
+        pragmas = {**PRAGMAS, **options.get('pragmas', {})}
+        for name, value in pragmas.items():
+            if not PRAGMA_NAME.match(name) or not PRAGMA_VALUE.match(str(value)):
+                raise ImproperlyConfigured(
+                    f"settings.DATABASES[{self.alias!r}]['OPTIONS']['pragmas'] has an invalid entry {name!r}: {value!r}."
+                )
+        self.pragmas = pragmas
+        self.lock_retries = options.get('lock_retries', LOCK_RETRIES)
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        kwargs.pop('lock_retries', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.begin_immediate:
+            self.cursor().execute("BEGIN IMMEDIATE")
+        else:
+            super()._start_transaction_under_autocommit()
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=RetryingCursorWrapper)
+        cursor.lock_retries = self.lock_retries
+        return cursor
@@ -0,0 +1,138 @@
+import io
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.utils import load_backend
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from agpkart.db import routers
+from agpkart.db.sqlite import base as sqlite_base
+from agpkart.db.transactions import atomic_write
+from jobs.models import Job
+from products.models import Category, Product
+
+
+class SQLiteBackendTests(TestCase):
+    def test_pragmas_on_new_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+        self.assertIsNone(connection.transaction_mode)
+
+    def test_locked_statements_retry_outside_transactions_only(self):
+        other = connections.create_connection(DEFAULT_DB_ALIAS)
+        self.addCleanup(other.close)
+        other.ensure_connection()
+        locked = sqlite_base.base.Database.OperationalError('database is locked')
+        with mock.patch.object(sqlite_base.time, 'sleep') as sleep, \
+                mock.patch.object(sqlite_base.base.SQLiteCursorWrapper, 'execute', side_effect=[locked, None]) as execute:
+            other.create_cursor().execute("SELECT 1")
+        self.assertEqual(execute.call_count, 2)
+        self.assertEqual(sleep.call_count, 1)
+
+        other.connection.execute("BEGIN")
+        self.addCleanup(other.connection.rollback)
+        with mock.patch.object(sqlite_base.base.SQLiteCursorWrapper, 'execute', side_effect=[locked, None]):
+            with self.assertRaises(sqlite_base.base.Database.OperationalError):
+                other.create_cursor().execute("SELECT 1")
+
+
+class AtomicWriteTests(TransactionTestCase):
+    def begins(self, block):
+        with CaptureQueriesContext(connection) as queries:
+            with block:
+                Category.objects.exists()
+                with atomic_write():
+                    Category.objects.exists()
+        return [q['sql'] for q in queries if q['sql'].startswith('BEGIN')]
+
+    def test_only_write_blocks_take_the_lock_at_begin(self):
+        self.assertEqual(self.begins(atomic_write()), ['BEGIN IMMEDIATE'])
+        # Nested in a plain transaction it is only a savepoint.
+        self.assertEqual(self.begins(transaction.atomic()), ['BEGIN'])
+        self.assertFalse(connection.begin_immediate)
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        overrides = self.settings(DATABASE_REPLICAS=['replica'])
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.router = routers.PrimaryReplicaRouter()
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        with routers.request_scope():
+            self.assertEqual(self.router.db_for_read(Product), 'replica')
+            self.assertEqual(self.router.db_for_read(Job), 'default')
+            self.assertEqual(self.router.db_for_write(Product), 'default')
+            self.assertEqual(self.router.db_for_read(Product), 'default')
+        with routers.request_scope():
+            self.assertEqual(self.router.db_for_read(Product), 'replica')
+        self.assertFalse(self.router.allow_migrate('replica', 'products'))
+
+    def test_writes_outside_a_request_do_not_pin_the_thread(self):
+        # A command or worker writes without a request around it; its later
+        # reads in the same thread must still be free to use a replica.
+        self.assertEqual(self.router.db_for_write(Product), 'default')
+        self.assertEqual(self.router.db_for_read(Product), 'replica')
+        with routers.request_scope():
+            self.assertEqual(self.router.db_for_read(Product), 'replica')
+
+    def test_cache_fills_read_from_the_primary_without_pinning(self):
+        with routers.request_scope() as scope:
+            with routers.read_from_primary():
+                self.assertEqual(self.router.db_for_read(Product), 'default')
+            self.assertEqual(self.router.db_for_read(Product), 'replica')
+            self.assertFalse(scope.wrote)
+
+    def test_middleware_pins_writes_and_the_requests_after_them(self):
+        def view(request):
+            if request.method == 'POST':
+                self.router.db_for_write(Product)
+            return HttpResponse(self.router.db_for_read(Product))
+
+        middleware = routers.ReplicaPinningMiddleware(view)
+        factory = RequestFactory()
+        self.assertEqual(middleware(factory.get('/')).content, b'replica')
+        posted = middleware(factory.post('/'))
+        self.assertEqual(posted.content, b'default')
+        self.assertIn(routers.PIN_COOKIE, posted.cookies)
+        following = factory.get('/')
+        following.COOKIES[routers.PIN_COOKIE] = '1'
+        self.assertEqual(middleware(following).content, b'default')
+
+
+class ReplicaReadTests(TransactionTestCase):
+    def setUp(self):
+        # An offline replica: a scratch SQLite file that sync_replicas fills.
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        replica = connections.configure_settings(
+            {'default': {'ENGINE': 'agpkart.db.sqlite', 'NAME': f'{directory}/replica.sqlite3'}}
+        )['default']
+        connections['replica'] = load_backend(replica['ENGINE']).DatabaseWrapper(replica, 'replica')
+        self.addCleanup(connections.__delitem__, 'replica')
+        self.addCleanup(connections['replica'].close)
+        overrides = self.settings(DATABASE_REPLICAS=['replica'])
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_replica_reads_until_the_request_writes(self):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        call_command('sync_replicas', stdout=io.StringIO())
+        Product.objects.create(name="Oxford", slug="oxford", category=category, base_price=20)
+
+        with routers.request_scope():
+            # The copy predates the product.
+            self.assertEqual(list(Category.objects.values_list('slug', flat=True)), ["shirts"])
+            self.assertFalse(Product.objects.filter(slug="oxford").exists())
+            Product.objects.filter(slug="oxford").update(base_price=25)
+            self.assertEqual(Product.objects.get(slug="oxford").base_price, Decimal("25.00"))
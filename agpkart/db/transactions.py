@@ -0,0 +1,28 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def atomic_write(using=None):
+    """
+    transaction.atomic() for blocks that read and then write. On SQLite the
+    outermost block begins IMMEDIATE, taking the write lock before its first
+    read: a deferred transaction that has read cannot wait for the lock when
+    it comes to write, and fails with "database is locked" as soon as
+    another writer got in first. Nested blocks, and other backends, behave
+    exactly like atomic(). Also usable as a decorator.
+    """
+    connection = transaction.get_connection(using)
+    immediate = hasattr(connection, 'begin_immediate') and not connection.in_atomic_block
+    if immediate:
+        connection.begin_immediate = True
+    try:
+        with transaction.atomic(using):
+            # BEGIN has run; later transactions go back to the default mode.
+            if immediate:
+                connection.begin_immediate = False
+            yield
+    finally:
+        if immediate:
+            connection.begin_immediate = False
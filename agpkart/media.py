@@ -0,0 +1,162 @@
+import mimetypes
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date, parse_http_date_safe
+
+# Uploads never change under a name (a new upload gets a new one), but they
+# can be deleted, so caches keep them a day and then revalidate.
+MEDIA_CACHE_CONTROL = 'public, max-age=86400'
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """
+    A file opened at `start` that reads no further than `length` bytes.
+    It keeps fileno(), so servers that send FileResponse bodies with
+    sendfile() (they start at the current offset and stop at
+    Content-Length) still do so for a range.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def byte_range(header, size):
+    """
+    (start, end) of a single `bytes=` range, inclusive; None to ignore the
+    header (malformed, or several ranges, which the full body satisfies),
+    and ValueError when it lies past the end of the file.
+    """
+    match = BYTE_RANGE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # A suffix range: the last `last` bytes.
+        start, end = max(size - int(last), 0), size - 1
+        if not int(last):
+            raise ValueError(header)
+    else:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def _if_range_passes(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # Only strong validators allow a range.
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+
+def serve_media(request, path):
+    """
+    Serve an uploaded file from MEDIA_ROOT.
+
+    Conditional requests are answered from the file's size and mtime
+    without opening it. With MEDIA_SENDFILE_HEADER set, the body is left to
+    the fronting proxy (nginx X-Accel-Redirect, Apache/lighttpd X-Sendfile),
+    which then also handles ranges. Otherwise the file goes out as a
+    FileResponse, which the WSGI server can send with sendfile(), and a
+    single `Range` gets a 206 with just those bytes.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    fullpath = Path(safe_join(settings.MEDIA_ROOT, path))
+    try:
+        stat = fullpath.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("Media file not found.")
+    if not fullpath.is_file():
+        raise Http404("Media file not found.")
+
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return _with_validators(not_modified, etag, stat)
+
+    content_type = mimetypes.guess_type(fullpath.name)[0] or 'application/octet-stream'
+    header = getattr(settings, 'MEDIA_SENDFILE_HEADER', None)
+    if header:
+        response = HttpResponse(content_type=content_type)
+        if header == 'X-Accel-Redirect':
+            response[header] = settings.MEDIA_SENDFILE_PREFIX + quote(path)
+        else:
+            response[header] = str(fullpath)
+        return _with_validators(response, etag, stat)
+
+    size = stat.st_size
+    try:
+        requested = byte_range(request.headers.get('Range', ''), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if requested and not _if_range_passes(request, etag, stat.st_mtime):
+        requested = None
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = size
+    elif requested:
+        start, end = requested
+        response = FileResponse(RangeFile(fullpath.open('rb'), start, end - start + 1), content_type=content_type)
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(fullpath.open('rb'), content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    return _with_validators(response, etag, stat)
+
+
+def _with_validators(response, etag, stat):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = MEDIA_CACHE_CONTROL
+    return response
+
+
+class MediaFilesMiddleware:
+    """
+    Answer MEDIA_URL requests before sessions, authentication and CSRF run,
+    so an image costs a stat() and a sendfile rather than a trip through the
+    whole stack. Place it right after SecurityMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.MEDIA_URL
+
+    def __call__(self, request):
+        if self.prefix != '/' and request.path_info.startswith(self.prefix):
+            return serve_media(request, request.path_info[len(self.prefix):])
+        return self.get_response(request)
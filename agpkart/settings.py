@@ -40,6 +40,9 @@ INSTALLED_APPS = [
     'users',
     'products',
     'super_admin',
+    'cart',
+    'jobs',
+    'agpkart.db',
     'django_ckeditor_5',
     'crispy_forms',
     'crispy_bootstrap5',
@@ -47,6 +50,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'agpkart.media.MediaFilesMiddleware',
+    'agpkart.db.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,8 +85,39 @@ WSGI_APPLICATION = 'agpkart.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # django.db.backends.sqlite3 plus WAL, tuned pragmas and lock
+        # retries; see agpkart/db/sqlite/base.py.
+        'ENGINE': 'agpkart.db.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections (and their page cache) across requests.
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        # Transactions stay deferred, so read-only atomic blocks (reports,
+        # exports) never take the write lock; blocks that read and then
+        # write use agpkart.db.transactions.atomic_write to begin IMMEDIATE.
+    }
+}
+
+
+# Read replicas, by alias: reads go to one of them until a request writes.
+# A local stand-in is a second SQLite file refreshed by sync_replicas:
+#   DATABASES['replica'] = {**DATABASES['default'], 'NAME': BASE_DIR / 'db.replica.sqlite3',
+#                           'TEST': {'MIRROR': 'default'}}
+#   DATABASE_REPLICAS = ['replica']
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['agpkart.db.routers.PrimaryReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Storefront pages, facet indexes and permission lookups are invalidated
+# through version keys in this cache, so every worker process must share it:
+# point it at Redis or Memcached when running more than one process.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'agpkart',
     }
 }
 
@@ -129,8 +165,29 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 STATICFILES_DIRS = [BASE_DIR / "staticfiles"]
 
+# collectstatic writes content-hashed, precompressed copies here; see
+# agpkart/staticfiles.py.
+STATIC_ROOT = BASE_DIR / "collected_static"
+
+STATICFILES_FINDERS = [
+    "agpkart.staticfiles.PruningFileSystemFinder",
+    "django.contrib.staticfiles.finders.AppDirectoriesFinder",
+]
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "agpkart.staticfiles.CompressedManifestStaticFilesStorage"},
+}
+
+MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Hand media bodies to the fronting proxy instead of streaming them from a
+# worker: 'X-Accel-Redirect' (nginx, with an internal location aliased to
+# MEDIA_ROOT at MEDIA_SENDFILE_PREFIX) or 'X-Sendfile' (Apache, lighttpd).
+MEDIA_SENDFILE_HEADER = None
+MEDIA_SENDFILE_PREFIX = '/protected-media/'
+
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
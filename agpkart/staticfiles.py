@@ -0,0 +1,165 @@
+import gzip
+import mimetypes
+import posixpath
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import FileSystemFinder
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.contrib.staticfiles.utils import matches_patterns
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.template import engines
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+# Collected files with these extensions get a gzip sibling; images and fonts
+# are compressed already.
+COMPRESSIBLE = ('*.css', '*.js', '*.svg', '*.json', '*.txt', '*.xml', '*.html', '*.ico', '*.map')
+# Below this size the gzip header costs more than it saves.
+MIN_COMPRESS_SIZE = 256
+# Source trees that never belong in STATIC_ROOT.
+SOURCE_PATTERNS = ['*.scss', 'assets/scss', 'assets/scss/*']
+# Third-party libraries; only the files the templates (or their stylesheets) use get collected.
+LIB_PREFIX = 'assets/lib/'
+LIB_KEEP = ['*LICENSE*']
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Unhashed names can change under the same URL.
+MUTABLE_CACHE_CONTROL = 'public, max-age=300'
+
+STATIC_TAG = re.compile(r"""\{%\s*static\s+['"]([^'"]+)['"]""")
+CSS_URL = re.compile(r"""url\(\s*['"]?([^'")]+)['"]?\s*\)""")
+
+
+def template_static_references():
+    """Every literal `{% static '...' %}` path used by the project's templates."""
+    references = set()
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            for template in Path(directory).rglob('*.html'):
+                references.update(STATIC_TAG.findall(template.read_text(encoding='utf-8', errors='ignore')))
+    return references
+
+
+class PruningFileSystemFinder(FileSystemFinder):
+    """
+    STATICFILES_DIRS finder that leaves dead weight out of collectstatic:
+    the SCSS sources, the unminified twin of any file that ships a `.min`
+    build, and library files nothing references. Lookups through find()
+    are unaffected, so the development server still serves everything.
+    """
+
+    def list(self, ignore_patterns):
+        files = list(super().list(ignore_patterns))
+        names = {path for path, _ in files}
+        used = self._used_lib_files(files)
+        for path, storage in files:
+            if matches_patterns(path, SOURCE_PATTERNS):
+                continue
+            base, ext = posixpath.splitext(path)
+            if not base.endswith('.min') and f'{base}.min{ext}' in names:
+                continue
+            if path.startswith(LIB_PREFIX) and path not in used and not matches_patterns(path, LIB_KEEP):
+                continue
+            yield path, storage
+
+    def _used_lib_files(self, files):
+        storages = dict(files)
+        used = set()
+        pending = [path for path in template_static_references() if path.startswith(LIB_PREFIX)]
+        while pending:
+            path = pending.pop()
+            if path in used or path not in storages:
+                continue
+            used.add(path)
+            if path.endswith('.css'):
+                with storages[path].open(path) as stylesheet:
+                    content = stylesheet.read().decode('utf-8', errors='ignore')
+                for url in CSS_URL.findall(content):
+                    if not url.startswith(('data:', '#', '/')) and '//' not in url:
+                        url = url.split('?', 1)[0].split('#', 1)[0]
+                        pending.append(posixpath.normpath(posixpath.join(posixpath.dirname(path), url)))
+        return used
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Content-hashed static files, each text file with a precompressed `.gz`
+    sibling so serve_static never compresses on the fly. A reference to a
+    file that was never collected (before the first collectstatic, or an
+    image named in the database that is gone) renders as the plain name
+    instead of failing the page.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in list(paths) + list(self.hashed_files.values()):
+            if matches_patterns(name, COMPRESSIBLE):
+                self.compress(name)
+
+    def compress(self, name):
+        """Write `name`.gz unless it would not be smaller; returns whether it did."""
+        path = Path(self.path(name))
+        if not path.is_file():
+            return False
+        content = path.read_bytes()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return False
+        # mtime=0 keeps the output identical between runs.
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(compressed) >= len(content):
+            return False
+        path.with_name(path.name + '.gz').write_bytes(compressed)
+        return True
+
+
+@lru_cache
+def hashed_names():
+    """The content-hashed names from the collectstatic manifest."""
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def serve_static(request, path):
+    """
+    Serve a file from STATIC_ROOT: the gzip sibling when the client accepts
+    it, and far-future immutable caching for content-hashed names, whose
+    URL changes whenever the content does.
+    """
+    fullpath = Path(safe_join(settings.STATIC_ROOT, path))
+    if not fullpath.is_file() or fullpath.suffix == '.gz':
+        raise Http404("Static file not found.")
+    content_type, _ = mimetypes.guess_type(fullpath.name)
+    compressible = matches_patterns(fullpath.name, COMPRESSIBLE)
+    served = fullpath
+    compressed = fullpath.with_name(fullpath.name + '.gz')
+    if compressible and 'gzip' in request.headers.get('Accept-Encoding', '') and compressed.is_file():
+        served = compressed
+
+    stat = served.stat()
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(served.open('rb'), content_type=content_type or 'application/octet-stream')
+        response.headers['Last-Modified'] = http_date(stat.st_mtime)
+        if served is compressed:
+            response.headers['Content-Encoding'] = 'gzip'
+    if compressible:
+        patch_vary_headers(response, ['Accept-Encoding'])
+    if path in hashed_names():
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response.headers['Cache-Control'] = MUTABLE_CACHE_CONTROL
+    return response
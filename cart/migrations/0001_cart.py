@@ -0,0 +1,61 @@
+# Generated by Django 5.2 on 2026-10-16 22:50
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0002_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(blank=True, help_text='The anonymous session this cart belongs to', max_length=40, null=True, unique=True, verbose_name='session key')),
+                ('version', models.PositiveIntegerField(default=0, help_text='Incremented whenever a line is added, changed or removed', verbose_name='version')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When this cart was created', verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='When this cart was last changed', verbose_name='updated at')),
+                ('user', models.OneToOneField(blank=True, help_text='The user this cart belongs to', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cart', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'cart',
+                'verbose_name_plural': 'carts',
+            },
+        ),
+        migrations.CreateModel(
+            name='CartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1, help_text='Number of units', validators=[django.core.validators.MinValueValidator(1)], verbose_name='quantity')),
+                ('added_at', models.DateTimeField(auto_now_add=True, help_text='When this line was added to the cart', verbose_name='added at')),
+                ('cart', models.ForeignKey(help_text='The cart this line belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='items', to='cart.cart', verbose_name='cart')),
+                ('variant', models.ForeignKey(help_text='The product variant in the cart', on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to='products.variant', verbose_name='variant')),
+            ],
+            options={
+                'verbose_name': 'cart item',
+                'verbose_name_plural': 'cart items',
+                'ordering': ['added_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['updated_at'], name='cart_cart_updated_c46eb6_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.CheckConstraint(condition=models.Q(('user__isnull', False), ('session_key__isnull', False), _connector='OR'), name='cart_has_owner'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'variant'), name='unique_cart_variant'),
+        ),
+    ]
@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from django.core.validators import MinValueValidator
+
+
+class Cart(models.Model):
+    """
+    A shopping cart, owned by a signed-in user or by an anonymous session.
+
+    `version` is bumped by every change to the cart's lines; summaries of the
+    cart are cached against it (see cart.services.get_snapshot).
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='cart',
+        verbose_name=_('user'),
+        help_text=_('The user this cart belongs to')
+    )
+    session_key = models.CharField(
+        _('session key'),
+        max_length=40,
+        blank=True,
+        null=True,
+        unique=True,
+        help_text=_('The anonymous session this cart belongs to')
+    )
+    version = models.PositiveIntegerField(
+        _('version'),
+        default=0,
+        help_text=_('Incremented whenever a line is added, changed or removed')
+    )
+    created_at = models.DateTimeField(
+        _('created at'),
+        auto_now_add=True,
+        help_text=_('When this cart was created')
+    )
+    updated_at = models.DateTimeField(
+        _('updated at'),
+        auto_now=True,
+        help_text=_('When this cart was last changed')
+    )
+
+    class Meta:
+        verbose_name = _('cart')
+        verbose_name_plural = _('carts')
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(user__isnull=False) | Q(session_key__isnull=False),
+                name='cart_has_owner',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
+
+    def __str__(self):
+        return f"Cart of {self.user or self.session_key}"
+
+
+class CartItem(models.Model):
+    """
+    One line of a cart: a product variant and how many of it. Prices are not
+    stored here; they are read from the catalog whenever totals are computed.
+    """
+    cart = models.ForeignKey(
+        Cart,
+        on_delete=models.CASCADE,
+        related_name='items',
+        verbose_name=_('cart'),
+        help_text=_('The cart this line belongs to')
+    )
+    variant = models.ForeignKey(
+        'products.Variant',
+        on_delete=models.CASCADE,
+        related_name='cart_items',
+        verbose_name=_('variant'),
+        help_text=_('The product variant in the cart')
+    )
+    quantity = models.PositiveIntegerField(
+        _('quantity'),
+        default=1,
+        validators=[MinValueValidator(1)],
+        help_text=_('Number of units')
+    )
+    added_at = models.DateTimeField(
+        _('added at'),
+        auto_now_add=True,
+        help_text=_('When this line was added to the cart')
+    )
+
+    class Meta:
+        verbose_name = _('cart item')
+        verbose_name_plural = _('cart items')
+        ordering = ['added_at', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'variant'], name='unique_cart_variant'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.variant}"
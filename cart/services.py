@@ -0,0 +1,232 @@
+import uuid
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+
+from agpkart.db.routers import read_from_primary
+from agpkart.db.transactions import atomic_write
+from cart.models import Cart, CartItem
+from products import inventory
+from products.listing import refresh_listings
+from products.models import StockShard, Variant
+from products.page_cache import product_tag, tag_versions
+from users.tasks import order_placed
+
+MAX_QUANTITY = 99
+SNAPSHOT_TIMEOUT = 60 * 60
+MINI_CART_LINES = 5
+
+EMPTY_SNAPSHOT = {'version': 0, 'item_count': 0, 'subtotal': Decimal('0.00'), 'lines': [], 'has_unavailable': False}
+
+
+class CartError(ValueError):
+    pass
+
+
+def get_cart(request, create=False):
+    """
+    Return the cart of the signed-in user or of the anonymous session, or
+    None when there is none yet and `create` is False.
+    """
+    if request.user.is_authenticated:
+        if create:
+            return Cart.objects.get_or_create(user=request.user)[0]
+        return Cart.objects.filter(user=request.user).first()
+    session_key = request.session.session_key
+    if session_key is None:
+        if not create:
+            return None
+        request.session.save()
+        session_key = request.session.session_key
+    if create:
+        return Cart.objects.get_or_create(session_key=session_key)[0]
+    return Cart.objects.filter(session_key=session_key).first()
+
+
+def _bump(cart):
+    Cart.objects.filter(pk=cart.pk).update(version=F('version') + 1, updated_at=timezone.now())
+    cart.version += 1
+
+
+def add_item(cart, variant_id, quantity=1):
+    """Add `quantity` units of a variant, capped at MAX_QUANTITY per line."""
+    if quantity < 1:
+        raise CartError("Quantity must be at least 1.")
+    if not Variant.objects.filter(pk=variant_id, is_active=True, product__is_active=True).exists():
+        raise CartError("This product is not available.")
+    with transaction.atomic():
+        lines = CartItem.objects.filter(cart=cart, variant_id=variant_id)
+        if not lines.update(quantity=Least(F('quantity') + quantity, MAX_QUANTITY)):
+            try:
+                with transaction.atomic():
+                    CartItem.objects.create(cart=cart, variant_id=variant_id, quantity=min(quantity, MAX_QUANTITY))
+            except IntegrityError:
+                # Another request created the line first; add to it instead.
+                lines.update(quantity=Least(F('quantity') + quantity, MAX_QUANTITY))
+        _bump(cart)
+
+
+def set_quantity(cart, variant_id, quantity):
+    """Set the quantity of a line; zero or less removes it."""
+    with transaction.atomic():
+        lines = CartItem.objects.filter(cart=cart, variant_id=variant_id)
+        if quantity > 0:
+            changed = lines.update(quantity=min(quantity, MAX_QUANTITY))
+        else:
+            changed, _ = lines.delete()
+        if changed:
+            _bump(cart)
+
+
+def compute_totals(cart):
+    """
+    Price every line of a cart against the current catalog with a single
+    query, however many lines it has.
+
+    Lines whose variant or product was withdrawn, or that ask for more than
+    is in stock, are flagged unavailable and left out of the subtotal.
+    """
+    if cart is None:
+        return {**EMPTY_SNAPSHOT, 'lines': []}
+    rows = CartItem.objects.filter(cart=cart).order_by('added_at', 'id').values(
+        'variant_id',
+        'quantity',
+        product_id=F('variant__product_id'),
+        name=F('variant__product__name'),
+        sku=F('variant__sku'),
+        size=F('variant__size'),
+        color=F('variant__color'),
+        stock=F('variant__stock'),
+        variant_active=F('variant__is_active'),
+        product_active=F('variant__product__is_active'),
+        unit_price=Coalesce('variant__price', 'variant__product__base_price'),
+    )
+    lines = []
+    subtotal = Decimal('0.00')
+    item_count = 0
+    for row in rows:
+        variant_active, product_active = row.pop('variant_active'), row.pop('product_active')
+        active = variant_active and product_active
+        row['line_total'] = row['unit_price'] * row['quantity']
+        row['available'] = active and row['stock'] >= row['quantity']
+        if row['available']:
+            subtotal += row['line_total']
+        item_count += row['quantity']
+        lines.append(row)
+    return {
+        'version': cart.version,
+        'item_count': item_count,
+        'subtotal': subtotal,
+        'lines': lines,
+        'has_unavailable': any(not line['available'] for line in lines),
+    }
+
+
+def _snapshot_key(cart):
+    return f'cart:snapshot:{cart.pk}:{cart.version}'
+
+
+def get_snapshot(cart):
+    """
+    Return the cart summary the header badge and mini-cart show, without
+    reading the cart's lines while nothing has changed.
+
+    Snapshots are cached per cart version and record the catalog tag
+    versions of their products, so a price or stock change on any of them
+    also retires the snapshot.
+    """
+    if cart is None:
+        return EMPTY_SNAPSHOT
+    snapshot = cache.get(_snapshot_key(cart))
+    if snapshot is not None and tuple(tag_versions(snapshot['tags']).values()) == snapshot['tag_versions']:
+        return snapshot
+    with read_from_primary():
+        product_ids = CartItem.objects.filter(cart=cart).values_list('variant__product_id', flat=True).distinct()
+        tags = [product_tag(pk) for pk in product_ids.order_by()]
+        versions = tuple(tag_versions(tags).values())
+        totals = compute_totals(cart)
+    snapshot = {
+        'version': cart.version,
+        'item_count': totals['item_count'],
+        'subtotal': totals['subtotal'],
+        'lines': [
+            {key: line[key] for key in ('variant_id', 'name', 'size', 'color', 'quantity', 'unit_price', 'line_total')}
+            for line in totals['lines'][:MINI_CART_LINES]
+        ],
+        'has_unavailable': totals['has_unavailable'],
+        'tags': tags,
+        'tag_versions': versions,
+    }
+    cache.set(_snapshot_key(cart), snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def merge_carts(session_key, user):
+    """
+    Fold the cart of an anonymous session into the user's cart when they
+    sign in. Lines for the same variant are added together in one UPDATE;
+    the rest are moved over in another.
+    """
+    anonymous = Cart.objects.filter(session_key=session_key).first() if session_key else None
+    if anonymous is None:
+        return None
+    with atomic_write():
+        cart = Cart.objects.filter(user=user).first()
+        if cart is None:
+            anonymous.user, anonymous.session_key = user, None
+            anonymous.save(update_fields=['user', 'session_key', 'updated_at'])
+            return anonymous
+        mine = set(cart.items.values_list('variant_id', flat=True))
+        overlap = {
+            variant_id: quantity
+            for variant_id, quantity in anonymous.items.values_list('variant_id', 'quantity')
+            if variant_id in mine
+        }
+        if overlap:
+            added = Case(*[When(variant_id=v, then=Value(q)) for v, q in overlap.items()], default=Value(0))
+            cart.items.filter(variant_id__in=overlap).update(quantity=Least(F('quantity') + added, MAX_QUANTITY))
+        anonymous.items.exclude(variant_id__in=overlap).update(cart=cart)
+        anonymous.delete()
+        _bump(cart)
+    return cart
+
+
+def checkout(cart, buyer):
+    """
+    Place an order for everything in a cart: take its units out of stock,
+    empty the cart and queue the order's follow-up work (metrics, loyalty,
+    confirmation email), all in one transaction. Returns (reference, total).
+
+    Sharded variants are sold through a reservation that is committed at
+    once; the rest with a relative UPDATE guarded by the stock level. Either
+    way a line that cannot be filled undoes the whole order.
+    """
+    with atomic_write(), read_from_primary():
+        totals = compute_totals(cart)
+        if not totals['lines']:
+            raise CartError("Your cart is empty.")
+        if totals['has_unavailable']:
+            raise CartError("Some items in your cart are not available in the quantity asked for.")
+        variant_ids = [line['variant_id'] for line in totals['lines']]
+        sharded = set(StockShard.objects.filter(variant_id__in=variant_ids).values_list('variant_id', flat=True))
+        for line in totals['lines']:
+            if line['variant_id'] in sharded:
+                try:
+                    inventory.commit(inventory.reserve(line['variant_id'], line['quantity']))
+                except inventory.OutOfStock:
+                    raise CartError(f"{line['name']} is no longer available in this quantity.")
+            elif not Variant.objects.filter(pk=line['variant_id'], stock__gte=line['quantity']).update(
+                stock=F('stock') - line['quantity'],
+            ):
+                raise CartError(f"{line['name']} is no longer available in this quantity.")
+        # Sharded stock reaches the listings with the next sync_variant_stock.
+        refresh_listings({line['product_id'] for line in totals['lines'] if line['variant_id'] not in sharded})
+        CartItem.objects.filter(cart=cart).delete()
+        _bump(cart)
+        reference = uuid.uuid4().hex[:12].upper()
+        order_placed(buyer, totals['subtotal'], reference)
+    return reference, totals['subtotal']
@@ -0,0 +1,113 @@
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory
+
+from cart import services
+from cart.models import Cart, CartItem
+from jobs.models import Job
+from products import inventory
+from products.models import Category, Product, StockShard, Variant
+from users.models import BuyerUser, User
+
+
+class CartServiceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        self.oxford = Product.objects.create(name="Oxford", slug="oxford", category=category, base_price=20)
+        self.small = Variant.objects.create(product=self.oxford, sku="OX-S", size="S", stock=5)
+        self.large = Variant.objects.create(product=self.oxford, sku="OX-L", size="L", price=25, stock=1)
+        self.user = User.objects.create_user(email="asha@example.com", password="pw-12345")
+        self.cart = Cart.objects.create(user=self.user)
+
+    def test_totals_price_every_line_in_one_query(self):
+        services.add_item(self.cart, self.small.pk, 2)
+        services.add_item(self.cart, self.large.pk, 2)
+        with self.assertNumQueries(1):
+            totals = services.compute_totals(self.cart)
+        self.assertEqual(totals['item_count'], 4)
+        # The large line asks for more than is in stock, so it is left out.
+        self.assertEqual(totals['subtotal'], 40)
+        self.assertTrue(totals['has_unavailable'])
+
+    def test_inactive_variant_lines_drop_both_flags(self):
+        services.add_item(self.cart, self.small.pk)
+        Variant.objects.filter(pk=self.small.pk).update(is_active=False)
+        [line] = services.compute_totals(self.cart)['lines']
+        self.assertFalse(line['available'])
+        self.assertNotIn('variant_active', line)
+        self.assertNotIn('product_active', line)
+
+    def test_snapshot_is_reused_until_cart_or_catalog_changes(self):
+        services.add_item(self.cart, self.small.pk)
+        self.assertEqual(services.get_snapshot(self.cart)['subtotal'], 20)
+        with self.assertNumQueries(0):
+            services.get_snapshot(self.cart)
+
+        services.add_item(self.cart, self.small.pk, 2)
+        self.assertEqual(services.get_snapshot(self.cart)['item_count'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.small.price = 18
+            self.small.save()
+        self.assertEqual(services.get_snapshot(self.cart)['subtotal'], 54)
+
+    def test_quantity_is_capped_and_zero_removes(self):
+        services.add_item(self.cart, self.small.pk, 150)
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, services.MAX_QUANTITY)
+        services.set_quantity(self.cart, self.small.pk, 0)
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+        self.small.is_active = False
+        self.small.save()
+        with self.assertRaises(services.CartError):
+            services.add_item(self.cart, self.small.pk)
+
+    def test_session_cart_merges_on_login(self):
+        anonymous = Cart.objects.create(session_key="anon")
+        services.add_item(anonymous, self.small.pk, 1)
+        services.add_item(anonymous, self.large.pk, 1)
+        services.add_item(self.cart, self.small.pk, 2)
+
+        merged = services.merge_carts("anon", self.user)
+        self.assertEqual(merged.pk, self.cart.pk)
+        self.assertEqual(dict(self.cart.items.values_list('variant_id', 'quantity')), {self.small.pk: 3, self.large.pk: 1})
+        self.assertFalse(Cart.objects.filter(session_key="anon").exists())
+
+    def test_checkout_sells_the_cart_and_queues_the_order(self):
+        buyer = BuyerUser.objects.create(user=self.user)
+        inventory.enable_sharding(self.large, shards=2)
+        services.add_item(self.cart, self.small.pk, 2)
+        services.add_item(self.cart, self.large.pk, 1)
+
+        reference, total = services.checkout(self.cart, buyer)
+        self.assertEqual(total, 65)
+        self.assertEqual(Variant.objects.get(pk=self.small.pk).stock, 3)
+        self.assertEqual(inventory.available_stock(self.large.pk), 0)
+        self.assertFalse(self.cart.items.exists())
+        jobs = Job.objects.filter(payload__reference=reference)
+        self.assertEqual(set(jobs.values_list('task', flat=True)), {'users.record_order', 'users.send_order_confirmation'})
+        with self.assertRaises(services.CartError):
+            services.checkout(self.cart, buyer)
+
+    def test_checkout_undoes_the_order_when_a_line_runs_out(self):
+        buyer = BuyerUser.objects.create(user=self.user)
+        inventory.enable_sharding(self.large, shards=2)
+        services.add_item(self.cart, self.small.pk, 2)
+        services.add_item(self.cart, self.large.pk, 1)
+        # Sold elsewhere since the rollup last ran.
+        StockShard.objects.filter(variant=self.large).update(available=0)
+
+        with self.assertRaises(services.CartError):
+            services.checkout(self.cart, buyer)
+        self.assertEqual(Variant.objects.get(pk=self.small.pk).stock, 5)
+        self.assertEqual(self.cart.items.count(), 2)
+        self.assertFalse(Job.objects.exists())
+
+    def test_add_and_summary_views(self):
+        response = self.client.post("/cart/add/", {"variant_id": self.small.pk, "quantity": 2},
+                                    headers={"x-requested-with": "XMLHttpRequest"})
+        self.assertEqual(response.json()["item_count"], 2)
+        self.assertEqual(self.client.get("/cart/summary/").json()["item_count"], 2)
+
+        self.client.post("/users/login/", {"uname": "asha@example.com", "psw": "pw-12345"})
+        self.assertEqual(self.client.get("/cart/summary/").json()["item_count"], 2)
+        self.assertContains(self.client.get("/cart/"), "Oxford")
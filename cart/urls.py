@@ -0,0 +1,10 @@
+from django.urls import path
+from cart.views import cart_view, cart_summary_view, cart_add_view, cart_update_view, cart_checkout_view
+
+urlpatterns = [
+    path("", cart_view),
+    path("summary/", cart_summary_view),
+    path("add/", cart_add_view),
+    path("update/", cart_update_view),
+    path("checkout/", cart_checkout_view),
+]
@@ -0,0 +1,72 @@
+from django.shortcuts import render, redirect
+from django.contrib import messages
+from django.http import JsonResponse
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_POST
+
+from cart.services import CartError, add_item, checkout, compute_totals, get_cart, get_snapshot, set_quantity
+from users.models import BuyerUser
+
+
+def _summary(snapshot):
+    return {
+        "item_count": snapshot["item_count"],
+        "subtotal": snapshot["subtotal"],
+        "has_unavailable": snapshot["has_unavailable"],
+        "lines": snapshot["lines"],
+    }
+
+def _quantity(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+def _respond(request, cart, error=None):
+    if request.headers.get("x-requested-with") == "XMLHttpRequest":
+        if error:
+            return JsonResponse({"error": error}, status=400)
+        return JsonResponse(_summary(get_snapshot(cart)))
+    if error:
+        messages.error(request, error)
+    return redirect("/cart/")
+
+def cart_view(request):
+    cart = get_cart(request)
+    return render(request, "public/cart.html", {"cart": compute_totals(cart)})
+
+@ensure_csrf_cookie
+def cart_summary_view(request):
+    """Header badge and mini-cart data, served from the cart's cached snapshot."""
+    return JsonResponse(_summary(get_snapshot(get_cart(request))))
+
+@require_POST
+def cart_add_view(request):
+    cart = get_cart(request, create=True)
+    try:
+        add_item(cart, _quantity(request.POST.get("variant_id"), 0), _quantity(request.POST.get("quantity"), 1))
+    except CartError as exc:
+        return _respond(request, cart, str(exc))
+    return _respond(request, cart)
+
+@require_POST
+def cart_update_view(request):
+    cart = get_cart(request)
+    if cart is not None:
+        set_quantity(cart, _quantity(request.POST.get("variant_id"), 0), _quantity(request.POST.get("quantity"), 0))
+    return _respond(request, cart)
+
+@require_POST
+def cart_checkout_view(request):
+    cart = get_cart(request)
+    buyer = BuyerUser.objects.filter(pk=request.user.pk).first() if request.user.is_authenticated else None
+    if buyer is None:
+        messages.error(request, "Sign in with a buyer account to place your order.")
+        return redirect("/cart/")
+    try:
+        reference, total = checkout(cart, buyer)
+    except CartError as exc:
+        messages.error(request, str(exc))
+        return redirect("/cart/")
+    messages.success(request, f"Thank you! Your order {reference} for ${total} has been placed.")
+    return redirect("/cart/")
@@ -1,13 +1,20 @@
 from django.http import Http404
 from django.shortcuts import redirect
 from users.models import User
+from users.permissions import get_access
 
-def allow_access_by_role(user_type=None, allowed_roles=None, redirect_url=None):
+def allow_access_by_role(user_type=None, allowed_roles=None, redirect_url=None, required_permissions=None):
     """
-    Decorator to restrict access to views based on UserType and specific roles
+    Decorator to restrict access to views based on UserType, specific roles
+    and fine-grained PlatformUser permissions (e.g. 'manage_users').
+
+    Roles and permissions come from the cached access layer in
+    users.permissions, so the check itself does not hit the database.
     """
     if allowed_roles is None:
         allowed_roles = []
+    if required_permissions is None:
+        required_permissions = []
 
     def decorator(view_func):
         def _wrapped_view(request, *args, **kwargs):
@@ -23,17 +30,24 @@ def allow_access_by_role(user_type=None, allowed_roles=None, redirect_url=None):
                     return redirect(redirect_url)
                 raise Http404(f"Access denied. User type '{user.user_type}' is not '{user_type}'.")
 
-            if allowed_roles:
+            if allowed_roles or required_permissions:
                 if user.user_type == User.UserType.PLATFORM:
-                    if not hasattr(user, 'platform_user') or not user.platform_user:
+                    access = get_access(user.pk)
+                    if access['role'] is None:
                         if redirect_url:
                             return redirect(redirect_url)
                         raise Http404("Access denied. Platform user profile missing.")
-                    
-                    if user.platform_user.role not in allowed_roles:
+
+                    if allowed_roles and access['role'] not in allowed_roles:
+                        if redirect_url:
+                            return redirect(redirect_url)
+                        raise Http404(f"Access denied. Platform role '{access['role']}' not allowed.")
+
+                    missing = set(required_permissions) - access['permissions']
+                    if missing:
                         if redirect_url:
                             return redirect(redirect_url)
-                        raise Http404(f"Access denied. Platform role '{user.platform_user.role}' not allowed.")
+                        raise Http404(f"Access denied. Missing permissions: {', '.join(sorted(missing))}.")
                 else:
                     if redirect_url:
                         return redirect(redirect_url)
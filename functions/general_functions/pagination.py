@@ -0,0 +1,128 @@
+import base64
+import json
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import F, Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated queryset, with opaque cursors for the
+    neighbouring pages.
+    """
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by seeking past the last row seen instead of using
+    OFFSET, so every page costs the same as the first one.
+
+    `ordering` is a list of field lookups, optionally prefixed with '-', and
+    must end with a unique column (usually 'id') so that rows never tie.
+    Nullable columns sort NULLs first when ascending and last when descending.
+    """
+    def __init__(self, queryset, ordering, per_page=25):
+        if not ordering:
+            raise ValueError("Keyset pagination requires an ordering.")
+        self.queryset = queryset
+        self.per_page = per_page
+        self.fields = [(o.lstrip('-'), o.startswith('-')) for o in ordering]
+
+    def get_page(self, after=None, before=None):
+        """Return the page following `after`, preceding `before`, or the first page."""
+        backwards = before is not None and after is None
+        cursor = before if backwards else after
+        queryset = self.queryset.order_by(*self._order_by(reverse=backwards))
+        if cursor:
+            queryset = queryset.filter(self._seek(self.decode(cursor), reverse=backwards))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = self.encode(rows[-1])
+            if (has_more and backwards) or (cursor and not backwards):
+                previous_cursor = self.encode(rows[0])
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def _order_by(self, reverse=False):
+        order_by = []
+        for name, descending in self.fields:
+            if descending != reverse:
+                order_by.append(F(name).desc(nulls_last=True))
+            else:
+                order_by.append(F(name).asc(nulls_first=True))
+        return order_by
+
+    def _seek(self, values, reverse=False):
+        """Build the lexicographic "strictly after this row" condition."""
+        if len(values) != len(self.fields):
+            raise InvalidCursor("Cursor does not match the current ordering.")
+
+        condition = Q()
+        equal_so_far = Q()
+        for (name, descending), value in zip(self.fields, values):
+            descending = descending != reverse
+            if value is None:
+                # NULLs sort last when descending, first when ascending.
+                after = Q(pk__in=[]) if descending else Q(**{f'{name}__isnull': False})
+                equal = Q(**{f'{name}__isnull': True})
+            else:
+                lookup = 'lt' if descending else 'gt'
+                after = Q(**{f'{name}__{lookup}': value})
+                if descending:
+                    after |= Q(**{f'{name}__isnull': True})
+                equal = Q(**{name: value})
+            condition |= equal_so_far & after
+            equal_so_far &= equal
+        return condition
+
+    def encode(self, row):
+        values = []
+        for name, _ in self.fields:
+            value = row
+            for part in name.split('__'):
+                try:
+                    value = getattr(value, part) if value is not None else None
+                except ObjectDoesNotExist:
+                    value = None
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError):
+            raise InvalidCursor("Malformed pagination cursor.")
+        if not isinstance(values, list):
+            raise InvalidCursor("Malformed pagination cursor.")
+        return values
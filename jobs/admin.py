@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from jobs.models import Job
+from jobs.queue import requeue
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'queue', 'status', 'attempts', 'max_attempts', 'run_after', 'finished_at')
+    list_filter = ('status', 'queue', 'task')
+    readonly_fields = ('claimed_by', 'locked_until', 'created_at', 'finished_at', 'last_error')
+    actions = ('retry_jobs',)
+
+    @admin.action(description="Retry selected dead jobs")
+    def retry_jobs(self, request, queryset):
+        self.message_user(request, f"Requeued {requeue(queryset)} jobs.")
@@ -0,0 +1,60 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.models import Job
+from jobs.queue import CLAIM_BATCH_SIZE, enqueue, run_workers
+from jobs.tasks import noop
+
+BENCHMARK_QUEUE = 'benchmark'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure enqueue latency and worker throughput with no-op jobs on a "
+        "queue of their own, which is emptied again afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jobs", type=int, default=10_000)
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+        parser.add_argument("--batch-size", type=int, default=CLAIM_BATCH_SIZE)
+        parser.add_argument("--sleep-ms", type=int, default=0, help="Simulated work per job.")
+        parser.add_argument("--repeat", type=int, default=200, help="Single enqueues to time.")
+
+    def handle(self, *args, **options):
+        try:
+            self._enqueue_latency(options["repeat"])
+            for concurrency in options["concurrency"]:
+                self._throughput(options["jobs"], concurrency, options["batch_size"], options["sleep_ms"])
+        finally:
+            Job.objects.filter(queue=BENCHMARK_QUEUE).delete()
+
+    def _enqueue_latency(self, repeat):
+        # Each enqueue commits on its own, like a checkout request would.
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            enqueue(noop, queue=BENCHMARK_QUEUE)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        self.stdout.write(
+            f"enqueue  p50 {statistics.median(timings):6.2f}ms  p95 {timings[int(len(timings) * 0.95) - 1]:6.2f}ms"
+        )
+        Job.objects.filter(queue=BENCHMARK_QUEUE).delete()
+
+    def _throughput(self, count, concurrency, batch_size, sleep_ms):
+        Job.objects.bulk_create(
+            [Job(queue=BENCHMARK_QUEUE, task=noop.task_name, payload={'sleep_ms': sleep_ms}) for _ in range(count)],
+            batch_size=1000,
+        )
+        started = time.perf_counter()
+        processed = run_workers(concurrency, queues=[BENCHMARK_QUEUE], batch_size=batch_size, burst=True)
+        elapsed = time.perf_counter() - started
+        done = Job.objects.filter(queue=BENCHMARK_QUEUE, status=Job.Status.DONE).count()
+        self.stdout.write(
+            f"{concurrency:>2} workers  {processed} jobs in {elapsed:6.2f}s  "
+            f"{processed / elapsed:8.0f} jobs/s  ({done} done)"
+        )
+        Job.objects.filter(queue=BENCHMARK_QUEUE).delete()
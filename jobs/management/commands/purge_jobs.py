@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from jobs.queue import PURGE_BATCH_SIZE, purge
+
+
+class Command(BaseCommand):
+    help = "Delete jobs that finished successfully more than --days ago. Dead jobs are kept for inspection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7)
+        parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        deleted = purge(timezone.now() - timedelta(days=options["days"]), batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} finished jobs."))
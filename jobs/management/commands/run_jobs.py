@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from jobs.queue import CLAIM_BATCH_SIZE, DEFAULT_QUEUE, POLL_INTERVAL, run_workers
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queue", action="append", dest="queues",
+                            help=f"Queue to take jobs from; repeat for several (default: {DEFAULT_QUEUE}).")
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--batch-size", type=int, default=CLAIM_BATCH_SIZE)
+        parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+        parser.add_argument("--burst", action="store_true", help="Exit once no job is ready instead of polling.")
+
+    def handle(self, *args, **options):
+        processed = run_workers(
+            options["concurrency"],
+            queues=options["queues"] or [DEFAULT_QUEUE],
+            batch_size=options["batch_size"],
+            burst=options["burst"],
+            poll_interval=options["poll_interval"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Ran {processed} jobs successfully."))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-16 22:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('queue', models.CharField(default='default', help_text='Workers only take jobs from the queues they were started for', max_length=50, verbose_name='queue')),
+                ('task', models.CharField(help_text='Registered name of the function that runs this job', max_length=100, verbose_name='task')),
+                ('payload', models.JSONField(blank=True, default=dict, help_text='Keyword arguments passed to the task', verbose_name='payload')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('DEAD', 'Dead')], default='PENDING', help_text='Where this job is in its lifecycle', max_length=10, verbose_name='status')),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='How many times a worker has started this job', verbose_name='attempts')),
+                ('max_attempts', models.PositiveIntegerField(default=5, help_text='The job is marked dead after failing this many times', verbose_name='max attempts')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, help_text='The job is not started before this time', verbose_name='run after')),
+                ('claimed_by', models.UUIDField(blank=True, help_text='Token of the claim that is running this job', null=True, verbose_name='claimed by')),
+                ('locked_until', models.DateTimeField(blank=True, help_text='A running job whose lock has expired may be claimed again', null=True, verbose_name='locked until')),
+                ('last_error', models.TextField(blank=True, help_text='Traceback of the most recent failure', verbose_name='last error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When this job was enqueued', verbose_name='created at')),
+                ('finished_at', models.DateTimeField(blank=True, help_text='When this job succeeded or was marked dead', null=True, verbose_name='finished at')),
+            ],
+            options={
+                'verbose_name': 'job',
+                'verbose_name_plural': 'jobs',
+                'ordering': ['run_after', 'id'],
+                'indexes': [models.Index(fields=['queue', 'status', 'run_after'], name='jobs_job_queue_ae49cf_idx'), models.Index(fields=['status', 'locked_until'], name='jobs_job_status_715db5_idx'), models.Index(fields=['status', 'finished_at'], name='jobs_job_status_d700c4_idx')],
+            },
+        ),
+    ]
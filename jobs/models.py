@@ -0,0 +1,98 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class Job(models.Model):
+    """
+    A unit of background work, stored in the project database so it survives
+    restarts. Workers claim pending jobs with a conditional UPDATE (see
+    jobs.queue.claim); failed jobs are retried with backoff and parked as
+    dead once they run out of attempts.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        RUNNING = 'RUNNING', _('Running')
+        DONE = 'DONE', _('Done')
+        DEAD = 'DEAD', _('Dead')
+
+    queue = models.CharField(
+        _('queue'),
+        max_length=50,
+        default='default',
+        help_text=_('Workers only take jobs from the queues they were started for')
+    )
+    task = models.CharField(
+        _('task'),
+        max_length=100,
+        help_text=_('Registered name of the function that runs this job')
+    )
+    payload = models.JSONField(
+        _('payload'),
+        default=dict,
+        blank=True,
+        help_text=_('Keyword arguments passed to the task')
+    )
+    status = models.CharField(
+        _('status'),
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+        help_text=_('Where this job is in its lifecycle')
+    )
+    attempts = models.PositiveIntegerField(
+        _('attempts'),
+        default=0,
+        help_text=_('How many times a worker has started this job')
+    )
+    max_attempts = models.PositiveIntegerField(
+        _('max attempts'),
+        default=5,
+        help_text=_('The job is marked dead after failing this many times')
+    )
+    run_after = models.DateTimeField(
+        _('run after'),
+        default=timezone.now,
+        help_text=_('The job is not started before this time')
+    )
+    claimed_by = models.UUIDField(
+        _('claimed by'),
+        blank=True,
+        null=True,
+        help_text=_('Token of the claim that is running this job')
+    )
+    locked_until = models.DateTimeField(
+        _('locked until'),
+        blank=True,
+        null=True,
+        help_text=_('A running job whose lock has expired may be claimed again')
+    )
+    last_error = models.TextField(
+        _('last error'),
+        blank=True,
+        help_text=_('Traceback of the most recent failure')
+    )
+    created_at = models.DateTimeField(
+        _('created at'),
+        auto_now_add=True,
+        help_text=_('When this job was enqueued')
+    )
+    finished_at = models.DateTimeField(
+        _('finished at'),
+        blank=True,
+        null=True,
+        help_text=_('When this job succeeded or was marked dead')
+    )
+
+    class Meta:
+        verbose_name = _('job')
+        verbose_name_plural = _('jobs')
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['queue', 'status', 'run_after']),
+            models.Index(fields=['status', 'locked_until']),
+            models.Index(fields=['status', 'finished_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.get_status_display()})"
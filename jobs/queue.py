@@ -0,0 +1,261 @@
+import logging
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from agpkart.db.routers import request_scope
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE = 'default'
+DEFAULT_MAX_ATTEMPTS = 5
+CLAIM_BATCH_SIZE = 10
+# How long a claimed job stays locked; a worker that dies mid-job leaves it
+# to be claimed again once this has passed.
+LOCK_TIMEOUT = timedelta(minutes=5)
+RETRY_BASE_DELAY = timedelta(seconds=10)
+RETRY_MAX_DELAY = timedelta(hours=1)
+POLL_INTERVAL = 1.0
+BUSY_RETRIES = 20
+PURGE_BATCH_SIZE = 1000
+
+_registry = {}
+
+
+class UnknownTask(LookupError):
+    pass
+
+
+class LostClaim(RuntimeError):
+    pass
+
+
+def task(name):
+    """Register a function as a job task under `name`."""
+    def decorator(func):
+        _registry[name] = func
+        func.task_name = name
+        return func
+    return decorator
+
+
+def _task_name(task_or_name):
+    return getattr(task_or_name, 'task_name', task_or_name)
+
+
+def enqueue(task_or_name, payload=None, queue=DEFAULT_QUEUE, delay=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Store a job for a worker to run. The job is written in the caller's
+    transaction, so it is picked up only if that transaction commits and is
+    never lost if it does.
+    """
+    name = _task_name(task_or_name)
+    if name not in _registry:
+        raise UnknownTask(f"No task is registered as '{name}'.")
+    return Job.objects.create(
+        queue=queue,
+        task=name,
+        payload=payload or {},
+        max_attempts=max_attempts,
+        run_after=timezone.now() + (delay or timedelta()),
+    )
+
+
+def _ready(now):
+    return Q(status=Job.Status.PENDING, run_after__lte=now) | Q(status=Job.Status.RUNNING, locked_until__lte=now)
+
+
+def claim(queues=(DEFAULT_QUEUE,), limit=CLAIM_BATCH_SIZE, lock_timeout=LOCK_TIMEOUT):
+    """
+    Lock up to `limit` ready jobs for this caller and return them.
+
+    Candidates are read first and then taken with one conditional UPDATE
+    that re-checks they are still ready, so concurrent workers never take
+    the same job; whoever loses a row simply gets fewer jobs back. The lock
+    set here only covers the wait for a turn: run() gives each job a lease
+    of its own when it starts.
+    """
+    now = timezone.now()
+    ids = list(
+        Job.objects.filter(_ready(now), queue__in=queues)
+        .order_by('run_after', 'id').values_list('pk', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    token = uuid.uuid4()
+    # One transaction, so a claim whose rows cannot be read back is undone
+    # rather than left locked.
+    with transaction.atomic():
+        Job.objects.filter(_ready(now), pk__in=ids).update(
+            status=Job.Status.RUNNING,
+            claimed_by=token,
+            locked_until=now + lock_timeout,
+            attempts=F('attempts') + 1,
+        )
+        return list(Job.objects.filter(claimed_by=token).order_by('run_after', 'id'))
+
+
+def retry_delay(attempts):
+    """Exponential backoff after the given number of failed attempts."""
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def _start(job, lock_timeout):
+    """Renew the job's lease for its own run; False if another worker has taken it over."""
+    locked_until = timezone.now() + lock_timeout
+    started = Job.objects.filter(pk=job.pk, claimed_by=job.claimed_by).update(locked_until=locked_until)
+    job.locked_until = locked_until
+    return bool(started)
+
+
+def run(job, lock_timeout=LOCK_TIMEOUT):
+    """
+    Run a claimed job and record the outcome. Returns True if it succeeded.
+
+    The task runs outside any transaction, so a slow one (mail, image
+    processing) never holds the database's write lock; tasks must therefore
+    be safe to run again, and wrap their own writes in a transaction where
+    they need to. Afterwards the job is marked done with a single UPDATE
+    guarded by the claim. A failure retries the job after a backoff, or
+    marks it dead once it has used up its attempts.
+    """
+    func = _registry.get(job.task)
+    try:
+        if not _retrying(lambda: _start(job, lock_timeout)):
+            raise LostClaim(f"Job {job.pk} was claimed by another worker before it started.")
+    except LostClaim:
+        logger.warning("Job %s waited past its lock and was taken over; skipping it.", job.pk)
+        return False
+    try:
+        if func is None:
+            raise UnknownTask(f"No task is registered as '{job.task}'.")
+        # A routing scope of its own, like a request: reads go to a replica
+        # until the task writes, then to the primary for the rest of the job.
+        with request_scope():
+            func(**job.payload)
+    except Exception as exc:
+        if _is_busy(exc):
+            # Contention rather than a fault of the task: put the job back
+            # right away without spending an attempt.
+            _retrying(lambda: Job.objects.filter(pk=job.pk, claimed_by=job.claimed_by).update(
+                status=Job.Status.PENDING, run_after=timezone.now(), locked_until=None, attempts=F('attempts') - 1,
+            ))
+        else:
+            error = traceback.format_exc()
+            _retrying(lambda: _fail(job, error, retry=func is not None))
+        return False
+    finished = _retrying(lambda: Job.objects.filter(pk=job.pk, claimed_by=job.claimed_by).update(
+        status=Job.Status.DONE, finished_at=timezone.now(), locked_until=None,
+    ))
+    if not finished:
+        logger.warning("Job %s outlived its lock; another worker will run it again.", job.pk)
+        return False
+    return True
+
+
+def _is_busy(exc):
+    return isinstance(exc, OperationalError) and 'locked' in str(exc)
+
+
+def _retrying(write):
+    """Run a bookkeeping write, retrying while SQLite reports the database as locked."""
+    for attempt in range(BUSY_RETRIES):
+        try:
+            return write()
+        except OperationalError as exc:
+            if not _is_busy(exc) or attempt == BUSY_RETRIES - 1:
+                raise
+            time.sleep(0.01 * (attempt + 1))
+
+
+def _fail(job, error, retry=True):
+    now = timezone.now()
+    claimed = Job.objects.filter(pk=job.pk, claimed_by=job.claimed_by)
+    if retry and job.attempts < job.max_attempts:
+        claimed.update(
+            status=Job.Status.PENDING, run_after=now + retry_delay(job.attempts), locked_until=None, last_error=error,
+        )
+    else:
+        logger.error("Job %s (%s) is dead after %s attempts.", job.pk, job.task, job.attempts)
+        claimed.update(status=Job.Status.DEAD, finished_at=now, locked_until=None, last_error=error)
+
+
+def requeue(jobs):
+    """Give dead jobs a fresh set of attempts. Returns the number requeued."""
+    return jobs.filter(status=Job.Status.DEAD).update(
+        status=Job.Status.PENDING, attempts=0, run_after=timezone.now(), finished_at=None, claimed_by=None,
+    )
+
+
+def work(queues=(DEFAULT_QUEUE,), batch_size=CLAIM_BATCH_SIZE, burst=False, poll_interval=POLL_INTERVAL, stop=None):
+    """
+    Claim and run jobs until `stop` is set, or, with `burst`, until no job
+    is ready. Returns the number of jobs that succeeded.
+    """
+    stop = stop or threading.Event()
+    processed = 0
+    while not stop.is_set():
+        try:
+            jobs = claim(queues, batch_size)
+        except OperationalError as exc:
+            if not _is_busy(exc):
+                logger.warning("Could not claim jobs", exc_info=True)
+            else:
+                # Another worker holds the write lock: routine under load, so
+                # no traceback. Back off and try again.
+                logger.debug("Could not claim jobs: %s", exc)
+            stop.wait(poll_interval)
+            continue
+        if not jobs:
+            if burst:
+                break
+            stop.wait(poll_interval)
+            continue
+        for job in jobs:
+            try:
+                processed += run(job)
+            except OperationalError:
+                # The outcome could not be recorded; the job runs again once its lock expires.
+                logger.exception("Could not record the outcome of job %s", job.pk)
+    return processed
+
+
+def run_workers(concurrency, queues=(DEFAULT_QUEUE,), batch_size=CLAIM_BATCH_SIZE, burst=False,
+                poll_interval=POLL_INTERVAL, stop=None):
+    """Run `concurrency` workers in a thread pool, each with its own connection."""
+    stop = stop or threading.Event()
+
+    def worker():
+        close_old_connections()
+        try:
+            return work(queues, batch_size, burst, poll_interval, stop)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='jobs') as pool:
+        futures = [pool.submit(worker) for _ in range(concurrency)]
+        try:
+            return sum(future.result() for future in futures)
+        except KeyboardInterrupt:
+            # Let every worker finish the jobs it has claimed, then stop.
+            stop.set()
+            return sum(future.result() for future in futures)
+
+
+def purge(older_than, batch_size=PURGE_BATCH_SIZE):
+    """Delete jobs that finished successfully before `older_than`. Dead jobs are kept."""
+    finished = Job.objects.filter(status=Job.Status.DONE, finished_at__lt=older_than)
+    deleted = 0
+    while True:
+        ids = list(finished.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Job.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,10 @@
+import time
+
+from jobs.queue import task
+
+
+@task('jobs.noop')
+def noop(sleep_ms=0):
+    """Do nothing, optionally for a while; used to measure the queue itself."""
+    if sleep_ms:
+        time.sleep(sleep_ms / 1000)
@@ -0,0 +1,126 @@
+import threading
+from datetime import timedelta
+
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from jobs import queue
+from jobs.models import Job
+from jobs.queue import enqueue, task
+
+runs = []
+runs_lock = threading.Lock()
+
+
+@task('tests.record')
+def record(key):
+    with runs_lock:
+        runs.append(key)
+
+
+@task('tests.flaky')
+def flaky(key):
+    raise RuntimeError(f"{key} failed")
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        runs.clear()
+
+    def test_worker_runs_ready_jobs_once_in_order(self):
+        first = enqueue(record, {'key': 'a'})
+        enqueue(record, {'key': 'b'})
+        enqueue(record, {'key': 'later'}, delay=timedelta(hours=1))
+        enqueue(record, {'key': 'other'}, queue='elsewhere')
+        self.assertEqual(queue.work(burst=True), 2)
+        self.assertEqual(runs, ['a', 'b'])
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), (Job.Status.DONE, 1))
+        self.assertEqual(queue.work(burst=True), 0)
+
+    def test_failures_are_retried_with_backoff_then_dead_lettered(self):
+        enqueue(record, {'key': 'kept'})
+        job = enqueue(flaky, {'key': 'x'}, max_attempts=2)
+        queue.work(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.PENDING)
+        self.assertIn("x failed", job.last_error)
+        self.assertGreater(job.run_after, timezone.now() + queue.RETRY_BASE_DELAY / 2)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            queue.work(burst=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.DEAD, 2))
+        self.assertIsNotNone(job.finished_at)
+
+        self.assertEqual(queue.requeue(Job.objects.all()), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.PENDING, 0))
+
+    def test_expired_lock_lets_another_worker_take_over(self):
+        enqueue(record, {'key': 'a'})
+        [stale] = queue.claim()
+        self.assertEqual(queue.claim(), [])
+        Job.objects.filter(pk=stale.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        [fresh] = queue.claim()
+        # The first worker getting to it late must neither run it nor overwrite the new claim.
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertFalse(queue.run(stale))
+        self.assertEqual(runs, [])
+        self.assertEqual(Job.objects.get().claimed_by, fresh.claimed_by)
+        self.assertTrue(queue.run(fresh))
+        self.assertEqual((runs, Job.objects.get().status), (['a'], Job.Status.DONE))
+
+    def test_each_job_gets_its_own_lease_when_it_starts(self):
+        enqueue(record, {'key': 'a'})
+        enqueue(record, {'key': 'b'})
+        first, second = queue.claim()
+        # The batch's lock ran out while the first job was running.
+        Job.objects.filter(pk=second.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(queue.run(first))
+        seen = []
+        original = queue._registry['tests.record']
+
+        def check(key):
+            seen.append(Job.objects.get(pk=second.pk).locked_until > timezone.now())
+            original(key)
+
+        queue._registry['tests.record'] = check
+        self.addCleanup(queue._registry.__setitem__, 'tests.record', original)
+        self.assertTrue(queue.run(second))
+        self.assertEqual(seen, [True])
+        self.assertEqual(runs, ['a', 'b'])
+
+    def test_unknown_tasks_are_dead_lettered_without_retries(self):
+        job = Job.objects.create(task='tests.missing')
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            queue.work(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.DEAD)
+        with self.assertRaises(queue.UnknownTask):
+            enqueue('tests.missing')
+
+    def test_purge_keeps_dead_and_recent_jobs(self):
+        old = timezone.now() - timedelta(days=30)
+        Job.objects.create(task='tests.record', status=Job.Status.DONE, finished_at=old)
+        Job.objects.create(task='tests.record', status=Job.Status.DEAD, finished_at=old)
+        Job.objects.create(task='tests.record', status=Job.Status.DONE, finished_at=timezone.now())
+        self.assertEqual(queue.purge(timezone.now() - timedelta(days=7), batch_size=1), 1)
+        self.assertEqual(Job.objects.count(), 2)
+
+
+class ConcurrentWorkerTests(TransactionTestCase):
+    def setUp(self):
+        runs.clear()
+
+    def test_pool_runs_every_job_exactly_once(self):
+        Job.objects.bulk_create([Job(task='tests.record', payload={'key': i}) for i in range(200)])
+        # Workers waiting on each other's write lock is routine, not worth a warning.
+        with self.assertNoLogs('jobs.queue', 'WARNING'):
+            processed = queue.run_workers(4, batch_size=5, burst=True, poll_interval=0.01)
+        self.assertEqual(processed, 200)
+        # A run that lost a write to another worker is put back without
+        # spending an attempt, so every job succeeded on its first.
+        self.assertEqual(set(runs), set(range(200)))
+        self.assertEqual(Job.objects.filter(status=Job.Status.DONE, attempts=1).count(), 200)
@@ -1,3 +1,48 @@
+from django import forms
 from django.contrib import admin
 
-# Register your models here.
+from products.inventory import add_stock, sync_variant_stock
+from products.models import Category, Product, Variant, ProductImage, StockShard, Reservation
+
+admin.site.register((Category, Product, ProductImage, StockShard, Reservation))
+
+
+class VariantAdminForm(forms.ModelForm):
+    receive_stock = forms.IntegerField(
+        required=False,
+        min_value=1,
+        label="Receive stock",
+        help_text="Units received; they are spread over the variant's stock shards.",
+    )
+
+    class Meta:
+        model = Variant
+        fields = '__all__'
+
+
+@admin.register(Variant)
+class VariantAdmin(admin.ModelAdmin):
+    form = VariantAdminForm
+    list_display = ('sku', 'product', 'size', 'color', 'price', 'stock', 'is_active')
+    search_fields = ('sku', 'product__name')
+
+    def _sharded(self, obj):
+        return obj is not None and obj.stock_shards.exists()
+
+    def get_readonly_fields(self, request, obj=None):
+        # A sharded variant's stock is a rollup of its shards; an edit here
+        # would be overwritten by the next sync_variant_stock.
+        return ('stock',) if self._sharded(obj) else ()
+
+    def get_fields(self, request, obj=None):
+        fields = super().get_fields(request, obj)
+        if not self._sharded(obj):
+            fields = [field for field in fields if field != 'receive_stock']
+        return fields
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        received = form.cleaned_data.get('receive_stock')
+        if received and self._sharded(obj):
+            add_stock(obj, received)
+            sync_variant_stock([obj.pk])
@@ -0,0 +1,263 @@
+import uuid
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+
+from agpkart.db.routers import read_from_primary
+from products.models import PATH_SEPARATOR, ProductListing, Variant
+
+FACETS = ('category', 'brand', 'price', 'size', 'color', 'in_stock')
+# (key, lower bound inclusive, upper bound exclusive) on a listing's min_price.
+PRICE_BANDS = (
+    ('0-500', Decimal('0'), Decimal('500')),
+    ('500-1000', Decimal('500'), Decimal('1000')),
+    ('1000-2500', Decimal('1000'), Decimal('2500')),
+    ('2500-5000', Decimal('2500'), Decimal('5000')),
+    ('5000+', Decimal('5000'), None),
+)
+CHANGE_TIMEOUT = 60 * 60
+
+_GENERATION_KEY = 'products:facets:generation'
+_SEQUENCE_KEY = 'products:facets:sequence'
+_index = None
+
+
+def _change_key(sequence):
+    return f'products:facets:change:{sequence}'
+
+
+def price_band(price):
+    for key, low, high in PRICE_BANDS:
+        if price >= low and (high is None or price < high):
+            return key
+    return None
+
+
+def _bitset(positions, size):
+    buf = bytearray((size >> 3) + 1)
+    for position in positions:
+        buf[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def _load_documents(product_ids=None):
+    """
+    Return {product_id: frozenset((facet, value), ...)} for active listings,
+    oldest first, plus the product ids that are not (or no longer) listed.
+    """
+    listings = ProductListing.objects.filter(is_active=True).order_by('created_at', 'product_id')
+    variants = Variant.objects.filter(is_active=True, product__listing__is_active=True).order_by()
+    if product_ids is not None:
+        listings = listings.filter(product_id__in=product_ids)
+        variants = variants.filter(product_id__in=product_ids)
+    documents = {}
+    rows = listings.values_list('product_id', 'category_path', 'brand', 'min_price', 'in_stock')
+    for product_id, path, brand, min_price, in_stock in rows.iterator():
+        values = {('category', int(segment)) for segment in path.split(PATH_SEPARATOR) if segment}
+        if brand:
+            values.add(('brand', brand))
+        values.add(('price', price_band(min_price)))
+        values.add(('in_stock', in_stock))
+        documents[product_id] = values
+    for product_id, size, color in variants.values_list('product_id', 'size', 'color').distinct().iterator():
+        if product_id in documents:
+            if size:
+                documents[product_id].add(('size', size))
+            if color:
+                documents[product_id].add(('color', color))
+    missing = set(product_ids or ()) - documents.keys()
+    return {pk: frozenset(values) for pk, values in documents.items()}, missing
+
+
+class FacetIndex:
+    """
+    Posting lists of every facet value as integer bitsets over document
+    positions. Positions follow listing creation order, so the newest
+    products are the highest bits and paging walks the bitset downwards.
+
+    Selected values are ORed within a facet and ANDed across facets; the
+    counts of each facet are taken with every *other* facet applied, so the
+    options of a facet never zero each other out.
+    """
+    def __init__(self, documents, generation=None, sequence=0):
+        self.generation = generation
+        self.sequence = sequence
+        self.product_ids = list(documents)
+        self.positions = {pk: position for position, pk in enumerate(self.product_ids)}
+        self.values = [documents[pk] for pk in self.product_ids]
+        size = len(self.product_ids)
+        grouped = {}
+        for position, values in enumerate(self.values):
+            for key in values:
+                grouped.setdefault(key, []).append(position)
+        self.postings = {facet: {} for facet in FACETS}
+        for (facet, value), positions in grouped.items():
+            self.postings[facet][value] = _bitset(positions, size)
+        self.live = (1 << size) - 1
+
+    def __len__(self):
+        return self.live.bit_count()
+
+    @property
+    def size(self):
+        """Number of document positions, live or not; valid cursors lie below it."""
+        return len(self.product_ids)
+
+    def update(self, documents, removed=()):
+        """Apply changed documents and drop removed products in place."""
+        for product_id in removed:
+            position = self.positions.get(product_id)
+            if position is not None:
+                self._set(position, frozenset())
+                self.live &= ~(1 << position)
+        for product_id, values in documents.items():
+            position = self.positions.get(product_id)
+            if position is None:
+                position = len(self.product_ids)
+                self.product_ids.append(product_id)
+                self.values.append(frozenset())
+                self.positions[product_id] = position
+            self._set(position, values)
+            self.live |= 1 << position
+
+    def _set(self, position, values):
+        bit = 1 << position
+        old = self.values[position]
+        for facet, value in old - values:
+            postings = self.postings[facet]
+            postings[value] &= ~bit
+            if not postings[value]:
+                del postings[value]
+        for facet, value in values - old:
+            postings = self.postings[facet]
+            postings[value] = postings.get(value, 0) | bit
+        self.values[position] = values
+
+    def query(self, selected):
+        """
+        Return (matches, counts) for `selected` ({facet: iterable of values}):
+        the bitset of matching documents and {facet: {value: count}}.
+        """
+        masks = {}
+        for facet, values in selected.items():
+            if values:
+                postings = self.postings[facet]
+                mask = 0
+                for value in values:
+                    mask |= postings.get(value, 0)
+                masks[facet] = mask
+        matches = self.live
+        for mask in masks.values():
+            matches &= mask
+        counts = {}
+        for facet in FACETS:
+            base = self.live
+            for other, mask in masks.items():
+                if other != facet:
+                    base &= mask
+            counts[facet] = {
+                value: count
+                for value, posting in self.postings[facet].items()
+                if (count := (posting & base).bit_count())
+            }
+        return matches, counts
+
+    def page(self, matches, per_page, after=None, before=None):
+        """
+        Return (product_ids, next_cursor, previous_cursor) for one page of
+        `matches`, newest first. Cursors are document positions, and must lie
+        within the index: they feed bit shifts.
+        """
+        for cursor in (after, before):
+            if cursor is not None and not 0 <= cursor < self.size:
+                raise ValueError(f"Cursor {cursor} is outside the index.")
+        if before is not None:
+            remaining = matches >> (before + 1)
+            positions = []
+            while remaining and len(positions) < per_page + 1:
+                low = remaining & -remaining
+                positions.append(before + low.bit_length())
+                remaining ^= low
+            has_more = len(positions) > per_page
+            positions = positions[:per_page][::-1]
+            next_cursor = positions[-1] if positions else None
+            previous_cursor = positions[0] if positions and has_more else None
+        else:
+            remaining = matches if after is None else matches & ((1 << after) - 1)
+            positions = []
+            while remaining and len(positions) < per_page + 1:
+                position = remaining.bit_length() - 1
+                positions.append(position)
+                remaining ^= 1 << position
+            has_more = len(positions) > per_page
+            positions = positions[:per_page]
+            next_cursor = positions[-1] if positions and has_more else None
+            previous_cursor = positions[0] if positions and after is not None else None
+        return [self.product_ids[position] for position in positions], next_cursor, previous_cursor
+
+
+def _build(generation, sequence):
+    with read_from_primary():
+        documents, _ = _load_documents()
+    return FacetIndex(documents, generation, sequence)
+
+
+def get_index():
+    """
+    Return this process's facet index, catching up on product changes that
+    other processes announced through notify_changed, or rebuilding it when
+    the change log no longer reaches back far enough.
+    """
+    global _index
+    generation = cache.get(_GENERATION_KEY)
+    if generation is None:
+        cache.add(_GENERATION_KEY, uuid.uuid4().hex, None)
+        cache.add(_SEQUENCE_KEY, 0, None)
+        generation = cache.get(_GENERATION_KEY)
+        if generation is None:
+            # A dummy cache cannot carry changes; always build from the database.
+            return _build(None, 0)
+    sequence = cache.get(_SEQUENCE_KEY) or 0
+    if _index is None or _index.generation != generation or _index.sequence > sequence:
+        _index = _build(generation, sequence)
+        return _index
+    if _index.sequence < sequence:
+        changes = cache.get_many([_change_key(n) for n in range(_index.sequence + 1, sequence + 1)])
+        if len(changes) < sequence - _index.sequence:
+            _index = _build(generation, sequence)
+            return _index
+        product_ids = {pk for ids in changes.values() for pk in ids}
+        with read_from_primary():
+            documents, removed = _load_documents(product_ids)
+        _index.update(documents, removed)
+        _index.sequence = sequence
+    return _index
+
+
+def notify_changed(product_ids):
+    """
+    Announce that the facet values of `product_ids` may have changed, once
+    the surrounding transaction commits, so every process can patch its
+    index instead of rebuilding it.
+    """
+    product_ids = list(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: _append_change(product_ids))
+
+
+def _append_change(product_ids):
+    try:
+        sequence = cache.incr(_SEQUENCE_KEY)
+    except ValueError:
+        invalidate()
+        return
+    cache.set(_change_key(sequence), product_ids, CHANGE_TIMEOUT)
+
+
+def invalidate():
+    """Make every process rebuild its facet index on next use."""
+    global _index
+    cache.set(_GENERATION_KEY, uuid.uuid4().hex, None)
+    cache.set(_SEQUENCE_KEY, 0, None)
+    _index = None
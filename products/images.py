@@ -0,0 +1,162 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models.fields.files import FieldFile
+from PIL import Image, ImageOps
+
+from jobs.models import Job
+from jobs.queue import enqueue
+
+IMAGE_QUEUE = 'images'
+GENERATE_TASK = 'products.generate_image_derivatives'
+# Bumping this regenerates every derivative under new names.
+DERIVATIVE_VERSION = 'v1'
+DERIVATIVE_ROOT = f'derivatives/{DERIVATIVE_VERSION}'
+# Thumbnails, storefront listing cards, and the product gallery. Sources
+# narrower than a width get one derivative at their own width instead.
+DERIVATIVE_WIDTHS = (160, 480, 960)
+WEBP = 'webp'
+ENCODERS = {
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'png': ('png', {'optimize': True}),
+    WEBP: ('webp', {'quality': 80, 'method': 6}),
+}
+MANIFEST_TIMEOUT = 60 * 60
+
+
+def source_name(image):
+    """The storage name behind a FieldFile or a plain name; '' when there is none."""
+    if isinstance(image, FieldFile):
+        return image.name or ''
+    return image or ''
+
+
+def derivative_name(name, width, image_format):
+    """
+    Where a derivative of `name` lives under MEDIA_ROOT; the same source,
+    width and format always give the same name.
+    """
+    return f'{DERIVATIVE_ROOT}/{name}/{width}w.{ENCODERS[image_format][0]}'
+
+
+def manifest_name(name):
+    return f'{DERIVATIVE_ROOT}/{name}/manifest.json'
+
+
+def _manifest_key(name):
+    return f'products:images:{DERIVATIVE_VERSION}:{name}'
+
+
+def _write(storage, name, content):
+    """Write a file under its final name in one step, so readers never see half of it."""
+    path = storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            output.write(content)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _encode(image, image_format):
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format.upper(), **ENCODERS[image_format][1])
+    return buffer.getvalue()
+
+
+def generate_derivatives(name, storage=None):
+    """
+    Resize and re-encode the image stored as `name` into every derivative
+    width, once in its own family (JPEG, or PNG when it has transparency)
+    and once as WebP. The manifest listing them is written last and marks
+    the set as complete. Returns the manifest.
+    """
+    storage = storage or default_storage
+    with storage.open(name) as source, Image.open(source) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+    transparent = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    image = image.convert('RGBA' if transparent else 'RGB')
+    family = 'png' if transparent else 'jpeg'
+
+    manifest = {family: [], WEBP: []}
+    for width in sorted({min(width, image.width) for width in DERIVATIVE_WIDTHS}):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+        for image_format in manifest:
+            derivative = derivative_name(name, width, image_format)
+            _write(storage, derivative, _encode(resized, image_format))
+            manifest[image_format].append([width, derivative])
+    _write(storage, manifest_name(name), json.dumps(manifest).encode())
+    cache.set(_manifest_key(name), manifest, MANIFEST_TIMEOUT)
+    return manifest
+
+
+def derivatives(image, storage=None):
+    """
+    {format: [[width, name], ...]} for a source image, or None while its
+    derivatives have not been generated.
+    """
+    name = source_name(image)
+    if not name:
+        return None
+    manifest = cache.get(_manifest_key(name))
+    if manifest is None:
+        storage = storage or default_storage
+        try:
+            with storage.open(manifest_name(name)) as stored:
+                manifest = json.loads(stored.read())
+        except (FileNotFoundError, ValueError):
+            return None
+        cache.set(_manifest_key(name), manifest, MANIFEST_TIMEOUT)
+    return manifest
+
+
+def schedule_derivatives(image, previous=None):
+    """
+    Queue derivative generation for a newly saved image on the image queue,
+    in the caller's transaction. Does nothing for empty fields, for a name
+    equal to `previous` (the one the row was loaded with, so resaving a
+    row costs nothing), for names a job is already queued for, and for
+    images that already have derivatives.
+    """
+    name = source_name(image)
+    if not name or name == source_name(previous):
+        return None
+    queued = Job.objects.filter(
+        queue=IMAGE_QUEUE, task=GENERATE_TASK, status__in=(Job.Status.PENDING, Job.Status.RUNNING), payload__name=name,
+    )
+    if queued.exists() or derivatives(name) is not None:
+        return None
+    return enqueue(GENERATE_TASK, {'name': name}, queue=IMAGE_QUEUE)
+
+
+def srcset(image, image_format=None, storage=None):
+    """
+    A `srcset` value (`url 160w, url 480w, ...`) for `image` in `image_format`,
+    or in the source's own family when that is None; '' until the
+    derivatives exist, so the browser falls back to `src`.
+    """
+    manifest = derivatives(image, storage)
+    if not manifest:
+        return ''
+    if image_format is None:
+        image_format = next(key for key in manifest if key != WEBP)
+    storage = storage or default_storage
+    return ', '.join(f'{storage.url(name)} {width}w' for width, name in manifest.get(image_format, []))
+
+
+def image_names():
+    """Every uploaded image that should have derivatives: product images and profile pictures."""
+    from products.models import ProductImage
+    from users.models import User
+    names = ProductImage.objects.exclude(image='').order_by().values_list('image', flat=True)
+    pictures = User.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True).order_by()
+    return names.union(pictures.values_list('profile_picture', flat=True))
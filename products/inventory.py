@@ -0,0 +1,183 @@
+import random
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.utils import timezone
+
+from agpkart.db.transactions import atomic_write
+from products.models import Reservation, StockShard, Variant
+
+DEFAULT_SHARDS = 8
+RESERVATION_TTL = timedelta(minutes=15)
+SWEEP_BATCH_SIZE = 500
+
+
+class OutOfStock(ValueError):
+    pass
+
+
+class ReservationExpired(ValueError):
+    pass
+
+
+def enable_sharding(variant, shards=DEFAULT_SHARDS):
+    """
+    Move a variant's stock into `shards` counters, spread as evenly as
+    possible. From then on its shards are the source of truth and
+    Variant.stock is a rollup refreshed by sync_variant_stock.
+    """
+    with atomic_write():
+        variant = Variant.objects.select_for_update().get(pk=variant.pk)
+        if StockShard.objects.filter(variant=variant).exists():
+            return
+        base, extra = divmod(variant.stock, shards)
+        StockShard.objects.bulk_create([
+            StockShard(variant=variant, index=i, available=base + (1 if i < extra else 0))
+            for i in range(shards)
+        ])
+
+
+def add_stock(variant, quantity):
+    """Add received units, spread over the shards with relative updates."""
+    shard_ids = list(StockShard.objects.filter(variant=variant).order_by('index').values_list('pk', flat=True))
+    if not shard_ids:
+        raise ValueError(f"Variant {variant.pk} is not sharded.")
+    base, extra = divmod(quantity, len(shard_ids))
+    delta = Case(*[When(pk=pk, then=Value(base + (1 if i < extra else 0))) for i, pk in enumerate(shard_ids)])
+    StockShard.objects.filter(pk__in=shard_ids).update(available=F('available') + delta)
+
+
+def _take(shard_id, quantity):
+    """Decrement one shard by `quantity` if it holds that many; the guard is in the UPDATE itself."""
+    return StockShard.objects.filter(pk=shard_id, available__gte=quantity).update(
+        available=F('available') - quantity,
+    ) == 1
+
+
+def reserve(variant_id, quantity, ttl=RESERVATION_TTL):
+    """
+    Hold `quantity` units of a variant and return the reservation token.
+
+    Shards are tried in random order so concurrent checkouts land on
+    different rows; each decrement is a conditional UPDATE that can never
+    take a shard below zero. When no single shard holds enough, the units
+    are gathered from several, all or nothing.
+    """
+    if quantity < 1:
+        raise ValueError("Quantity must be at least 1.")
+    shards = list(StockShard.objects.filter(variant_id=variant_id, available__gt=0).values_list('pk', 'available'))
+    random.shuffle(shards)
+    token = uuid.uuid4()
+    expires_at = timezone.now() + ttl
+    with transaction.atomic():
+        allocations = []
+        for shard_id, available in shards:
+            if available >= quantity and _take(shard_id, quantity):
+                allocations = [(shard_id, quantity)]
+                break
+        else:
+            needed = quantity
+            for shard_id, _ in shards:
+                while needed:
+                    held = StockShard.objects.filter(pk=shard_id).values_list('available', flat=True).first() or 0
+                    if not held:
+                        break
+                    take = min(held, needed)
+                    if _take(shard_id, take):
+                        allocations.append((shard_id, take))
+                        needed -= take
+                if not needed:
+                    break
+            if needed:
+                # Rolls back the partial decrements above.
+                raise OutOfStock(f"Only {quantity - needed} of {quantity} units of variant {variant_id} are available.")
+        Reservation.objects.bulk_create([
+            Reservation(token=token, variant_id=variant_id, shard_id=shard_id, quantity=taken, expires_at=expires_at)
+            for shard_id, taken in allocations
+        ])
+    return token
+
+
+def commit(token):
+    """Turn a live reservation into a sale; its units stay out of stock for good."""
+    updated = Reservation.objects.filter(
+        token=token, status=Reservation.Status.ACTIVE, expires_at__gt=timezone.now(),
+    ).update(status=Reservation.Status.COMMITTED)
+    if not updated:
+        raise ReservationExpired(f"Reservation {token} is no longer active.")
+
+
+def _release(reservations):
+    """
+    Flip active reservations to released and credit their shards, counting
+    only the rows this call flipped, so a concurrent commit or release of
+    the same rows is never credited twice.
+    """
+    batch = uuid.uuid4()
+    with transaction.atomic():
+        released = reservations.filter(status=Reservation.Status.ACTIVE).update(
+            status=Reservation.Status.RELEASED, release_batch=batch,
+        )
+        if not released:
+            return 0
+        credits = (
+            Reservation.objects.filter(release_batch=batch).order_by()
+            .values('shard_id').annotate(total=Sum('quantity'))
+        )
+        credit = Case(*[When(pk=row['shard_id'], then=Value(row['total'])) for row in credits])
+        StockShard.objects.filter(pk__in=[row['shard_id'] for row in credits]).update(available=F('available') + credit)
+    return released
+
+
+def release(token):
+    """Give the units of a reservation back, e.g. when a checkout is abandoned."""
+    return _release(Reservation.objects.filter(token=token))
+
+
+def release_expired(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Return the units of every expired reservation to its shard, a batch at a
+    time. Returns (rows released, ids of the variants touched).
+    """
+    now = now or timezone.now()
+    expired = Reservation.objects.filter(status=Reservation.Status.ACTIVE, expires_at__lte=now).order_by('pk')
+    released = 0
+    variant_ids = set()
+    last_pk = 0
+    while True:
+        batch = list(expired.filter(pk__gt=last_pk).values_list('pk', 'variant_id')[:batch_size])
+        if not batch:
+            return released, variant_ids
+        last_pk = batch[-1][0]
+        released += _release(Reservation.objects.filter(pk__in=[pk for pk, _ in batch]))
+        variant_ids.update(variant_id for _, variant_id in batch)
+
+
+def available_stock(variant_id):
+    return StockShard.objects.filter(variant_id=variant_id).aggregate(total=Sum('available'))['total'] or 0
+
+
+def sync_variant_stock(variant_ids=None):
+    """
+    Roll shard totals up into Variant.stock, which listings, carts and the
+    admin read, and refresh the affected listings. Returns the number of
+    variants whose stock changed.
+    """
+    from products.listing import refresh_listings
+    totals = StockShard.objects.order_by().values('variant_id').annotate(total=Sum('available'))
+    if variant_ids is not None:
+        totals = totals.filter(variant_id__in=variant_ids)
+    totals = {row['variant_id']: row['total'] for row in totals}
+    changed = [
+        Variant(pk=pk, stock=totals[pk])
+        for pk, stock in Variant.objects.filter(pk__in=totals).values_list('pk', 'stock')
+        if stock != totals[pk]
+    ]
+    if changed:
+        with transaction.atomic():
+            Variant.objects.bulk_update(changed, ['stock'])
+            product_ids = Variant.objects.filter(pk__in=[v.pk for v in changed]).order_by().values_list('product_id', flat=True)
+            refresh_listings(product_ids.distinct())
+    return len(changed)
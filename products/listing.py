@@ -0,0 +1,114 @@
+from django.db import transaction
+from django.db.models import F, Min, Max, Sum, Q, Value
+from django.db.models.functions import Coalesce, Concat, Greatest, Substr
+from django.utils import timezone
+
+from agpkart.db.routers import read_from_primary
+from products.models import Product, ProductImage, ProductListing, subtree_range
+from products import facets, page_cache
+from products.search import index_products
+
+LISTING_BATCH_SIZE = 500
+
+LISTING_UPDATE_FIELDS = [
+    'name', 'slug', 'category', 'category_path', 'brand', 'min_price', 'max_price',
+    'total_stock', 'in_stock', 'image', 'is_active', 'created_at',
+]
+
+
+@read_from_primary()
+def refresh_listings(product_ids):
+    """
+    Recompute the ProductListing rows of the given products.
+
+    One aggregate query over the active variants, one query for the primary
+    images, one upsert and one version bump, however many products are
+    passed in. The search index rows of the same products are refreshed
+    alongside, and the facet indexes and cached storefront pages are told
+    once the transaction commits.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return 0
+    active = Q(variants__is_active=True)
+    price = Coalesce('variants__price', 'base_price')
+    products = Product.objects.filter(pk__in=product_ids).select_related('category').annotate(
+        variant_min_price=Min(price, filter=active),
+        variant_max_price=Max(price, filter=active),
+        variant_stock=Coalesce(Sum('variants__stock', filter=active), Value(0)),
+    ).order_by()
+
+    images = {}
+    primary = ProductImage.objects.filter(product_id__in=product_ids, variant__isnull=True)
+    for product_id, image in primary.order_by('product_id', '-sort_order', '-id').values_list('product_id', 'image'):
+        images[product_id] = image  # the last one written per product is the lowest sort_order
+
+    # Pages of the categories a product is leaving must be purged too.
+    previous_paths = ProductListing.objects.filter(pk__in=product_ids).order_by().values_list('category_path', flat=True)
+    tags = {page_cache.LISTINGS_TAG}
+    for path in previous_paths.distinct():
+        tags.update(page_cache.path_tags(path))
+
+    now = timezone.now()
+    listings = []
+    for product in products:
+        listings.append(ProductListing(
+            product=product,
+            name=product.name,
+            slug=product.slug,
+            category=product.category,
+            category_path=product.category.path,
+            brand=product.brand,
+            min_price=product.variant_min_price if product.variant_min_price is not None else product.base_price,
+            max_price=product.variant_max_price if product.variant_max_price is not None else product.base_price,
+            total_stock=product.variant_stock,
+            in_stock=product.variant_stock > 0,
+            image=images.get(product.pk, ''),
+            is_active=product.is_active,
+            created_at=product.created_at,
+            updated_at=now,
+        ))
+    ProductListing.objects.bulk_create(
+        listings,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=LISTING_UPDATE_FIELDS,
+    )
+    # Outside the upsert, which can only copy values: the version counts up
+    # and updated_at never moves back, even if the clock does.
+    ProductListing.objects.filter(pk__in=product_ids).update(
+        version=F('version') + 1, updated_at=Greatest('updated_at', Value(now)),
+    )
+    index_products(product_ids)
+    facets.notify_changed(product_ids)
+    for listing in listings:
+        tags.add(page_cache.product_tag(listing.product_id))
+        tags.update(page_cache.path_tags(listing.category_path))
+    page_cache.invalidate_tags(tags)
+    return len(listings)
+
+
+def move_listing_paths(old_path, new_path):
+    """Rewrite the category path prefix of listings after a category moves."""
+    ProductListing.objects.filter(**subtree_range('category_path', old_path)).update(
+        category_path=Concat(Value(new_path), Substr('category_path', len(old_path) + 1)),
+    )
+    transaction.on_commit(facets.invalidate)
+
+
+def rebuild_listings(batch_size=LISTING_BATCH_SIZE):
+    """Recompute every listing row, a primary key batch at a time."""
+    rebuilt = 0
+    last_pk = 0
+    product_ids = Product.objects.order_by('pk').values_list('pk', flat=True)
+    while True:
+        batch = list(product_ids.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return rebuilt
+        rebuilt += refresh_listings(batch)
+        last_pk = batch[-1]
+
+
+def category_listings(category):
+    """Active listings anywhere under `category`, as a single range query."""
+    return ProductListing.objects.filter(is_active=True, **subtree_range('category_path', category.path))
@@ -0,0 +1,88 @@
+import itertools
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from products.search import SEARCH_PAGE_SIZE, correct_terms, insert_rows, is_supported, match_product_ids, query_terms
+
+WORDS = (
+    "cotton linen denim silk wool leather shirt kurta saree jeans jacket sneaker sandal watch wallet "
+    "backpack kettle blender mixer lamp cushion curtain blanket pillow phone charger cable earphone "
+    "speaker keyboard mouse monitor tablet laptop camera tripod bottle mug plate bowl spoon knife "
+    "classic slim regular relaxed printed striped checked solid floral embroidered casual formal "
+    "party ethnic sports running walking travel office kitchen bedroom outdoor wireless portable"
+).split()
+BRANDS = "Aarna Bharat Chitra Devika Ekam Falak Gaurav Himani Ishaan Jivan".split()
+CATEGORIES = "Fashion Men Women Kids Electronics Home Kitchen Sports Footwear Accessories".split()
+SYLLABLES = "ka ri to mu ne sa vi lo de pa ha ju ro mi te na gu ze bo li".split()
+SYNTHETIC_WORDS = 20_000
+QUERIES = ["cotton shirt", "wireless speak", "leather wallet", "floral sa", "kurta", "slim jeans", "portabel blendr"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure search latency against synthetic products. Rows go into the "
+        "live search table inside a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1_000_000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            raise CommandError("The full-text search index needs SQLite with FTS5.")
+        rng = random.Random(options["seed"])
+        # A Zipf-distributed vocabulary of real and made-up words, so term
+        # selectivity looks like a catalog rather than a handful of words.
+        synthetic = sorted({"".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(SYNTHETIC_WORDS)})
+        rng.shuffle(synthetic)
+        self.vocabulary = synthetic[:50] + WORDS + synthetic[50:]
+        self.cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(self.vocabulary) + 1)))
+        with transaction.atomic():
+            started = time.perf_counter()
+            self._populate(rng, options["products"])
+            self.stdout.write(f"Indexed {options['products']} products in {time.perf_counter() - started:.1f}s")
+            for query in QUERIES:
+                terms = query_terms(query)
+                exact = self._time(lambda: match_product_ids(terms, SEARCH_PAGE_SIZE + 1), options["repeat"])
+                fuzzy = self._time(lambda: match_product_ids(correct_terms(terms), SEARCH_PAGE_SIZE + 1), options["repeat"])
+                self.stdout.write(
+                    f"{query!r:>20}  ranked p50 {exact[0]:7.2f}ms p95 {exact[1]:7.2f}ms"
+                    f"  | corrected p50 {fuzzy[0]:7.2f}ms p95 {fuzzy[1]:7.2f}ms"
+                )
+            transaction.set_rollback(True)
+
+    def _populate(self, rng, count, batch_size=10_000):
+        offset = 1 << 40  # far above any real product id
+        with connection.cursor() as cursor:
+            for start in range(0, count, batch_size):
+                insert_rows(
+                    cursor,
+                    [
+                        (
+                            offset + i,
+                            " ".join(self._words(rng, 4)),
+                            rng.choice(BRANDS),
+                            " ".join(rng.sample(CATEGORIES, 2)),
+                            " ".join(self._words(rng, 30)),
+                        )
+                        for i in range(start, min(start + batch_size, count))
+                    ],
+                )
+
+    def _words(self, rng, count):
+        return rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=count)
+
+    def _time(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.95) - 1 if len(timings) > 1 else 0]
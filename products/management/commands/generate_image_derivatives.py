@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.images import IMAGE_QUEUE, image_names, schedule_derivatives
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue derivative generation for every product image and profile picture that has none yet; "
+        f"run_jobs --queue {IMAGE_QUEUE} does the work."
+    )
+
+    def handle(self, *args, **options):
+        queued = sum(1 for name in image_names().iterator() if schedule_derivatives(name))
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} images for derivatives."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.listing import LISTING_BATCH_SIZE, rebuild_listings
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized product listing table from the catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=LISTING_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_listings(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} product listings."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.search import INDEX_BATCH_SIZE, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text product search index from the catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=INDEX_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} products."))
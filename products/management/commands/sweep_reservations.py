@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from products.inventory import SWEEP_BATCH_SIZE, release_expired, sync_variant_stock
+
+
+class Command(BaseCommand):
+    help = "Return the units of expired reservations to stock and roll shard totals up into variant stock."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=SWEEP_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        released, variant_ids = release_expired(batch_size=options["batch_size"])
+        synced = sync_variant_stock()
+        self.stdout.write(self.style.SUCCESS(
+            f"Released {released} expired reservations across {len(variant_ids)} variants; "
+            f"updated stock of {synced} variants."
+        ))
@@ -0,0 +1,167 @@
+# Generated by Django 5.2 on 2026-10-16 22:34
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='The product title shown to buyers', max_length=255, verbose_name='name')),
+                ('slug', models.SlugField(help_text='URL identifier for the product', max_length=280, unique=True, verbose_name='slug')),
+                ('brand', models.CharField(blank=True, help_text='The brand or manufacturer name', max_length=100, verbose_name='brand')),
+                ('description', models.TextField(blank=True, help_text='Full product description', verbose_name='description')),
+                ('base_price', models.DecimalField(decimal_places=2, help_text='Default price for variants that do not set their own', max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name='base price')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this product is shown in the storefront', verbose_name='active')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When this product was created', verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='When this product was last updated', verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'product',
+                'verbose_name_plural': 'products',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='The display name of the category', max_length=100, verbose_name='name')),
+                ('slug', models.SlugField(help_text='URL identifier for the category', max_length=120, unique=True, verbose_name='slug')),
+                ('path', models.CharField(blank=True, editable=False, help_text='Materialized path of zero-padded ancestor ids, root first', max_length=255, verbose_name='path')),
+                ('depth', models.PositiveSmallIntegerField(default=0, editable=False, help_text='Number of ancestors above this category', verbose_name='depth')),
+                ('sort_order', models.PositiveIntegerField(default=0, help_text='Position of the category among its siblings', verbose_name='sort order')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this category is shown in the storefront', verbose_name='active')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When this category was created', verbose_name='created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='When this category was last updated', verbose_name='updated at')),
+                ('parent', models.ForeignKey(blank=True, help_text='The category this one is nested under', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='products.category', verbose_name='parent category')),
+            ],
+            options={
+                'verbose_name': 'category',
+                'verbose_name_plural': 'categories',
+                'ordering': ['path'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductListing',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='products.product', verbose_name='product')),
+                ('name', models.CharField(max_length=255, verbose_name='name')),
+                ('slug', models.SlugField(max_length=280, verbose_name='slug')),
+                ('category_path', models.CharField(max_length=255, verbose_name='category path')),
+                ('brand', models.CharField(blank=True, max_length=100, verbose_name='brand')),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='minimum price')),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='maximum price')),
+                ('total_stock', models.PositiveIntegerField(default=0, verbose_name='total stock')),
+                ('in_stock', models.BooleanField(default=False, verbose_name='in stock')),
+                ('image', models.CharField(blank=True, max_length=255, verbose_name='primary image')),
+                ('is_active', models.BooleanField(default=True, verbose_name='active')),
+                ('created_at', models.DateTimeField(verbose_name='created at')),
+                ('updated_at', models.DateTimeField(verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'product listing',
+                'verbose_name_plural': 'product listings',
+                'ordering': ['-created_at', '-product_id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='category',
+            field=models.ForeignKey(help_text='The most specific category this product belongs to', on_delete=django.db.models.deletion.PROTECT, related_name='products', to='products.category', verbose_name='category'),
+        ),
+        migrations.CreateModel(
+            name='Variant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(help_text='Stock keeping unit, unique across the catalog', max_length=64, unique=True, verbose_name='SKU')),
+                ('size', models.CharField(blank=True, help_text='Size label, e.g. S, M, L or 42', max_length=20, verbose_name='size')),
+                ('color', models.CharField(blank=True, help_text='Colour name', max_length=30, verbose_name='color')),
+                ('price', models.DecimalField(blank=True, decimal_places=2, help_text='Variant price; falls back to the product base price', max_digits=10, null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='price')),
+                ('stock', models.PositiveIntegerField(default=0, help_text='Units available to sell', verbose_name='stock')),
+                ('is_active', models.BooleanField(default=True, help_text='Designates whether this variant can be purchased', verbose_name='active')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='When this variant was last updated', verbose_name='updated at')),
+                ('product', models.ForeignKey(help_text='The product this variant belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='products.product', verbose_name='product')),
+            ],
+            options={
+                'verbose_name': 'variant',
+                'verbose_name_plural': 'variants',
+                'ordering': ['product', 'size', 'color'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(help_text='The image file', upload_to='products/%Y/%m/%d/', verbose_name='image')),
+                ('alt_text', models.CharField(blank=True, help_text='Alternative text for accessibility', max_length=255, verbose_name='alt text')),
+                ('sort_order', models.PositiveIntegerField(default=0, help_text='Position of the image in the gallery; the first is the primary image', verbose_name='sort order')),
+                ('product', models.ForeignKey(help_text='The product this image shows', on_delete=django.db.models.deletion.CASCADE, related_name='images', to='products.product', verbose_name='product')),
+                ('variant', models.ForeignKey(blank=True, help_text='The variant this image shows, if it is variant specific', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='images', to='products.variant', verbose_name='variant')),
+            ],
+            options={
+                'verbose_name': 'product image',
+                'verbose_name_plural': 'product images',
+                'ordering': ['product', 'sort_order', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='products_ca_path_e3cf32_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['parent', 'sort_order'], name='products_ca_parent__8d4071_idx'),
+        ),
+        migrations.AddField(
+            model_name='productlisting',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.category', verbose_name='category'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category'], name='products_pr_categor_9edb3d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['brand'], name='products_pr_brand_4bfaa4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'created_at'], name='products_pr_is_acti_defdf1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='variant',
+            index=models.Index(fields=['product', 'is_active'], name='products_va_product_502998_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productimage',
+            index=models.Index(fields=['product', 'sort_order'], name='products_pr_product_f88290_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(fields=['is_active', 'category_path', 'created_at'], name='products_pr_is_acti_de6c3d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(fields=['is_active', 'created_at'], name='products_pr_is_acti_5c1b6a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(fields=['is_active', 'min_price'], name='products_pr_is_acti_a1d465_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(fields=['brand'], name='products_pr_brand_103452_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def create_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE products_search USING fts5("
+        "name, brand, categories, description, "
+        "tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    # Rank by bm25 with the name weighted well above the description.
+    schema_editor.execute(
+        "INSERT INTO products_search (products_search, rank) VALUES ('rank', 'bm25(10.0, 4.0, 2.0, 1.0)')"
+    )
+    schema_editor.execute("CREATE VIRTUAL TABLE products_search_vocab USING fts5vocab(products_search, 'row')")
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS products_search_vocab")
+    schema_editor.execute("DROP TABLE IF EXISTS products_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_catalog'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
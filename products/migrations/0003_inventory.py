@@ -0,0 +1,60 @@
+# Generated by Django 5.2 on 2026-10-16 22:52
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField(help_text='Position of the shard among the variant shards', verbose_name='index')),
+                ('available', models.PositiveIntegerField(default=0, help_text='Units in this shard that can still be reserved', verbose_name='available')),
+                ('variant', models.ForeignKey(help_text='The variant whose stock this shard holds', on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='products.variant', verbose_name='variant')),
+            ],
+            options={
+                'verbose_name': 'stock shard',
+                'verbose_name_plural': 'stock shards',
+                'ordering': ['variant', 'index'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Reservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.UUIDField(db_index=True, help_text='Identifies every row of one reservation', verbose_name='token')),
+                ('quantity', models.PositiveIntegerField(help_text='Units held from the shard', validators=[django.core.validators.MinValueValidator(1)], verbose_name='quantity')),
+                ('status', models.CharField(choices=[('active', 'Active'), ('committed', 'Committed'), ('released', 'Released')], default='active', help_text='Whether the units are still held, sold or returned to the shard', max_length=10, verbose_name='status')),
+                ('release_batch', models.UUIDField(blank=True, help_text='The release that returned these units, so they are credited exactly once', null=True, verbose_name='release batch')),
+                ('expires_at', models.DateTimeField(help_text='When the held units return to stock unless committed', verbose_name='expires at')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When the units were reserved', verbose_name='created at')),
+                ('variant', models.ForeignKey(help_text='The variant being reserved', on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='products.variant', verbose_name='variant')),
+                ('shard', models.ForeignKey(help_text='The stock shard the units were taken from', on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='products.stockshard', verbose_name='shard')),
+            ],
+            options={
+                'verbose_name': 'reservation',
+                'verbose_name_plural': 'reservations',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stockshard',
+            constraint=models.UniqueConstraint(fields=('variant', 'index'), name='unique_variant_shard'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'expires_at'], name='products_re_status_b2d8c5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['release_batch'], name='products_re_release_b73df9_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+def create_words_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # The same text as products_search without stemming: its vocabulary is
+    # made of words as written, for prefix completion and spelling fixes.
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE products_search_words USING fts5("
+        "words, tokenize = 'unicode61 remove_diacritics 2', detail = none)"
+    )
+    schema_editor.execute(
+        "INSERT INTO products_search_words (rowid, words) "
+        "SELECT rowid, name || ' ' || brand || ' ' || categories || ' ' || description FROM products_search"
+    )
+    schema_editor.execute("DROP TABLE products_search_vocab")
+    schema_editor.execute("CREATE VIRTUAL TABLE products_search_vocab USING fts5vocab(products_search_words, 'row')")
+
+
+def drop_words_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS products_search_vocab")
+    schema_editor.execute("DROP TABLE IF EXISTS products_search_words")
+    schema_editor.execute("CREATE VIRTUAL TABLE products_search_vocab USING fts5vocab(products_search, 'row')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_inventory'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_words_table, drop_words_table),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-17 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_search_words'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productlisting',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='version'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(fields=['category_path', 'updated_at'], name='products_pr_categor_565bdd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(fields=['updated_at'], name='products_pr_updated_d6978c_idx'),
+        ),
+    ]
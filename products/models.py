@@ -0,0 +1,537 @@
+from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+from django.utils.translation import gettext_lazy as _
+from django.core.validators import MinValueValidator
+
+from agpkart.db.transactions import atomic_write
+
+# Width of one materialized path segment; each segment is a zero-padded pk.
+PATH_SEGMENT_WIDTH = 8
+PATH_SEPARATOR = '/'
+
+
+class Category(models.Model):
+    """
+    Product category stored as a materialized path, so a whole subtree is a
+    single range scan on the indexed `path` column.
+    """
+    name = models.CharField(
+        _('name'),
+        max_length=100,
+        help_text=_('The display name of the category')
+    )
+    slug = models.SlugField(
+        _('slug'),
+        max_length=120,
+        unique=True,
+        help_text=_('URL identifier for the category')
+    )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        related_name='children',
+        verbose_name=_('parent category'),
+        help_text=_('The category this one is nested under')
+    )
+    path = models.CharField(
+        _('path'),
+        max_length=255,
+        blank=True,
+        editable=False,
+        help_text=_('Materialized path of zero-padded ancestor ids, root first')
+    )
+    depth = models.PositiveSmallIntegerField(
+        _('depth'),
+        default=0,
+        editable=False,
+        help_text=_('Number of ancestors above this category')
+    )
+    sort_order = models.PositiveIntegerField(
+        _('sort order'),
+        default=0,
+        help_text=_('Position of the category among its siblings')
+    )
+    is_active = models.BooleanField(
+        _('active'),
+        default=True,
+        help_text=_('Designates whether this category is shown in the storefront')
+    )
+    created_at = models.DateTimeField(
+        _('created at'),
+        auto_now_add=True,
+        help_text=_('When this category was created')
+    )
+    updated_at = models.DateTimeField(
+        _('updated at'),
+        auto_now=True,
+        help_text=_('When this category was last updated')
+    )
+
+    class Meta:
+        verbose_name = _('category')
+        verbose_name_plural = _('categories')
+        ordering = ['path']
+        indexes = [
+            models.Index(fields=['path']),
+            models.Index(fields=['parent', 'sort_order']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def build_path(self):
+        segment = f"{self.pk:0{PATH_SEGMENT_WIDTH}d}{PATH_SEPARATOR}"
+        parent_path = self.parent.path if self.parent_id else ''
+        if self.path and parent_path.startswith(self.path):
+            raise ValueError(_('A category cannot be moved under itself or its descendants.'))
+        return parent_path + segment
+
+    def save(self, *args, **kwargs):
+        with atomic_write():
+            old_path = self.path
+            renamed = bool(old_path) and not Category.objects.filter(pk=self.pk, name=self.name).exists()
+            super().save(*args, **kwargs)
+            new_path = self.build_path()
+            from products.page_cache import CATEGORIES_TAG, invalidate_tags, path_tags
+            invalidate_tags([CATEGORIES_TAG, *path_tags(old_path), *path_tags(new_path)])
+            if new_path == old_path:
+                if renamed:
+                    from products.search import reindex_category
+                    reindex_category(self.path)
+                return
+            self.path = new_path
+            self.depth = new_path.count(PATH_SEPARATOR) - 1
+            Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+            if old_path:
+                # Re-parented: rewrite the prefix of every descendant in one statement.
+                Category.objects.filter(**subtree_range('path', old_path)).exclude(pk=self.pk).update(
+                    path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + (self.depth - (old_path.count(PATH_SEPARATOR) - 1)),
+                )
+                from products.listing import move_listing_paths
+                from products.search import reindex_category
+                move_listing_paths(old_path, new_path)
+                reindex_category(new_path)
+
+    def get_ancestor_ids(self):
+        return [int(segment) for segment in self.path.split(PATH_SEPARATOR) if segment][:-1]
+
+    def get_descendants(self, include_self=True):
+        categories = Category.objects.filter(**subtree_range('path', self.path))
+        if not include_self:
+            categories = categories.exclude(pk=self.pk)
+        return categories
+
+
+def subtree_range(field, path):
+    """
+    Lookup kwargs matching `path` and everything below it as a plain range,
+    which any B-tree index can serve (unlike LIKE 'prefix%' on SQLite).
+    Segments are digits, so bumping the trailing separator to '0' gives the
+    first value past the subtree.
+    """
+    upper = path[:-1] + chr(ord(PATH_SEPARATOR) + 1)
+    return {f'{field}__gte': path, f'{field}__lt': upper}
+
+
+class Product(models.Model):
+    """
+    A sellable item. Prices and stock live on its variants; the storefront
+    reads the denormalized ProductListing row instead of joining them.
+    """
+    name = models.CharField(
+        _('name'),
+        max_length=255,
+        help_text=_('The product title shown to buyers')
+    )
+    slug = models.SlugField(
+        _('slug'),
+        max_length=280,
+        unique=True,
+        help_text=_('URL identifier for the product')
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.PROTECT,
+        related_name='products',
+        verbose_name=_('category'),
+        help_text=_('The most specific category this product belongs to')
+    )
+    brand = models.CharField(
+        _('brand'),
+        max_length=100,
+        blank=True,
+        help_text=_('The brand or manufacturer name')
+    )
+    description = models.TextField(
+        _('description'),
+        blank=True,
+        help_text=_('Full product description')
+    )
+    base_price = models.DecimalField(
+        _('base price'),
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(0)],
+        help_text=_('Default price for variants that do not set their own')
+    )
+    is_active = models.BooleanField(
+        _('active'),
+        default=True,
+        help_text=_('Designates whether this product is shown in the storefront')
+    )
+    created_at = models.DateTimeField(
+        _('created at'),
+        auto_now_add=True,
+        help_text=_('When this product was created')
+    )
+    updated_at = models.DateTimeField(
+        _('updated at'),
+        auto_now=True,
+        help_text=_('When this product was last updated')
+    )
+
+    class Meta:
+        verbose_name = _('product')
+        verbose_name_plural = _('products')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['category']),
+            models.Index(fields=['brand']),
+            models.Index(fields=['is_active', 'created_at']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from products.listing import refresh_listings
+        refresh_listings([self.pk])
+
+    def delete(self, *args, **kwargs):
+        product_id, category_path = self.pk, self.category.path
+        result = super().delete(*args, **kwargs)
+        from products.facets import notify_changed
+        from products.page_cache import LISTINGS_TAG, invalidate_tags, path_tags, product_tag
+        from products.search import remove_products
+        remove_products([product_id])
+        notify_changed([product_id])
+        invalidate_tags([LISTINGS_TAG, product_tag(product_id), *path_tags(category_path)])
+        return result
+
+
+class Variant(models.Model):
+    """
+    A purchasable option of a product (size, colour, ...), with its own SKU,
+    price and stock.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='variants',
+        verbose_name=_('product'),
+        help_text=_('The product this variant belongs to')
+    )
+    sku = models.CharField(
+        _('SKU'),
+        max_length=64,
+        unique=True,
+        help_text=_('Stock keeping unit, unique across the catalog')
+    )
+    size = models.CharField(
+        _('size'),
+        max_length=20,
+        blank=True,
+        help_text=_('Size label, e.g. S, M, L or 42')
+    )
+    color = models.CharField(
+        _('color'),
+        max_length=30,
+        blank=True,
+        help_text=_('Colour name')
+    )
+    price = models.DecimalField(
+        _('price'),
+        max_digits=10,
+        decimal_places=2,
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(0)],
+        help_text=_('Variant price; falls back to the product base price')
+    )
+    stock = models.PositiveIntegerField(
+        _('stock'),
+        default=0,
+        help_text=_('Units available to sell')
+    )
+    is_active = models.BooleanField(
+        _('active'),
+        default=True,
+        help_text=_('Designates whether this variant can be purchased')
+    )
+    updated_at = models.DateTimeField(
+        _('updated at'),
+        auto_now=True,
+        help_text=_('When this variant was last updated')
+    )
+
+    class Meta:
+        verbose_name = _('variant')
+        verbose_name_plural = _('variants')
+        ordering = ['product', 'size', 'color']
+        indexes = [
+            models.Index(fields=['product', 'is_active']),
+        ]
+
+    def __str__(self):
+        options = " / ".join(filter(None, [self.size, self.color]))
+        return f"{self.product.name} ({options or self.sku})"
+
+    def get_price(self):
+        return self.price if self.price is not None else self.product.base_price
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from products.listing import refresh_listings
+        refresh_listings([self.product_id])
+
+    def delete(self, *args, **kwargs):
+        product_id = self.product_id
+        result = super().delete(*args, **kwargs)
+        from products.listing import refresh_listings
+        refresh_listings([product_id])
+        return result
+
+
+class ProductImage(models.Model):
+    """
+    Image of a product, optionally specific to one variant.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='images',
+        verbose_name=_('product'),
+        help_text=_('The product this image shows')
+    )
+    variant = models.ForeignKey(
+        Variant,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='images',
+        verbose_name=_('variant'),
+        help_text=_('The variant this image shows, if it is variant specific')
+    )
+    image = models.ImageField(
+        _('image'),
+        upload_to='products/%Y/%m/%d/',
+        help_text=_('The image file')
+    )
+    alt_text = models.CharField(
+        _('alt text'),
+        max_length=255,
+        blank=True,
+        help_text=_('Alternative text for accessibility')
+    )
+    sort_order = models.PositiveIntegerField(
+        _('sort order'),
+        default=0,
+        help_text=_('Position of the image in the gallery; the first is the primary image')
+    )
+
+    class Meta:
+        verbose_name = _('product image')
+        verbose_name_plural = _('product images')
+        ordering = ['product', 'sort_order', 'id']
+        indexes = [
+            models.Index(fields=['product', 'sort_order']),
+        ]
+
+    def __str__(self):
+        return self.alt_text or self.image.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored name, so save() can tell a new upload from a resave.
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from products.images import schedule_derivatives
+        from products.listing import refresh_listings
+        schedule_derivatives(self.image, getattr(self, '_loaded_image', None))
+        self._loaded_image = self.image.name
+        refresh_listings([self.product_id])
+
+    def delete(self, *args, **kwargs):
+        product_id = self.product_id
+        result = super().delete(*args, **kwargs)
+        from products.listing import refresh_listings
+        refresh_listings([product_id])
+        return result
+
+
+class ProductListing(models.Model):
+    """
+    Denormalized, read-only projection of a product for listing pages: one
+    narrow row per product carrying its category path, price range, stock
+    and primary image. Maintained by products.listing on every catalog write.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='listing',
+        verbose_name=_('product')
+    )
+    name = models.CharField(_('name'), max_length=255)
+    slug = models.SlugField(_('slug'), max_length=280)
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('category')
+    )
+    category_path = models.CharField(_('category path'), max_length=255)
+    brand = models.CharField(_('brand'), max_length=100, blank=True)
+    min_price = models.DecimalField(_('minimum price'), max_digits=10, decimal_places=2)
+    max_price = models.DecimalField(_('maximum price'), max_digits=10, decimal_places=2)
+    total_stock = models.PositiveIntegerField(_('total stock'), default=0)
+    in_stock = models.BooleanField(_('in stock'), default=False)
+    image = models.CharField(_('primary image'), max_length=255, blank=True)
+    is_active = models.BooleanField(_('active'), default=True)
+    created_at = models.DateTimeField(_('created at'))
+    # Both move forward on every refresh of the row, whatever changed (a
+    # deleted variant or a new image included); the conditional GET
+    # validators of the storefront pages are built from them.
+    updated_at = models.DateTimeField(_('updated at'))
+    version = models.PositiveIntegerField(_('version'), default=0)
+
+    class Meta:
+        verbose_name = _('product listing')
+        verbose_name_plural = _('product listings')
+        ordering = ['-created_at', '-product_id']
+        indexes = [
+            models.Index(fields=['is_active', 'category_path', 'created_at']),
+            models.Index(fields=['is_active', 'created_at']),
+            models.Index(fields=['is_active', 'min_price']),
+            models.Index(fields=['brand']),
+            models.Index(fields=['category_path', 'updated_at']),
+            models.Index(fields=['updated_at']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class StockShard(models.Model):
+    """
+    One slice of a variant's reservable stock. Spreading a variant's units
+    over several rows lets concurrent reservations decrement different rows
+    instead of queueing on a single counter.
+    """
+    variant = models.ForeignKey(
+        Variant,
+        on_delete=models.CASCADE,
+        related_name='stock_shards',
+        verbose_name=_('variant'),
+        help_text=_('The variant whose stock this shard holds')
+    )
+    index = models.PositiveSmallIntegerField(
+        _('index'),
+        help_text=_('Position of the shard among the variant shards')
+    )
+    available = models.PositiveIntegerField(
+        _('available'),
+        default=0,
+        help_text=_('Units in this shard that can still be reserved')
+    )
+
+    class Meta:
+        verbose_name = _('stock shard')
+        verbose_name_plural = _('stock shards')
+        ordering = ['variant', 'index']
+        constraints = [
+            models.UniqueConstraint(fields=['variant', 'index'], name='unique_variant_shard'),
+        ]
+
+    def __str__(self):
+        return f"{self.variant} #{self.index}: {self.available}"
+
+
+class Reservation(models.Model):
+    """
+    Units of a variant held from one stock shard for a checkout until it
+    expires. A single reserve() call may span several shards; its rows share
+    a token.
+    """
+    class Status(models.TextChoices):
+        ACTIVE = 'active', _('Active')
+        COMMITTED = 'committed', _('Committed')
+        RELEASED = 'released', _('Released')
+
+    token = models.UUIDField(
+        _('token'),
+        db_index=True,
+        help_text=_('Identifies every row of one reservation')
+    )
+    variant = models.ForeignKey(
+        Variant,
+        on_delete=models.CASCADE,
+        related_name='reservations',
+        verbose_name=_('variant'),
+        help_text=_('The variant being reserved')
+    )
+    shard = models.ForeignKey(
+        StockShard,
+        on_delete=models.CASCADE,
+        related_name='reservations',
+        verbose_name=_('shard'),
+        help_text=_('The stock shard the units were taken from')
+    )
+    quantity = models.PositiveIntegerField(
+        _('quantity'),
+        validators=[MinValueValidator(1)],
+        help_text=_('Units held from the shard')
+    )
+    status = models.CharField(
+        _('status'),
+        max_length=10,
+        choices=Status.choices,
+        default=Status.ACTIVE,
+        help_text=_('Whether the units are still held, sold or returned to the shard')
+    )
+    release_batch = models.UUIDField(
+        _('release batch'),
+        blank=True,
+        null=True,
+        help_text=_('The release that returned these units, so they are credited exactly once')
+    )
+    expires_at = models.DateTimeField(
+        _('expires at'),
+        help_text=_('When the held units return to stock unless committed')
+    )
+    created_at = models.DateTimeField(
+        _('created at'),
+        auto_now_add=True,
+        help_text=_('When the units were reserved')
+    )
+
+    class Meta:
+        verbose_name = _('reservation')
+        verbose_name_plural = _('reservations')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+            models.Index(fields=['release_batch']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.variant} ({self.status})"
@@ -0,0 +1,141 @@
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+from agpkart.db.routers import read_from_primary
+from products.models import PATH_SEPARATOR
+
+PAGE_TIMEOUT = 60 * 10
+FRAGMENT_TIMEOUT = 60 * 10
+# How long one request may hold the right to render a missing page, and how
+# long the others wait for it before rendering themselves.
+RENDER_LOCK_TIMEOUT = 10
+STAMPEDE_WAIT = 2.0
+STAMPEDE_POLL_INTERVAL = 0.05
+
+# Tags a cached page or fragment can depend on:
+#   product:<pk>   the product detail page
+#   category:<pk>  pages listing products anywhere under that category
+#   categories     anything showing the category tree
+#   listings       anything showing the newest products or catalog-wide counts
+CATEGORIES_TAG = 'categories'
+LISTINGS_TAG = 'listings'
+
+
+def product_tag(pk):
+    return f'product:{pk}'
+
+
+def category_tag(pk):
+    return f'category:{pk}'
+
+
+def path_tags(path):
+    """Category tags of every category on a materialized path."""
+    return [category_tag(int(segment)) for segment in path.split(PATH_SEPARATOR) if segment]
+
+
+def _tag_key(tag):
+    return f'products:tag:{tag}'
+
+
+def tag_versions(tags):
+    """
+    Return {tag: version} for `tags`. A tag gets a fresh version the first
+    time it is seen and every time it is invalidated, so anything cached
+    against an older version is stale.
+    """
+    tags = list(tags)
+    versions = cache.get_many([_tag_key(tag) for tag in tags])
+    missing = {_tag_key(tag): uuid.uuid4().hex for tag in tags if _tag_key(tag) not in versions}
+    if missing:
+        for key, version in missing.items():
+            cache.add(key, version, None)
+        versions.update(cache.get_many(list(missing)))
+    return {tag: versions.get(_tag_key(tag), '') for tag in tags}
+
+
+def invalidate_tags(tags):
+    """Retire every page and fragment depending on `tags`, once the transaction commits."""
+    tags = set(tags)
+    if tags:
+        transaction.on_commit(lambda: cache.set_many({_tag_key(tag): uuid.uuid4().hex for tag in tags}, None))
+
+
+def tag_request(request, *tags):
+    """
+    Declare tags the page being rendered depends on, for
+    cache_storefront_page to record. Call it before loading the data the
+    tags cover: their versions are read right away, so an invalidation that
+    lands while the page renders leaves the stored copy already stale.
+    """
+    request.cache_tag_versions = {**getattr(request, 'cache_tag_versions', {}), **tag_versions(tags)}
+
+
+def _page_key(request):
+    digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'products:page:{digest}'
+
+
+def _is_fresh(entry):
+    tags, versions = entry[0], entry[1]
+    return tuple(tag_versions(tags).values()) == versions
+
+
+def _from_entry(entry):
+    _, _, status, content_type, content = entry
+    response = HttpResponse(content, status=status, content_type=content_type)
+    response['X-Storefront-Cache'] = 'hit'
+    return response
+
+
+def cache_storefront_page(view):
+    """
+    Cache whole pages for anonymous GET requests, keyed by full path.
+
+    An entry stays valid until one of the tags the view declared with
+    tag_request is invalidated; pages that declare none are not cached.
+    When an entry is missing or stale, one request renders it while
+    concurrent ones serve the stale copy, or wait briefly for the fresh one,
+    instead of all rendering at once.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        key = _page_key(request)
+        entry = cache.get(key)
+        if entry is not None and _is_fresh(entry):
+            return _from_entry(entry)
+
+        lock_key = f'{key}:rendering'
+        if not cache.add(lock_key, 1, RENDER_LOCK_TIMEOUT):
+            if entry is not None:
+                return _from_entry(entry)
+            deadline = time.monotonic() + STAMPEDE_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(STAMPEDE_POLL_INTERVAL)
+                entry = cache.get(key)
+                if entry is not None and _is_fresh(entry):
+                    return _from_entry(entry)
+            return view(request, *args, **kwargs)
+
+        try:
+            # The rendered page is stored for everyone, so render it from the primary.
+            with read_from_primary():
+                response = view(request, *args, **kwargs)
+            tagged = getattr(request, 'cache_tag_versions', None)
+            if tagged and response.status_code == 200 and not response.cookies and not response.streaming:
+                if hasattr(response, 'render'):
+                    response.render()
+                entry = (tuple(tagged), tuple(tagged.values()), response.status_code, response['Content-Type'], response.content)
+                cache.set(key, entry, PAGE_TIMEOUT)
+            return response
+        finally:
+            cache.delete(lock_key)
+    return wrapper
@@ -0,0 +1,242 @@
+import re
+from difflib import get_close_matches
+
+from django.db import connection, transaction
+from django.utils.html import strip_tags
+
+from agpkart.db.routers import read_from_primary
+from products.models import PATH_SEPARATOR, Category, Product, ProductListing, subtree_range
+
+# FTS5 table keyed by product id (rowid), holding only active products.
+# Created by migration 0002_search; columns are weighted by the 'rank' config.
+SEARCH_TABLE = 'products_search'
+# The same documents unstemmed (migration 0004_search_words); their
+# vocabulary holds words as written rather than porter stems.
+WORDS_TABLE = 'products_search_words'
+VOCAB_TABLE = 'products_search_vocab'
+SEARCH_PAGE_SIZE = 24
+MAX_SEARCH_PAGES = 50
+MAX_QUERY_TERMS = 8
+# Shorter terms are too ambiguous to correct; a typo in the first
+# FUZZY_PREFIX_LENGTH characters is not looked for.
+MIN_FUZZY_TERM_LENGTH = 4
+FUZZY_PREFIX_LENGTH = 2
+FUZZY_CUTOFF = 0.75
+# The most common indexed words a trailing prefix is widened to.
+MAX_COMPLETIONS = 16
+INDEX_BATCH_SIZE = 500
+
+_TERM = re.compile(r'\w+')
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def _category_names(paths):
+    category_ids = {int(segment) for path in paths for segment in path.split(PATH_SEPARATOR) if segment}
+    return dict(Category.objects.filter(pk__in=category_ids).order_by().values_list('pk', 'name'))
+
+
+@read_from_primary()
+def index_products(product_ids):
+    """
+    Bring the search rows of the given products in line with the catalog:
+    active products are (re)inserted with their category trail, everything
+    else is removed.
+    """
+    product_ids = list(product_ids)
+    if not product_ids or not is_supported():
+        return
+    products = list(
+        Product.objects.filter(pk__in=product_ids, is_active=True).order_by()
+        .values_list('pk', 'name', 'brand', 'description', 'category__path')
+    )
+    names = _category_names(path for *_, path in products)
+    rows = [
+        (
+            pk,
+            name,
+            brand,
+            ' '.join(names.get(int(segment), '') for segment in path.split(PATH_SEPARATOR) if segment),
+            strip_tags(description),
+        )
+        for pk, name, brand, description, path in products
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        _delete_rows(cursor, product_ids)
+        insert_rows(cursor, rows)
+
+
+def insert_rows(cursor, rows):
+    """Add (rowid, name, brand, categories, description) rows to both search tables."""
+    rows = list(rows)
+    cursor.executemany(
+        f'INSERT INTO {SEARCH_TABLE} (rowid, name, brand, categories, description) VALUES (%s, %s, %s, %s, %s)',
+        rows,
+    )
+    cursor.executemany(
+        f'INSERT INTO {WORDS_TABLE} (rowid, words) VALUES (%s, %s)',
+        [(pk, ' '.join(columns)) for pk, *columns in rows],
+    )
+
+
+def _delete_rows(cursor, product_ids):
+    for table in (SEARCH_TABLE, WORDS_TABLE):
+        cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [(pk,) for pk in product_ids])
+
+
+def reindex_category(path, batch_size=INDEX_BATCH_SIZE):
+    """Re-index every product under a category whose name or place changed."""
+    last_pk = 0
+    product_ids = Product.objects.filter(**subtree_range('category__path', path)).order_by('pk').values_list('pk', flat=True)
+    while True:
+        batch = list(product_ids.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        index_products(batch)
+        last_pk = batch[-1]
+
+
+def remove_products(product_ids):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        _delete_rows(cursor, product_ids)
+
+
+def rebuild_index(batch_size=INDEX_BATCH_SIZE):
+    """Re-index every product, a primary key batch at a time."""
+    if not is_supported():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(f'DELETE FROM {WORDS_TABLE}')
+    indexed = 0
+    last_pk = 0
+    product_ids = Product.objects.order_by('pk').values_list('pk', flat=True)
+    while True:
+        batch = list(product_ids.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return indexed
+        index_products(batch)
+        indexed += len(batch)
+        last_pk = batch[-1]
+
+
+def query_terms(query):
+    return _TERM.findall((query or '').lower())[:MAX_QUERY_TERMS]
+
+
+def build_match(terms, completions=()):
+    """
+    FTS5 MATCH expression for `terms`: every term must appear, and the last
+    one is matched as a prefix so results show up while the user is typing.
+    The stemmed index only knows the prefixes of stems ("runnin" is not one
+    of "run"), so the last term also matches any of `completions`, the
+    unstemmed words it begins, which FTS5 stems like the documents. Terms
+    are plain word characters, so quoting them is enough to keep FTS5
+    operators in the query from being interpreted.
+    """
+    phrases = [f'"{term}"' for term in terms[:-1]]
+    last = [f'"{terms[-1]}"*'] + [f'"{word}"' for word in completions]
+    phrases.append(f'({" OR ".join(last)})' if len(last) > 1 else last[0])
+    return ' AND '.join(phrases)
+
+
+def _completions(cursor, prefix):
+    """The most common indexed words starting with `prefix`, as written."""
+    cursor.execute(
+        f'SELECT term FROM {VOCAB_TABLE} WHERE term >= %s AND term < %s ORDER BY doc DESC LIMIT %s',
+        [prefix, prefix + '\uffff', MAX_COMPLETIONS],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def match_product_ids(terms, limit, offset=0):
+    """Product ids matching `terms`, best first by weighted bm25."""
+    with connection.cursor() as cursor:
+        match = build_match(terms, _completions(cursor, terms[-1]))
+        cursor.execute(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s ORDER BY rank LIMIT %s OFFSET %s',
+            [match, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _vocabulary_has(cursor, term, prefix):
+    upper = term + '\uffff' if prefix else term + '\x00'
+    cursor.execute(f'SELECT 1 FROM {VOCAB_TABLE} WHERE term >= %s AND term < %s LIMIT 1', [term, upper])
+    return cursor.fetchone() is not None
+
+
+def correct_terms(terms):
+    """
+    Replace terms that are not in the index vocabulary with the closest
+    indexed word sharing their first characters and of a similar length.
+    The vocabulary is unstemmed, so corrections are words as written. Each
+    lookup is a range scan of the vocabulary, not of the documents.
+    """
+    corrected = []
+    with connection.cursor() as cursor:
+        for i, term in enumerate(terms):
+            prefix = i == len(terms) - 1
+            if len(term) < MIN_FUZZY_TERM_LENGTH or _vocabulary_has(cursor, term, prefix):
+                corrected.append(term)
+                continue
+            start = term[:FUZZY_PREFIX_LENGTH]
+            cursor.execute(
+                f'SELECT term FROM {VOCAB_TABLE} WHERE term >= %s AND term < %s AND length(term) BETWEEN %s AND %s',
+                [start, start + '\uffff', len(term) - 2, len(term) + 2],
+            )
+            candidates = [row[0] for row in cursor.fetchall()]
+            corrected.extend(get_close_matches(term, candidates, n=1, cutoff=FUZZY_CUTOFF) or [term])
+    return corrected
+
+
+class SearchPage:
+    """One page of ranked search results, in rank order."""
+    def __init__(self, object_list, number, has_next, corrected_query=None):
+        self.object_list = object_list
+        self.number = number
+        self.has_next = has_next
+        self.corrected_query = corrected_query
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self.number > 1
+
+
+def search_products(query, page=1, per_page=SEARCH_PAGE_SIZE):
+    """
+    Ranked search over active products, returning a SearchPage of listings.
+
+    When the first page has no match at all, the query is retried once with
+    misspelt terms corrected against the index vocabulary, and the page
+    reports the corrected query it actually ran.
+    """
+    terms = query_terms(query)
+    page = max(1, min(page, MAX_SEARCH_PAGES))
+    if not terms:
+        return SearchPage([], page, False)
+    if not is_supported():
+        listings = ProductListing.objects.filter(is_active=True, name__icontains=' '.join(terms))
+        rows = list(listings[(page - 1) * per_page:page * per_page + 1])
+        return SearchPage(rows[:per_page], page, len(rows) > per_page)
+
+    offset = (page - 1) * per_page
+    ids = match_product_ids(terms, per_page + 1, offset)
+    corrected_query = None
+    if not ids and page == 1:
+        corrected = correct_terms(terms)
+        if corrected != terms:
+            ids = match_product_ids(corrected, per_page + 1, offset)
+            corrected_query = ' '.join(corrected)
+    listings = ProductListing.objects.in_bulk(ids[:per_page])
+    results = [listings[pk] for pk in ids[:per_page] if pk in listings]
+    return SearchPage(results, page, len(ids) > per_page and page < MAX_SEARCH_PAGES, corrected_query)
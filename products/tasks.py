@@ -0,0 +1,23 @@
+from django.core.files.storage import default_storage
+
+from jobs.queue import task
+from products import page_cache
+from products.images import generate_derivatives
+from products.models import ProductListing
+
+
+@task('products.generate_image_derivatives')
+def generate_image_derivatives(name):
+    """Resize and re-encode one uploaded image; a source deleted since is skipped rather than retried."""
+    if not default_storage.exists(name):
+        return
+    generate_derivatives(name)
+    # Storefront pages cached before now were rendered without a srcset.
+    showing = ProductListing.objects.filter(product__images__image=name).values_list('product_id', 'category_path')
+    tags = set()
+    for product_id, path in showing.distinct():
+        tags.add(page_cache.product_tag(product_id))
+        tags.update(page_cache.path_tags(path))
+    if tags:
+        tags.add(page_cache.LISTINGS_TAG)
+    page_cache.invalidate_tags(tags)
@@ -0,0 +1,18 @@
+from django import template
+
+from products import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(image, image_format=None):
+    """
+    `srcset` candidates for an uploaded image (a FieldFile or its name), e.g.
+
+        <source type="image/webp" srcset="{% srcset listing.image 'webp' %}">
+        <img src="..." srcset="{% srcset listing.image %}">
+
+    Empty until the derivatives have been generated.
+    """
+    return images.srcset(image, image_format)
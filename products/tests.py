@@ -1,3 +1,595 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import F, Sum
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from PIL import Image
+
+from agpkart import staticfiles
+from jobs import queue
+from jobs.models import Job
+from products import facets, images, inventory, page_cache
+from products.listing import category_listings, rebuild_listings
+from products.search import match_product_ids, search_products
+from products.models import Category, Product, ProductImage, ProductListing, Reservation, StockShard, Variant
+from users.models import User
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        self.fashion = Category.objects.create(name="Fashion", slug="fashion")
+        self.men = Category.objects.create(name="Men", slug="men", parent=self.fashion)
+        self.shirts = Category.objects.create(name="Shirts", slug="shirts", parent=self.men)
+        self.home = Category.objects.create(name="Home", slug="home")
+
+    def test_paths_and_depth(self):
+        self.assertEqual(self.shirts.path, f"{self.fashion.pk:08d}/{self.men.pk:08d}/{self.shirts.pk:08d}/")
+        self.assertEqual(self.shirts.depth, 2)
+        self.assertEqual(self.shirts.get_ancestor_ids(), [self.fashion.pk, self.men.pk])
+        self.assertEqual(
+            set(self.fashion.get_descendants().values_list('slug', flat=True)),
+            {"fashion", "men", "shirts"},
+        )
+
+    def test_moving_a_category_rewrites_its_subtree(self):
+        product = Product.objects.create(name="Oxford", slug="oxford", category=self.shirts, base_price=20)
+        self.men.parent = self.home
+        self.men.save()
+
+        self.shirts.refresh_from_db()
+        self.assertEqual(self.shirts.path, f"{self.home.pk:08d}/{self.men.pk:08d}/{self.shirts.pk:08d}/")
+        self.assertEqual(self.shirts.depth, 2)
+        self.assertEqual(ProductListing.objects.get(pk=product.pk).category_path, self.shirts.path)
+        self.assertEqual(list(category_listings(self.fashion)), [])
+        self.assertEqual([listing.pk for listing in category_listings(self.home)], [product.pk])
+
+    def test_cannot_move_under_own_descendant(self):
+        self.fashion.parent = self.shirts
+        with self.assertRaises(ValueError):
+            self.fashion.save()
+
+
+class ProductListingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Shirts", slug="shirts")
+        self.product = Product.objects.create(name="Oxford", slug="oxford", category=self.category, base_price=20)
+
+    def test_listing_tracks_variants(self):
+        Variant.objects.create(product=self.product, sku="OX-S", size="S", stock=3)
+        variant = Variant.objects.create(product=self.product, sku="OX-L", size="L", price=25, stock=0)
+
+        listing = ProductListing.objects.get(pk=self.product.pk)
+        self.assertEqual((listing.min_price, listing.max_price), (Decimal("20.00"), Decimal("25.00")))
+        self.assertEqual(listing.total_stock, 3)
+        self.assertTrue(listing.in_stock)
+
+        variant.delete()
+        listing.refresh_from_db()
+        self.assertEqual(listing.max_price, Decimal("20.00"))
+
+    def test_rebuild_restores_missing_rows(self):
+        ProductListing.objects.all().delete()
+        self.assertEqual(rebuild_listings(), 1)
+        self.assertTrue(ProductListing.objects.filter(pk=self.product.pk).exists())
+
+    def test_category_page_lists_subtree(self):
+        child = Category.objects.create(name="Formal", slug="formal", parent=self.category)
+        Product.objects.create(name="Tuxedo", slug="tuxedo", category=child, base_price=90)
+
+        response = self.client.get("/category/shirts/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Oxford")
+        self.assertContains(response, "Tuxedo")
+        self.assertEqual(self.client.get("/category/formal/").context['listings'].object_list[0].name, "Tuxedo")
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.fashion = Category.objects.create(name="Fashion", slug="fashion")
+        self.shirts = Category.objects.create(name="Shirts", slug="shirts", parent=self.fashion)
+        self.oxford = Product.objects.create(
+            name="Oxford cotton shirt", slug="oxford", category=self.shirts, base_price=20,
+            description="<p>Button down collar</p>",
+        )
+        self.tee = Product.objects.create(
+            name="Graphic tee", slug="tee", category=self.fashion, base_price=10, description="Soft cotton",
+        )
+
+    def test_ranked_prefix_search(self):
+        # A name match outranks a description match; the last term is a prefix.
+        self.assertEqual([listing.pk for listing in search_products("cott")], [self.oxford.pk, self.tee.pk])
+        self.assertEqual([listing.pk for listing in search_products("oxford collar")], [self.oxford.pk])
+        self.assertEqual({listing.pk for listing in search_products("fashion")}, {self.oxford.pk, self.tee.pk})
+        self.assertEqual(list(search_products('"*" OR')), [])
+
+    def test_typo_falls_back_to_corrected_terms(self):
+        results = search_products("oxfrod")
+        self.assertEqual([listing.pk for listing in results], [self.oxford.pk])
+        self.assertEqual(results.corrected_query, "oxford")
+
+    def test_prefixes_and_corrections_use_words_as_written(self):
+        blender = Product.objects.create(
+            name="Portable blender", slug="blender", category=self.fashion, base_price=30,
+            description="Running on batteries",
+        )
+        # "runnin" is a prefix of "running" but not of its stem "run".
+        self.assertEqual([listing.pk for listing in search_products("runnin")], [blender.pk])
+        self.assertEqual([listing.pk for listing in search_products("blenders")], [blender.pk])
+        results = search_products("portabel blendr")
+        self.assertEqual([listing.pk for listing in results], [blender.pk])
+        self.assertEqual(results.corrected_query, "portable blender")
+
+    def test_index_follows_catalog_writes(self):
+        self.tee.is_active = False
+        self.tee.save()
+        self.assertEqual(match_product_ids(["cotton"], 10), [self.oxford.pk])
+
+        self.shirts.name = "Formal wear"
+        self.shirts.save()
+        self.assertEqual(match_product_ids(["formal"], 10), [self.oxford.pk])
+
+        self.oxford.delete()
+        self.assertEqual(match_product_ids(["cotton"], 10), [])
+
+    def test_search_api(self):
+        response = self.client.get("/api/search/", {"q": "graphic"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([row["id"] for row in data["results"]], [self.tee.pk])
+        self.assertFalse(data["has_next"])
+        self.assertContains(self.client.get("/search/", {"q": "oxford"}), "Oxford cotton shirt")
+
+
+class FacetIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shirts = Category.objects.create(name="Shirts", slug="shirts")
+        self.shoes = Category.objects.create(name="Shoes", slug="shoes")
+        self.oxford = Product.objects.create(name="Oxford", slug="oxford", category=self.shirts, brand="Aarna", base_price=800)
+        self.linen = Product.objects.create(name="Linen", slug="linen", category=self.shirts, brand="Bharat", base_price=1200)
+        self.runner = Product.objects.create(name="Runner", slug="runner", category=self.shoes, brand="Aarna", base_price=3000)
+        Variant.objects.create(product=self.oxford, sku="OX-M", size="M", color="White", stock=2)
+        Variant.objects.create(product=self.linen, sku="LI-L", size="L", color="White", stock=0)
+
+    def test_counts_apply_every_other_facet(self):
+        matches, counts = facets.get_index().query({'brand': ['Aarna'], 'color': ['White']})
+        self.assertEqual(matches.bit_count(), 1)
+        # Brand counts ignore the brand selection but respect the colour one.
+        self.assertEqual(counts['brand'], {'Aarna': 1, 'Bharat': 1})
+        self.assertEqual(counts['color'], {'White': 1})
+        self.assertEqual(counts['price'], {'500-1000': 1})
+        self.assertEqual(counts['category'], {self.shirts.pk: 1})
+
+    def test_pages_newest_first(self):
+        index = facets.get_index()
+        matches, _ = index.query({})
+        ids, next_cursor, previous_cursor = index.page(matches, 2)
+        self.assertEqual(ids, [self.runner.pk, self.linen.pk])
+        self.assertIsNone(previous_cursor)
+        ids, next_cursor, previous_cursor = index.page(matches, 2, after=next_cursor)
+        self.assertEqual((ids, next_cursor), ([self.oxford.pk], None))
+        self.assertEqual(index.page(matches, 2, before=previous_cursor)[0], [self.runner.pk, self.linen.pk])
+
+    def test_out_of_range_cursors_are_ignored(self):
+        index = facets.get_index()
+        matches, _ = index.query({})
+        for cursor in (-1, index.size, 40_000_000_000):
+            with self.assertRaises(ValueError):
+                index.page(matches, 2, after=cursor)
+        for params in ({"after": "-1"}, {"before": "-3"}, {"after": "2000000000"}, {"before": "40000000000"}):
+            response = self.client.get("/products/", params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                [listing.pk for listing in response.context['listings'].object_list],
+                [self.runner.pk, self.linen.pk, self.oxford.pk],
+            )
+
+    def test_changes_are_patched_in_after_commit(self):
+        index = facets.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.linen.brand = "Chitra"
+            self.linen.save()
+            self.runner.delete()
+            Product.objects.create(name="Kurta", slug="kurta", category=self.shirts, brand="Chitra", base_price=600)
+        self.assertIs(facets.get_index(), index)
+        _, counts = index.query({})
+        self.assertEqual(counts['brand'], {'Aarna': 1, 'Chitra': 2})
+        self.assertEqual(len(index), 3)
+
+    def test_product_list_filters(self):
+        response = self.client.get("/products/", {"brand": "Aarna", "in_stock": "1"})
+        self.assertEqual([listing.pk for listing in response.context['listings']], [self.oxford.pk])
+        response = self.client.get("/category/shirts/", {"brand": "Aarna"})
+        self.assertEqual(response.context['total'], 1)
+        self.assertContains(response, 'value="Bharat"')
+
+
+class StorefrontPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shirts = Category.objects.create(name="Shirts", slug="shirts")
+        self.oxford = Product.objects.create(name="Oxford", slug="oxford", category=self.shirts, base_price=20)
+        self.linen = Product.objects.create(name="Linen", slug="linen", category=self.shirts, base_price=30)
+        self.url = f"/detail/{self.oxford.pk}/"
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        self.assertNotIn('X-Storefront-Cache', self.client.get(self.url))
+        # Only the conditional GET validator lookups reach the database.
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Storefront-Cache'], 'hit')
+        self.assertContains(response, "Oxford")
+
+    def test_saving_a_product_purges_only_its_pages(self):
+        self.client.get(self.url)
+        self.client.get(f"/detail/{self.linen.pk}/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.oxford.name = "Oxford slim"
+            self.oxford.save()
+        self.assertContains(self.client.get(self.url), "Oxford slim")
+        # The sibling page lists Oxford among related products, so it goes too.
+        self.assertNotIn('X-Storefront-Cache', self.client.get(f"/detail/{self.linen.pk}/"))
+
+        other = Category.objects.create(name="Shoes", slug="shoes")
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Runner", slug="runner", category=other, base_price=50)
+        self.assertEqual(self.client.get(self.url)['X-Storefront-Cache'], 'hit')
+
+    def test_stale_copy_is_served_while_another_request_renders(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            page_cache.invalidate_tags([page_cache.product_tag(self.oxford.pk)])
+        key = page_cache._page_key(RequestFactory().get(self.url))
+        cache.add(f"{key}:rendering", 1)
+        self.assertEqual(self.client.get(self.url)['X-Storefront-Cache'], 'hit')
+        cache.delete(f"{key}:rendering")
+        self.assertNotIn('X-Storefront-Cache', self.client.get(self.url))
+
+    def test_home_page_renders_catalog_blocks(self):
+        response = self.client.get("/")
+        self.assertContains(response, "/category/shirts/")
+        self.assertContains(response, "2 Products")
+        self.assertContains(response, "Linen")
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shirts = Category.objects.create(name="Shirts", slug="shirts")
+        self.oxford = Product.objects.create(name="Oxford", slug="oxford", category=self.shirts, base_price=20)
+        self.url = f"/detail/{self.oxford.pk}/"
+
+    def test_unchanged_detail_page_is_not_modified(self):
+        response = self.client.get(self.url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        # Another process, with its own cache, computes the same validators.
+        cache.clear()
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(self.url, headers={"if-none-match": etag}).status_code, 304)
+        self.assertEqual(self.client.get(self.url, headers={"if-modified-since": last_modified}).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            variant = Variant.objects.create(product=self.oxford, sku="OX-M", size="M", stock=1)
+        # As if the page was last fetched an hour ago.
+        ProductListing.objects.update(updated_at=F('updated_at') - timedelta(hours=1))
+        Category.objects.update(updated_at=F('updated_at') - timedelta(hours=1))
+        response = self.client.get(self.url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with self.captureOnCommitCallbacks(execute=True):
+            variant.delete()
+        self.assertEqual(self.client.get(self.url, headers={"if-none-match": etag}).status_code, 200)
+        self.assertEqual(self.client.get(self.url, headers={"if-modified-since": last_modified}).status_code, 200)
+
+    def test_listing_pages_revalidate(self):
+        response = self.client.get("/category/shirts/")
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        cache.clear()
+        self.assertEqual(self.client.get("/category/shirts/", headers={"if-none-match": etag}).status_code, 304)
+        self.assertEqual(self.client.get("/category/shirts/", headers={"if-modified-since": last_modified}).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Linen", slug="linen", category=self.shirts, base_price=30)
+        self.assertEqual(self.client.get("/category/shirts/", headers={"if-none-match": etag}).status_code, 200)
+        self.assertEqual(self.client.get("/category/missing/", headers={"if-none-match": etag}).status_code, 404)
+
+        etag = self.client.get("/category/shirts/")['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shirts.name = "Dress shirts"
+            self.shirts.save()
+        self.assertEqual(self.client.get("/category/shirts/", headers={"if-none-match": etag}).status_code, 200)
+
+
+class InventoryTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        product = Product.objects.create(name="Oxford", slug="oxford", category=category, base_price=20)
+        self.variant = Variant.objects.create(product=product, sku="OX-M", size="M", stock=10)
+        inventory.enable_sharding(self.variant, shards=4)
+
+    def test_stock_is_spread_over_shards(self):
+        self.assertEqual(list(StockShard.objects.values_list('available', flat=True)), [3, 3, 2, 2])
+        inventory.add_stock(self.variant, 5)
+        self.assertEqual(inventory.available_stock(self.variant.pk), 15)
+
+    def test_reservation_gathers_from_several_shards_or_none(self):
+        token = inventory.reserve(self.variant.pk, 7)
+        self.assertEqual(Reservation.objects.filter(token=token).aggregate(Sum('quantity'))['quantity__sum'], 7)
+        self.assertEqual(inventory.available_stock(self.variant.pk), 3)
+        with self.assertRaises(inventory.OutOfStock):
+            inventory.reserve(self.variant.pk, 4)
+        self.assertEqual(inventory.available_stock(self.variant.pk), 3)
+
+    def test_commit_and_release(self):
+        sold = inventory.reserve(self.variant.pk, 2)
+        abandoned = inventory.reserve(self.variant.pk, 3)
+        inventory.commit(sold)
+        self.assertEqual(inventory.release(abandoned), 1)
+        self.assertEqual(inventory.release(abandoned), 0)
+        self.assertEqual(inventory.available_stock(self.variant.pk), 8)
+        with self.assertRaises(inventory.ReservationExpired):
+            inventory.commit(abandoned)
+
+    def test_sweeper_releases_expired_reservations_in_bulk(self):
+        for _ in range(3):
+            inventory.reserve(self.variant.pk, 2, ttl=timedelta(minutes=-1))
+        live = inventory.reserve(self.variant.pk, 1)
+        released, variant_ids = inventory.release_expired(batch_size=2)
+        self.assertEqual((released, variant_ids), (3, {self.variant.pk}))
+        self.assertEqual(inventory.available_stock(self.variant.pk), 9)
+        inventory.commit(live)
+
+        self.assertEqual(inventory.sync_variant_stock(), 1)
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.stock, 9)
+        self.assertEqual(ProductListing.objects.get(pk=self.variant.product_id).total_stock, 9)
+
+
+    def test_admin_receives_stock_into_the_shards_instead_of_overwriting_it(self):
+        admin = User.objects.create_superuser(email="root@example.com", password="secret")
+        self.client.force_login(admin)
+        url = f"/admin/products/variant/{self.variant.pk}/change/"
+        form = self.client.get(url).context['adminform'].form
+        self.assertNotIn('stock', form.fields)
+        self.client.post(url, {
+            'product': self.variant.product_id, 'sku': "OX-M", 'size': "M", 'color': "", 'price': "",
+            'is_active': "on", 'stock': 999, 'receive_stock': 4,
+        })
+        self.assertEqual(inventory.available_stock(self.variant.pk), 14)
+        self.assertEqual(Variant.objects.get(pk=self.variant.pk).stock, 14)
+
+
+class ConcurrentReservationTests(TransactionTestCase):
+    def test_concurrent_checkouts_never_oversell(self):
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        product = Product.objects.create(name="Oxford", slug="oxford", category=category, base_price=20)
+        variant = Variant.objects.create(product=product, sku="OX-M", size="M", stock=25)
+        inventory.enable_sharding(variant, shards=4)
+        outcomes = []
+
+        def checkout():
+            try:
+                for _ in range(50):
+                    try:
+                        outcomes.append(inventory.reserve(variant.pk, 2))
+                        return
+                    except inventory.OutOfStock:
+                        outcomes.append(None)
+                        return
+                    except OperationalError:
+                        # SQLite allows one writer at a time; the other checkouts retry.
+                        continue
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        reserved = Reservation.objects.aggregate(Sum('quantity'))['quantity__sum']
+        self.assertEqual(len([token for token in outcomes if token]), 12)
+        self.assertEqual(reserved, 24)
+        self.assertEqual(inventory.available_stock(variant.pk), 1)
+
+
+class StaticPipelineTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        overrides = self.settings(STATIC_ROOT=self.root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        staticfiles.hashed_names.cache_clear()
+        self.addCleanup(staticfiles.hashed_names.cache_clear)
+        self.storage = staticfiles.CompressedManifestStaticFilesStorage()
+        self.storage.save('assets/css/site.css', ContentFile(b'body { color: #333; }\n' * 100))
+        self.storage.save('assets/img/dot.png', ContentFile(b'\x89PNG' + bytes(500)))
+        list(self.storage.post_process({
+            'assets/css/site.css': (self.storage, 'assets/css/site.css'),
+            'assets/img/dot.png': (self.storage, 'assets/img/dot.png'),
+        }))
+        self.hashed = self.storage.hashed_files['assets/css/site.css']
+
+    def test_collect_hashes_and_precompresses_text_only(self):
+        self.assertRegex(self.hashed, r'^assets/css/site\.[0-9a-f]{12}\.css$')
+        with gzip.open(self.storage.path(self.hashed + '.gz')) as compressed:
+            self.assertEqual(compressed.read(), b'body { color: #333; }\n' * 100)
+        self.assertFalse(self.storage.exists('assets/img/dot.png.gz'))
+
+    def test_unknown_files_keep_their_name(self):
+        self.assertEqual(self.storage.stored_name('assets/img/missing.jpg'), 'assets/img/missing.jpg')
+
+    def test_serves_precompressed_hashed_file_as_immutable(self):
+        self.storage.save('staticfiles.json', ContentFile(
+            json.dumps({'paths': self.storage.hashed_files, 'version': '1.1'}).encode()
+        ))
+        with mock.patch.object(staticfiles, 'staticfiles_storage', self.storage):
+            response = self.client.get(f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='gzip, br')
+            plain = self.client.get('/static/assets/css/site.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'body { color: #333; }\n' * 100)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(plain['Cache-Control'], 'public, max-age=300')
+
+    def test_rejects_traversal_and_raw_gzip(self):
+        with self.assertRaises(SuspiciousFileOperation):
+            staticfiles.serve_static(RequestFactory().get('/'), '../manage.py')
+        self.assertEqual(self.client.get(f'/static/{self.hashed}.gz').status_code, 404)
+
+    def test_finder_prunes_sources_twins_and_unused_lib_files(self):
+        collected = {path for path, _ in staticfiles.PruningFileSystemFinder().list([])}
+        self.assertIn('assets/css/style.min.css', collected)
+        self.assertNotIn('assets/css/style.css', collected)
+        self.assertFalse(any(path.startswith('assets/scss/') for path in collected))
+        self.assertIn('assets/lib/owlcarousel/assets/owl.video.play.png', collected)
+        self.assertNotIn('assets/lib/owlcarousel/assets/owl.theme.green.min.css', collected)
+        self.assertNotIn('assets/lib/easing/easing.js', collected)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        overrides = self.settings(MEDIA_ROOT=self.root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        category = Category.objects.create(name="Shirts", slug="shirts")
+        self.product = Product.objects.create(name="Oxford", slug="oxford", category=category, base_price=20)
+
+    def upload(self, name, size, mode='RGB', image_format='JPEG'):
+        buffer = io.BytesIO()
+        Image.new(mode, size, 'red').save(buffer, format=image_format)
+        return ProductImage.objects.create(product=self.product, image=SimpleUploadedFile(name, buffer.getvalue()))
+
+    def test_upload_queues_derivatives_for_the_worker(self):
+        image = self.upload('oxford.jpg', (1200, 800))
+        job = Job.objects.get()
+        self.assertEqual((job.queue, job.task), (images.IMAGE_QUEUE, 'products.generate_image_derivatives'))
+        self.assertEqual(images.srcset(image.image), '')
+
+        self.assertEqual(queue.work([images.IMAGE_QUEUE], burst=True), 1)
+        manifest = images.derivatives(image.image.name)
+        self.assertEqual([width for width, _ in manifest['jpeg']], [160, 480, 960])
+        name = images.derivative_name(image.image.name, 480, 'webp')
+        self.assertEqual(manifest['webp'][1], [480, name])
+        self.assertTrue(name.startswith('derivatives/v1/products/'))
+        with Image.open(default_storage.path(name)) as derivative:
+            self.assertEqual((derivative.format, derivative.size), ('WEBP', (480, 320)))
+
+        # Already generated: saving again queues nothing.
+        image.save()
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_resaves_and_queued_names_are_not_scheduled_again(self):
+        image = self.upload('oxford.jpg', (300, 200))
+        image.alt_text = "Front"
+        image.save()
+        with mock.patch.object(images, 'derivatives') as derivatives:
+            ProductImage.objects.get(pk=image.pk).save()
+        derivatives.assert_not_called()
+        self.assertIsNone(images.schedule_derivatives(image.image.name))
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_small_transparent_images_stay_png_at_their_own_width(self):
+        image = self.upload('badge.png', (100, 50), mode='RGBA', image_format='PNG')
+        manifest = images.generate_derivatives(image.image.name)
+        self.assertEqual(manifest['png'], [[100, images.derivative_name(image.image.name, 100, 'png')]])
+        self.assertEqual(len(manifest['webp']), 1)
+
+    def test_srcset_tag(self):
+        image = self.upload('oxford.jpg', (600, 400))
+        images.generate_derivatives(image.image.name)
+        cache.clear()
+        rendered = Template(
+            "{% load responsive_images %}{% srcset image %}|{% srcset image 'webp' %}"
+        ).render(Context({'image': image.image}))
+        fallback, webp = rendered.split('|')
+        self.assertEqual(fallback, f"/media/derivatives/v1/{image.image.name}/160w.jpg 160w, "
+                                   f"/media/derivatives/v1/{image.image.name}/480w.jpg 480w, "
+                                   f"/media/derivatives/v1/{image.image.name}/600w.jpg 600w")
+        self.assertTrue(webp.endswith('/600w.webp 600w'))
+
+    def test_command_queues_images_without_derivatives(self):
+        self.upload('oxford.jpg', (300, 200))
+        Job.objects.all().delete()
+        call_command('generate_image_derivatives', stdout=io.StringIO())
+        self.assertEqual(Job.objects.filter(queue=images.IMAGE_QUEUE).count(), 1)
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        overrides = self.settings(MEDIA_ROOT=self.root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.content = bytes(range(256)) * 4
+        default_storage.save('products/photo.jpg', ContentFile(self.content))
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_file_with_validators(self):
+        response = self.client.get('/media/products/photo.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.body(response), self.content)
+
+        again = self.client.get('/media/products/photo.jpg', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        since = self.client.get('/media/products/photo.jpg', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+    def test_ranges(self):
+        response = self.client.get('/media/products/photo.jpg', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(self.body(response), self.content[10:20])
+
+        suffix = self.client.get('/media/products/photo.jpg', HTTP_RANGE='bytes=-4')
+        self.assertEqual(self.body(suffix), self.content[-4:])
+        open_ended = self.client.get('/media/products/photo.jpg', HTTP_RANGE='bytes=1000-')
+        self.assertEqual(open_ended['Content-Range'], 'bytes 1000-1023/1024')
+
+        unsatisfiable = self.client.get('/media/products/photo.jpg', HTTP_RANGE='bytes=2000-')
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable['Content-Range'], 'bytes */1024')
+
+        # A stale If-Range gets the whole, current file.
+        stale = self.client.get('/media/products/photo.jpg', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_sendfile_delegation(self):
+        with self.settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect'):
+            response = self.client.get('/media/products/photo.jpg')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/products/photo.jpg')
+        self.assertEqual(response.content, b'')
+
+    def test_missing_and_outside_files(self):
+        self.assertEqual(self.client.get('/media/products/missing.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/products/').status_code, 404)
+        self.assertEqual(self.client.get('/media/%2e%2e/manage.py').status_code, 400)
@@ -1,8 +1,11 @@
 from django.urls import path
-from products.views import home_view, product_detail_view
+from products.views import home_view, product_list_view, product_detail_view, search_view, search_api_view
 urlpatterns = [
     path("", home_view),
+    path("products/", product_list_view),
+    path("category/<slug:slug>/", product_list_view),
     path("detail/<int:pk>/", product_detail_view),
+    path("search/", search_view),
+    path("api/search/", search_api_view),
 
 ]
-
@@ -1,7 +1,218 @@
-from django.shortcuts import render
+import hashlib
 
+from django.shortcuts import render, get_object_or_404
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.views.decorators.http import condition
+
+from functions.general_functions.pagination import KeysetPage
+from products.facets import PRICE_BANDS, get_index as get_facet_index
+from products.models import Category, Product, ProductListing, subtree_range
+from products.page_cache import (
+    CATEGORIES_TAG, FRAGMENT_TIMEOUT, LISTINGS_TAG, cache_storefront_page, category_tag, product_tag, tag_request,
+)
+from products.search import search_products
+
+PRODUCT_LIST_PAGE_SIZE = 24
+FACET_FILTERS = ('brand', 'price', 'size', 'color')
+HOME_RECENT_PRODUCTS = 8
+RELATED_PRODUCTS = 8
+
+def _root_categories():
+    counts = get_facet_index().query({})[1]['category']
+    roots = Category.objects.filter(parent__isnull=True, is_active=True).order_by('sort_order', 'name')
+    return [(category, counts.get(category.pk, 0)) for category in roots]
+
+@cache_storefront_page
 def home_view(request):
-    return render(request, 'public/index.html')
+    tag_request(request, CATEGORIES_TAG, LISTINGS_TAG)
+    # Both blocks are fragment cached; the template only evaluates these on a miss.
+    return render(request, 'public/index.html', {
+        'versions': request.cache_tag_versions,
+        'fragment_timeout': FRAGMENT_TIMEOUT,
+        'root_categories': _root_categories,
+        'recent_listings': ProductListing.objects.filter(is_active=True)[:HOME_RECENT_PRODUCTS],
+    })
+
+def _cursor(value, size):
+    """A document position from the query string; None unless it falls inside the index."""
+    try:
+        cursor = int(value) if value is not None else None
+    except ValueError:
+        return None
+    return cursor if cursor is not None and 0 <= cursor < size else None
+
+# Conditional GET validators, built from stored rows so every process
+# computes the same ones. A set of rows is summarized by its count and
+# newest updated_at: listing and category stamps only move forward, so any
+# change raises the newest one and a removal lowers the count. They are a
+# few indexed aggregates, so a revalidation answered with 304 skips the
+# view entirely.
+
+def _stamp(queryset):
+    return queryset.order_by().aggregate(count=Count('pk'), newest=Max('updated_at'))
+
+def _validators(*stamps):
+    """(ETag, Last-Modified) for a page depending on `stamps`."""
+    etag = hashlib.md5(repr(stamps).encode()).hexdigest()
+    return etag, max((stamp['newest'] for stamp in stamps if stamp['newest']), default=None)
+
+def _list_validators(request, slug=None):
+    if not hasattr(request, 'list_validators'):
+        listings = ProductListing.objects.all()
+        if slug is not None:
+            path = Category.objects.filter(slug=slug, is_active=True).values_list('path', flat=True).first()
+            listings = listings.filter(**subtree_range('category_path', path)) if path else None
+        request.list_validators = (
+            _validators(_stamp(Category.objects.all()), _stamp(listings)) if listings is not None else (None, None)
+        )
+    return request.list_validators
+
+def _list_etag(request, slug=None):
+    return _list_validators(request, slug)[0]
+
+def _list_last_modified(request, slug=None):
+    return _list_validators(request, slug)[1]
+
+def _detail_validators(request, pk):
+    if not hasattr(request, 'detail_validators'):
+        row = ProductListing.objects.filter(pk=pk, is_active=True).values_list('category_id', 'version', 'updated_at').first()
+        if row is None:
+            request.detail_validators = (None, None)
+        else:
+            category_id, version, updated_at = row
+            # The page also shows its category trail and the related listings.
+            request.detail_validators = _validators(
+                {'count': version, 'newest': updated_at},
+                _stamp(Category.objects.all()),
+                _stamp(ProductListing.objects.filter(category_id=category_id)),
+            )
+    return request.detail_validators
 
+def _detail_etag(request, pk):
+    return _detail_validators(request, pk)[0]
+
+def _detail_last_modified(request, pk):
+    return _detail_validators(request, pk)[1]
+
+@condition(etag_func=_list_etag, last_modified_func=_list_last_modified)
+@cache_storefront_page
+def product_list_view(request, slug=None):
+    params = request.GET
+    category = None
+    tag_request(request, CATEGORIES_TAG)
+    if slug is not None:
+        category = get_object_or_404(Category, slug=slug, is_active=True)
+        tag_request(request, category_tag(category.pk))
+    else:
+        tag_request(request, LISTINGS_TAG)
+
+    selected = {facet: params.getlist(facet) for facet in FACET_FILTERS}
+    if params.get("in_stock") == "1":
+        selected['in_stock'] = [True]
+    if category is not None:
+        selected['category'] = [category.pk]
+
+    index = get_facet_index()
+    matches, counts = index.query(selected)
+    product_ids, next_cursor, previous_cursor = index.page(
+        matches, PRODUCT_LIST_PAGE_SIZE,
+        after=_cursor(params.get("after"), index.size), before=_cursor(params.get("before"), index.size),
+    )
+    listings = ProductListing.objects.in_bulk(product_ids)
+    page = KeysetPage([listings[pk] for pk in product_ids if pk in listings], next_cursor, previous_cursor)
+
+    subcategories = Category.objects.filter(parent=category, is_active=True).order_by('sort_order', 'name')
+    price_bands = [key for key, _, _ in PRICE_BANDS]
+    facet_options = [
+        {
+            'name': facet,
+            'label': label,
+            'options': [
+                (value, counts[facet][value], value in selected[facet])
+                for value in (price_bands if facet == 'price' else sorted(counts[facet]))
+                if value in counts[facet]
+            ],
+        }
+        for facet, label in (('brand', 'Brand'), ('price', 'Price'), ('size', 'Size'), ('color', 'Color'))
+    ]
+
+    # Carry the active filters over to the pagination links.
+    query = params.copy()
+    query.pop("after", None)
+    query.pop("before", None)
+
+    return render(request, 'public/product_list.html', {
+        'category': category,
+        'subcategories': [
+            (sub, counts['category'][sub.pk]) for sub in subcategories if sub.pk in counts['category']
+        ],
+        'facets': facet_options,
+        'in_stock': {'checked': 'in_stock' in selected, 'count': counts['in_stock'].get(True, 0)},
+        'total': matches.bit_count(),
+        'listings': page,
+        'page': page,
+        'query': query.urlencode(),
+    })
+
+@condition(etag_func=_detail_etag, last_modified_func=_detail_last_modified)
+@cache_storefront_page
 def product_detail_view(request, pk):
-    return render(request, 'public/product_detail.html')
\ No newline at end of file
+    tag_request(request, product_tag(pk))
+    product = get_object_or_404(
+        Product.objects.select_related('category').prefetch_related('variants', 'images'),
+        pk=pk,
+        is_active=True,
+    )
+    tag_request(request, category_tag(product.category_id))
+    variants = [variant for variant in product.variants.all() if variant.is_active]
+    related = ProductListing.objects.filter(is_active=True, category_id=product.category_id).exclude(pk=product.pk)
+    return render(request, 'public/product_detail.html', {
+        'product': product,
+        'variants': variants,
+        'sizes': sorted({v.size for v in variants if v.size}),
+        'colors': sorted({v.color for v in variants if v.color}),
+        'images': product.images.all(),
+        'fragment_timeout': FRAGMENT_TIMEOUT,
+        'related_version': request.cache_tag_versions[category_tag(product.category_id)],
+        'related_listings': related[:RELATED_PRODUCTS],
+    })
+
+def _search_page(request):
+    try:
+        page = int(request.GET.get("page", 1))
+    except ValueError:
+        page = 1
+    query = request.GET.get("q", "").strip()
+    return query, search_products(query, page)
+
+def search_view(request):
+    query, results = _search_page(request)
+    return render(request, 'public/search.html', {
+        'search_query': query,
+        'results': results,
+        'page_query': results.corrected_query or query,
+    })
+
+def search_api_view(request):
+    """Ranked product search: ?q=<terms>&page=<n> returns one page of listings."""
+    query, results = _search_page(request)
+    return JsonResponse({
+        "query": query,
+        "corrected_query": results.corrected_query,
+        "page": results.number,
+        "has_next": results.has_next,
+        "results": [
+            {
+                "id": listing.product_id,
+                "name": listing.name,
+                "slug": listing.slug,
+                "brand": listing.brand,
+                "min_price": listing.min_price,
+                "max_price": listing.max_price,
+                "in_stock": listing.in_stock,
+                "image": listing.image,
+            }
+            for listing in results
+        ],
+    })
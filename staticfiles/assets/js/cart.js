@@ -0,0 +1,29 @@
+(function ($) {
+    "use strict";
+
+    // Pages are cached for anonymous visitors, so the cart badge is filled in
+    // from the cart summary (which also sets the CSRF cookie) after load.
+    function getCookie(name) {
+        var match = document.cookie.match('(^|;)\\s*' + name + '=([^;]*)');
+        return match ? decodeURIComponent(match[2]) : null;
+    }
+
+    function showSummary(summary) {
+        $('.cart-count').text(summary.item_count);
+    }
+
+    $.getJSON('/cart/summary/', showSummary);
+
+    $(document).on('submit', '.cart-add-form', function (event) {
+        event.preventDefault();
+        $.ajax({
+            url: this.action,
+            method: 'POST',
+            data: $(this).serialize(),
+            headers: {'X-CSRFToken': getCookie('csrftoken'), 'X-Requested-With': 'XMLHttpRequest'},
+        }).done(showSummary).fail(function (xhr) {
+            alert((xhr.responseJSON && xhr.responseJSON.error) || 'Could not add this item to the cart.');
+        });
+    });
+
+})(jQuery);
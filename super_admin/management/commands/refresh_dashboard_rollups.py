@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from super_admin.rollups import ROLLUP_BATCH_SIZE, refresh_rollups
+
+
+class Command(BaseCommand):
+    help = "Fold users changed since the last run into the dashboard rollup tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=ROLLUP_BATCH_SIZE)
+        parser.add_argument("--deletions", action="store_true",
+                            help="Also uncount deleted rows; this walks every counted row.")
+
+    def handle(self, *args, **options):
+        changed = refresh_rollups(batch_size=options["batch_size"], deletions=options["deletions"])
+        summary = ", ".join(f"{rollup} {count}" for rollup, count in changed.items())
+        self.stdout.write(self.style.SUCCESS(f"Rollups refreshed; rows regrouped: {summary}."))
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-16 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('rollup', models.CharField(help_text='The rollup this watermark belongs to', max_length=50, primary_key=True, serialize=False, verbose_name='rollup')),
+                ('refreshed_until', models.DateTimeField(help_text='Source rows changed before this time are reflected in the counts', verbose_name='refreshed until')),
+            ],
+            options={
+                'verbose_name': 'rollup watermark',
+                'verbose_name_plural': 'rollup watermarks',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rollup', models.CharField(help_text='Which rollup this count belongs to', max_length=50, verbose_name='rollup')),
+                ('key', models.CharField(help_text='The group values, joined with "|"', max_length=255, verbose_name='key')),
+                ('count', models.IntegerField(default=0, help_text='Number of rows currently in this group', verbose_name='count')),
+            ],
+            options={
+                'verbose_name': 'rollup count',
+                'verbose_name_plural': 'rollup counts',
+                'constraints': [models.UniqueConstraint(fields=('rollup', 'key'), name='unique_rollup_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rollup', models.CharField(help_text='Which rollup this row is counted in', max_length=50, verbose_name='rollup')),
+                ('object_id', models.BigIntegerField(help_text='Primary key of the source row', verbose_name='object ID')),
+                ('key', models.CharField(help_text='The group the row is counted in', max_length=255, verbose_name='key')),
+            ],
+            options={
+                'verbose_name': 'rollup member',
+                'verbose_name_plural': 'rollup members',
+                'constraints': [models.UniqueConstraint(fields=('rollup', 'object_id'), name='unique_rollup_member')],
+            },
+        ),
+    ]
@@ -1,3 +1,87 @@
 from django.db import models
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+
+class RollupCount(models.Model):
+    """
+    A pre-aggregated count for one group of a dashboard rollup, e.g. the
+    buyers in one tier and status. Maintained incrementally by
+    super_admin.rollups.refresh_rollups; the dashboard reads only these.
+    """
+    rollup = models.CharField(
+        _('rollup'),
+        max_length=50,
+        help_text=_('Which rollup this count belongs to')
+    )
+    key = models.CharField(
+        _('key'),
+        max_length=255,
+        help_text=_('The group values, joined with "|"')
+    )
+    count = models.IntegerField(
+        _('count'),
+        default=0,
+        help_text=_('Number of rows currently in this group')
+    )
+
+    class Meta:
+        verbose_name = _('rollup count')
+        verbose_name_plural = _('rollup counts')
+        constraints = [
+            models.UniqueConstraint(fields=['rollup', 'key'], name='unique_rollup_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.rollup} {self.key}: {self.count}"
+
+
+class RollupMember(models.Model):
+    """
+    The group a source row was last counted in, so a change moves it out of
+    its old group without rescanning the source table.
+    """
+    rollup = models.CharField(
+        _('rollup'),
+        max_length=50,
+        help_text=_('Which rollup this row is counted in')
+    )
+    object_id = models.BigIntegerField(
+        _('object ID'),
+        help_text=_('Primary key of the source row')
+    )
+    key = models.CharField(
+        _('key'),
+        max_length=255,
+        help_text=_('The group the row is counted in')
+    )
+
+    class Meta:
+        verbose_name = _('rollup member')
+        verbose_name_plural = _('rollup members')
+        constraints = [
+            models.UniqueConstraint(fields=['rollup', 'object_id'], name='unique_rollup_member'),
+        ]
+
+    def __str__(self):
+        return f"{self.rollup} #{self.object_id} in {self.key}"
+
+
+class RollupWatermark(models.Model):
+    """How far each rollup has been brought up to date."""
+    rollup = models.CharField(
+        _('rollup'),
+        max_length=50,
+        primary_key=True,
+        help_text=_('The rollup this watermark belongs to')
+    )
+    refreshed_until = models.DateTimeField(
+        _('refreshed until'),
+        help_text=_('Source rows changed before this time are reflected in the counts')
+    )
+
+    class Meta:
+        verbose_name = _('rollup watermark')
+        verbose_name_plural = _('rollup watermarks')
+
+    def __str__(self):
+        return f"{self.rollup} until {self.refreshed_until}"
@@ -0,0 +1,219 @@
+from collections import Counter
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from agpkart.db.transactions import atomic_write
+from super_admin.models import RollupCount, RollupMember, RollupWatermark
+from users.models import BuyerUser, PlatformUser, User
+
+SIGNUPS = 'signups'
+BUYERS = 'buyers'
+STAFF = 'staff'
+ROLLUP_BATCH_SIZE = 1000
+# Rows changed shortly before the last watermark are looked at again, so a
+# transaction that committed after a refresh started is never missed.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+KEY_SEPARATOR = '|'
+
+
+def _sources():
+    """
+    {rollup: (rows, change stamps)}: `rows` yields (pk, *group values) and
+    `change stamps` are the timestamp fields bumped when any of those
+    values changes.
+    """
+    return {
+        SIGNUPS: (
+            User.objects.annotate(day=TruncDate('date_joined')).values_list('pk', 'day', 'user_type'),
+            ['last_updated'],
+        ),
+        BUYERS: (
+            BuyerUser.objects.values_list('pk', 'tier', 'status'),
+            ['updated_at'],
+        ),
+        STAFF: (
+            PlatformUser.objects.values_list('pk', 'role', 'department', 'user__is_active'),
+            ['updated_at', 'user__last_updated'],
+        ),
+    }
+
+
+def make_key(values):
+    parts = []
+    for value in values:
+        if value is None:
+            value = ''
+        elif isinstance(value, bool):
+            value = int(value)
+        parts.append(str(value).replace(KEY_SEPARATOR, '/'))
+    return KEY_SEPARATOR.join(parts)
+
+
+def _add(rollup, deltas):
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    RollupCount.objects.bulk_create([RollupCount(rollup=rollup, key=key) for key in deltas], ignore_conflicts=True)
+    groups = RollupCount.objects.filter(rollup=rollup, key__in=deltas)
+    groups.update(count=F('count') + Case(*[When(key=key, then=Value(delta)) for key, delta in deltas.items()]))
+    groups.filter(count__lte=0).delete()
+
+
+def _apply(rollup, keys):
+    """Move rows whose group changed; `keys` is {pk: current key}. Returns the number moved."""
+    with atomic_write():
+        stored = dict(
+            RollupMember.objects.select_for_update()
+            .filter(rollup=rollup, object_id__in=keys).values_list('object_id', 'key')
+        )
+        deltas = Counter()
+        moved = []
+        for pk, key in keys.items():
+            old = stored.get(pk)
+            if old != key:
+                if old is not None:
+                    deltas[old] -= 1
+                deltas[key] += 1
+                moved.append(RollupMember(rollup=rollup, object_id=pk, key=key))
+        if moved:
+            RollupMember.objects.bulk_create(
+                moved, update_conflicts=True, unique_fields=['rollup', 'object_id'], update_fields=['key'],
+            )
+            _add(rollup, deltas)
+    return len(moved)
+
+
+def refresh_rollup(rollup, batch_size=ROLLUP_BATCH_SIZE, now=None):
+    """
+    Bring one rollup up to date and return the number of rows that changed
+    group.
+
+    Only source rows stamped since the last watermark are read, a primary
+    key batch at a time. Each is compared with the group it was last
+    counted in, and only the rows that moved touch the counts, so a run
+    costs in proportion to what changed rather than to the table. The first
+    run has no watermark and counts everything.
+    """
+    now = now or timezone.now()
+    rows, stamps = _sources()[rollup]
+    watermark = RollupWatermark.objects.filter(rollup=rollup).values_list('refreshed_until', flat=True).first()
+    if watermark is not None:
+        changed = Q()
+        for stamp in stamps:
+            changed |= Q(**{f'{stamp}__gte': watermark - WATERMARK_OVERLAP})
+        rows = rows.filter(changed)
+    rows = rows.order_by('pk')
+    moved = 0
+    last_pk = None
+    while True:
+        chunk = list((rows if last_pk is None else rows.filter(pk__gt=last_pk))[:batch_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+        moved += _apply(rollup, {pk: make_key(values) for pk, *values in chunk})
+    RollupWatermark.objects.update_or_create(rollup=rollup, defaults={'refreshed_until': now})
+    return moved
+
+
+def sweep_deleted(rollup, batch_size=ROLLUP_BATCH_SIZE):
+    """
+    Uncount rows that were deleted from the source table. Deletions leave
+    no change stamp behind, so this walks every member of the rollup and is
+    meant for off-peak runs. Returns the number of rows removed.
+    """
+    model = _sources()[rollup][0].model
+    members = RollupMember.objects.filter(rollup=rollup).order_by('object_id').values_list('object_id', 'key')
+    removed = 0
+    last_pk = None
+    while True:
+        chunk = list((members if last_pk is None else members.filter(object_id__gt=last_pk))[:batch_size])
+        if not chunk:
+            return removed
+        last_pk = chunk[-1][0]
+        existing = set(model.objects.filter(pk__in=[pk for pk, _ in chunk]).values_list('pk', flat=True))
+        gone = [(pk, key) for pk, key in chunk if pk not in existing]
+        if gone:
+            deltas = Counter()
+            for _, key in gone:
+                deltas[key] -= 1
+            with transaction.atomic():
+                RollupMember.objects.filter(rollup=rollup, object_id__in=[pk for pk, _ in gone]).delete()
+                _add(rollup, deltas)
+            removed += len(gone)
+
+
+def refresh_rollups(batch_size=ROLLUP_BATCH_SIZE, deletions=False):
+    """Refresh every rollup; returns {rollup: rows moved (and removed)}."""
+    changed = {}
+    for rollup in _sources():
+        changed[rollup] = refresh_rollup(rollup, batch_size)
+        if deletions:
+            changed[rollup] += sweep_deleted(rollup, batch_size)
+    return changed
+
+
+def dashboard_metrics(days=30):
+    """
+    Everything the dashboard shows, read from the rollup tables with one
+    query whose size depends on the number of groups, not of users.
+    """
+    start = timezone.localdate() - timedelta(days=days - 1)
+    rows = RollupCount.objects.filter(
+        # Signup keys start with an ISO date, so they sort chronologically.
+        Q(rollup=SIGNUPS, key__gte=start.isoformat()) | Q(rollup__in=[BUYERS, STAFF]), count__gt=0,
+    ).values_list('rollup', 'key', 'count')
+    signups = {start + timedelta(days=offset): Counter() for offset in range(days)}
+    buyers = {tier: Counter() for tier in BuyerUser.Tier.values}
+    staff = {}
+    for rollup, key, count in rows:
+        values = key.split(KEY_SEPARATOR)
+        if rollup == SIGNUPS:
+            day, user_type = values
+            signups[date.fromisoformat(day)][user_type] += count
+        elif rollup == BUYERS:
+            tier, status = values
+            buyers.setdefault(tier, Counter())[status] += count
+        else:
+            role, department, is_active = values
+            staff.setdefault((role, department), Counter())['active' if is_active == '1' else 'inactive'] += count
+    roles = dict(PlatformUser.Role.choices)
+    tiers = dict(BuyerUser.Tier.choices)
+    watermarks = RollupWatermark.objects.order_by('refreshed_until').values_list('refreshed_until', flat=True)
+    return {
+        'signups': [
+            {
+                'day': day,
+                'counts': [by_type[user_type] for user_type in User.UserType.values],
+                'total': sum(by_type.values()),
+            }
+            for day, by_type in sorted(signups.items(), reverse=True)
+        ],
+        'signup_types': User.UserType.labels,
+        'signup_total': sum(sum(by_type.values()) for by_type in signups.values()),
+        'buyers': [
+            {
+                'tier': tiers.get(tier, tier),
+                'counts': [by_status[status] for status in BuyerUser.Status.values],
+                'total': sum(by_status.values()),
+            }
+            for tier, by_status in buyers.items()
+        ],
+        'buyer_statuses': BuyerUser.Status.labels,
+        'buyer_total': sum(sum(by_status.values()) for by_status in buyers.values()),
+        'staff': [
+            {
+                'role': roles.get(role, role),
+                'department': department,
+                'active': counts['active'],
+                'inactive': counts['inactive'],
+            }
+            for (role, department), counts in sorted(staff.items())
+        ],
+        'staff_active': sum(counts['active'] for counts in staff.values()),
+        'staff_inactive': sum(counts['inactive'] for counts in staff.values()),
+        'refreshed_until': watermarks.first(),
+    }
@@ -1,3 +1,182 @@
-from django.test import TestCase
+import warnings
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db.models import F
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from functions.general_functions.decorators import allow_access_by_role
+
+from functions.general_functions.pagination import KeysetPaginator
+from super_admin import rollups
+from super_admin.models import RollupCount
+from users.models import User, PlatformUser, BuyerUser
+
+
+class UserListKeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        for i in range(7):
+            user = User.objects.create_user(
+                email=f"user{i}@example.com",
+                password="secret",
+                date_joined=now - timedelta(days=i % 3),
+            )
+            if i % 2 == 0:
+                PlatformUser.objects.create(user=user, role=PlatformUser.Role.SALES, department=f"D{i}")
+
+    def walk(self, ordering, per_page=3):
+        paginator = KeysetPaginator(User.objects.select_related('platform_user'), ordering, per_page=per_page)
+        seen, page = [], paginator.get_page()
+        seen.extend(u.id for u in page)
+        while page.has_next():
+            page = paginator.get_page(after=page.next_cursor)
+            seen.extend(u.id for u in page)
+        return paginator, page, seen
+
+    def test_forward_walk_matches_offset_ordering(self):
+        for ordering in (['-date_joined', '-id'], ['platform_user__role', '-date_joined', '-id']):
+            _, _, seen = self.walk(ordering)
+            expected = list(User.objects.order_by(*ordering).values_list('id', flat=True))
+            if ordering[0] == 'platform_user__role':
+                expected = [u.id for u in sorted(
+                    User.objects.select_related('platform_user').order_by('-date_joined', '-id'),
+                    key=lambda u: getattr(getattr(u, 'platform_user', None), 'role', '') or '',
+                )]
+            self.assertEqual(seen, expected)
+
+    def test_backward_walk_returns_previous_page(self):
+        paginator, last_page, _ = self.walk(['-date_joined', '-id'])
+        previous = paginator.get_page(before=last_page.previous_cursor)
+        expected = list(User.objects.order_by('-date_joined', '-id').values_list('id', flat=True))[3:6]
+        self.assertEqual([u.id for u in previous], expected)
+        self.assertTrue(previous.has_next())
+
+    def test_list_view_filters_and_avoids_per_row_queries(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/super_admin/user-list/", {"role": PlatformUser.Role.SALES})
+        users = list(response.context['users'])
+        self.assertEqual(len(users), 4)
+        self.assertTrue(all(u.platform_user.role == PlatformUser.Role.SALES for u in users))
+
+
+class RoleAccessTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(email="root@example.com", password="secret")
+        PlatformUser.objects.create(user=self.admin, role=PlatformUser.Role.SUPER_ADMIN)
+
+    def test_role_check_does_not_query_the_profile(self):
+        view = allow_access_by_role(
+            user_type=User.UserType.PLATFORM,
+            allowed_roles=[PlatformUser.Role.SUPER_ADMIN],
+        )(lambda request: HttpResponse("ok"))
+        request = RequestFactory().get("/")
+        request.user = User.objects.get(pk=self.admin.pk)
+        view(request)
+        request.user = User.objects.get(pk=self.admin.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(view(request).status_code, 200)
+
+    def test_required_permissions_are_enforced(self):
+        view = allow_access_by_role(
+            user_type=User.UserType.PLATFORM,
+            required_permissions=['manage_users'],
+        )(lambda request: HttpResponse("ok"))
+        request = RequestFactory().get("/")
+        request.user = self.admin
+        with self.assertRaises(Http404):
+            view(request)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.platform_user.can_manage_users = True
+            self.admin.platform_user.save()
+        self.assertEqual(view(request).status_code, 200)
+
+
+class DashboardRollupTests(TestCase):
+    def setUp(self):
+        self.buyers = [
+            BuyerUser.objects.create(user=User.objects.create_user(email=f"buyer{i}@example.com", password="x"))
+            for i in range(3)
+        ]
+        self.staff = User.objects.create_user(email="sales@example.com", password="x")
+        PlatformUser.objects.create(user=self.staff, role=PlatformUser.Role.SALES, department="North")
+        User.objects.create_user(email="new@example.com", password="x")
+
+    def counts(self, rollup):
+        return dict(RollupCount.objects.filter(rollup=rollup).values_list('key', 'count'))
+
+    def test_refresh_counts_everything_then_only_moves_changed_rows(self):
+        self.assertEqual(rollups.refresh_rollups(batch_size=2), {'signups': 5, 'buyers': 3, 'staff': 1})
+        today = timezone.localdate().isoformat()
+        self.assertEqual(self.counts('signups'), {f"{today}|BUYER": 3, f"{today}|PLATFORM": 1, f"{today}|UNASSIGNED": 1})
+        self.assertEqual(self.counts('buyers'), {"STANDARD|ACTIVE": 3})
+
+        buyer = self.buyers[0]
+        buyer.tier = BuyerUser.Tier.GOLD
+        buyer.save()
+        self.staff.is_active = False
+        self.staff.save()
+        self.assertEqual(rollups.refresh_rollups(batch_size=2), {'signups': 0, 'buyers': 1, 'staff': 1})
+        self.assertEqual(self.counts('buyers'), {"STANDARD|ACTIVE": 2, "GOLD|ACTIVE": 1})
+        self.assertEqual(self.counts('staff'), {"SALES|North|0": 1})
+
+        self.buyers[1].user.delete()
+        self.assertEqual(rollups.refresh_rollups(deletions=True)['buyers'], 1)
+        self.assertEqual(self.counts('buyers'), {"STANDARD|ACTIVE": 1, "GOLD|ACTIVE": 1})
+
+    def test_profile_creation_stamps_the_users_type_change(self):
+        user = User.objects.get(email="new@example.com")
+        User.objects.filter(pk=user.pk).update(last_updated=F('last_updated') - timedelta(days=2))
+        rollups.refresh_rollup(rollups.SIGNUPS, now=timezone.now() - timedelta(days=1))
+
+        BuyerUser.objects.create(user=user)
+        self.assertEqual(rollups.refresh_rollup(rollups.SIGNUPS), 1)
+        today = timezone.localdate().isoformat()
+        self.assertEqual(self.counts('signups'), {f"{today}|BUYER": 4, f"{today}|PLATFORM": 1})
+
+    def test_dashboard_reads_only_the_rollups(self):
+        rollups.refresh_rollups()
+        with self.assertNumQueries(2):
+            metrics = rollups.dashboard_metrics(days=7)
+        self.assertEqual((metrics['signup_total'], metrics['buyer_total']), (5, 3))
+        self.assertEqual(len(metrics['signups']), 7)
+        self.assertEqual(metrics['signups'][0]['total'], 5)
+        self.assertEqual(metrics['staff'], [{'role': "Sales Representative", 'department': "North", 'active': 1, 'inactive': 0}])
+
+    def test_dashboard_view_renders_the_rollups(self):
+        PlatformUser.objects.create(
+            user=User.objects.create_user(email="root@example.com", password="x"), role=PlatformUser.Role.SUPER_ADMIN,
+        )
+        rollups.refresh_rollups()
+        self.client.login(username="root@example.com", password="x")
+        response = self.client.get("/super_admin/dashboard/")
+        self.assertContains(response, "Sales Representative")
+        self.assertEqual(response.context['buyer_total'], 3)
+
+
+class ReferralReportTests(TestCase):
+    def test_report_lists_top_referrers_and_looks_up_a_buyer(self):
+        admin = User.objects.create_user(email="root@example.com", password="x")
+        PlatformUser.objects.create(user=admin, role=PlatformUser.Role.SUPER_ADMIN)
+        top = BuyerUser.objects.create(user=User.objects.create_user(email="top@example.com", password="x"))
+        child = BuyerUser.objects.create(
+            user=User.objects.create_user(email="child@example.com", password="x"), referred_by=top,
+        )
+        BuyerUser.objects.create(user=User.objects.create_user(email="grandchild@example.com", password="x"), referred_by=child)
+        self.client.login(username="root@example.com", password="x")
+
+        with warnings.catch_warnings():
+            # A naive month start compared with joined_at would warn here.
+            warnings.simplefilter('error', RuntimeWarning)
+            response = self.client.get("/super_admin/referrals/")
+        self.assertEqual(
+            [(r['email'], r['referrals'], r['downline']) for r in response.context['referrers']],
+            [("top@example.com", 1, 2), ("child@example.com", 1, 1)],
+        )
+        response = self.client.get("/super_admin/referrals/", {"buyer": "child@example.com"})
+        self.assertEqual(response.context['buyer']['upline'], ["top@example.com"])
+        self.assertEqual(response.context['buyer']['by_depth'], [(1, 1)])
@@ -1,8 +1,10 @@
 from django.urls import path
 from super_admin.views import (super_admin_dashboard_view,
+                               super_admin_referral_report_view,
                                super_admin_profile_view,
                                super_admin_password_change_view,
                                super_admin_user_list_view,
+                               super_admin_user_export_view,
                                super_admin_user_detail_view,
                                super_admin_user_create_view,
                                super_admin_user_update_view,
@@ -13,9 +15,11 @@ from super_admin.views import (super_admin_dashboard_view,
 
 urlpatterns = [
     path("dashboard/", super_admin_dashboard_view),
+    path("referrals/", super_admin_referral_report_view),
     path("profile/", super_admin_profile_view),
     path("password-change/", super_admin_password_change_view),
     path("user-list/", super_admin_user_list_view),
+    path("user-export/", super_admin_user_export_view),
     path("user-detail/<int:pk>/", super_admin_user_detail_view),
     path("user-create/", super_admin_user_create_view),
     path("user-update/<int:pk>/", super_admin_user_update_view),
@@ -1,7 +1,34 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
 from django.contrib import messages
-from users.models import User, PlatformUser
+from django.http import StreamingHttpResponse, HttpResponseBadRequest
+from users.models import User, PlatformUser, BuyerUser
+from users import referral_tree
+from users.exports import EXPORT_FORMATS, export_queryset, iter_export_rows
+from super_admin.rollups import dashboard_metrics
 from functions.general_functions.decorators import allow_access_by_role
+from functions.general_functions.pagination import KeysetPaginator, InvalidCursor
+
+USER_LIST_PAGE_SIZE = 50
+REFERRAL_REPORT_SIZE = 20
+REFERRAL_REPORT_DEPTHS = ('1', '2', '3')
+REFERRAL_DOWNLINE_DEPTH = 3
+
+# Every ordering ends on a unique column so keyset cursors never tie; each
+# one lines up with a (column, date_joined, id) index on User.
+USER_LIST_SORTS = {
+    'newest': ['-date_joined', '-id'],
+    'oldest': ['date_joined', 'id'],
+    'user_type': ['user_type', '-date_joined', '-id'],
+    'status': ['-is_active', '-date_joined', '-id'],
+    'role': ['platform_user__role', '-date_joined', '-id'],
+}
+
+USER_LIST_COLUMNS = (
+    'id', 'email', 'first_name', 'last_name', 'phone_number', 'gender',
+    'user_type', 'is_active', 'date_joined',
+    'platform_user__role', 'platform_user__department', 'platform_user__employee_id',
+)
 
 
 @allow_access_by_role(
@@ -9,7 +36,53 @@ from functions.general_functions.decorators import allow_access_by_role
     allowed_roles=[PlatformUser.Role.SUPER_ADMIN]
 )
 def super_admin_dashboard_view(request):
-    return render(request, "dashboard/dashboard.html")
+    return render(request, "dashboard/dashboard.html", dashboard_metrics())
+
+@allow_access_by_role(
+    user_type=User.UserType.PLATFORM,
+    allowed_roles=[PlatformUser.Role.SUPER_ADMIN]
+)
+def super_admin_referral_report_view(request):
+    params = request.GET
+    depth = params.get("depth")
+    depth = int(depth) if depth in REFERRAL_REPORT_DEPTHS else 1
+    # joined_at is a DateTimeField: compare it with an aware start of the month.
+    since = timezone.localtime().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if params.get("period") == "all":
+        since = None
+
+    top = referral_tree.top_referrers(REFERRAL_REPORT_SIZE, since=since, max_depth=depth)
+    ids = [buyer_id for buyer_id, _ in top]
+    emails = dict(User.objects.filter(pk__in=ids).values_list('pk', 'email'))
+    downlines = referral_tree.downline_counts(ids, max_depth=REFERRAL_DOWNLINE_DEPTH)
+    referrers = [
+        {'id': buyer_id, 'email': emails.get(buyer_id), 'referrals': referrals, 'downline': downlines.get(buyer_id, 0)}
+        for buyer_id, referrals in top
+    ]
+
+    buyer = None
+    lookup = params.get("buyer", "").strip()
+    if lookup:
+        buyer = BuyerUser.objects.filter(user__email__iexact=lookup).values('pk', 'user__email').first()
+        if buyer:
+            by_depth = referral_tree.downline_by_depth(buyer['pk'])
+            upline = referral_tree.upline(buyer['pk'])
+            upline_emails = dict(User.objects.filter(pk__in=upline).values_list('pk', 'email'))
+            buyer.update({
+                'by_depth': sorted(by_depth.items()),
+                'downline': sum(count for level, count in by_depth.items() if level <= REFERRAL_DOWNLINE_DEPTH),
+                'upline': [upline_emails[pk] for pk in upline],
+            })
+
+    return render(request, "dashboard/referrals.html", {
+        'referrers': referrers,
+        'buyer': buyer,
+        'lookup': lookup,
+        'since': since,
+        'depth': depth,
+        'depths': REFERRAL_REPORT_DEPTHS,
+        'downline_depth': REFERRAL_DOWNLINE_DEPTH,
+    })
 
 def super_admin_profile_view(request):
     return render(request, "dashboard/profile.html")
@@ -18,8 +91,70 @@ def super_admin_password_change_view(request):
     return render(request, "dashboard/users/password_change.html")
 
 def super_admin_user_list_view(request):
-    users = User.objects.all()
-    return render(request, "dashboard/users/user_list.html", {'users': users})
+    params = request.GET
+    users = User.objects.select_related('platform_user').only(*USER_LIST_COLUMNS)
+
+    user_type_val = params.get("user_type")
+    if user_type_val in User.UserType.values:
+        users = users.filter(user_type=user_type_val)
+    is_active_val = params.get("is_active")
+    if is_active_val in ("1", "0"):
+        users = users.filter(is_active=is_active_val == "1")
+    role_val = params.get("role")
+    if role_val in PlatformUser.Role.values:
+        users = users.filter(platform_user__role=role_val)
+
+    sort = params.get("sort")
+    if sort not in USER_LIST_SORTS:
+        sort = 'newest'
+
+    paginator = KeysetPaginator(users, USER_LIST_SORTS[sort], per_page=USER_LIST_PAGE_SIZE)
+    try:
+        page = paginator.get_page(after=params.get("after"), before=params.get("before"))
+    except InvalidCursor:
+        page = paginator.get_page()
+
+    # Carry the active filters over to the pagination links.
+    query = params.copy()
+    query.pop("after", None)
+    query.pop("before", None)
+
+    return render(request, "dashboard/users/user_list.html", {
+        'users': page,
+        'page': page,
+        'query': query.urlencode(),
+        'filters': {
+            'user_type': user_type_val or '',
+            'is_active': is_active_val or '',
+            'role': role_val or '',
+            'sort': sort,
+        },
+        'user_type': User.UserType.choices,
+        'role': PlatformUser.Role.choices,
+        'sorts': USER_LIST_SORTS.keys(),
+    })
+
+@allow_access_by_role(
+    user_type=User.UserType.PLATFORM,
+    allowed_roles=[PlatformUser.Role.SUPER_ADMIN]
+)
+def super_admin_user_export_view(request):
+    export_format = request.GET.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f"Unsupported export format '{export_format}'.")
+    try:
+        users = export_queryset(
+            user_type=request.GET.get("user_type"),
+            status=request.GET.get("status"),
+            tier=request.GET.get("tier"),
+        )
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+
+    stream, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(stream(iter_export_rows(users)), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="users.{export_format}"'
+    return response
 
 def super_admin_user_detail_view(request, pk):
     user = get_object_or_404(User, id=pk)
@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from users.models import Address
+
+ADDRESS_BATCH_SIZE = 500
+
+# Columns written by bulk_upsert_addresses for existing rows.
+ADDRESS_UPDATE_FIELDS = [
+    field.name for field in Address._meta.concrete_fields
+    if not field.primary_key and field.name not in ('created_at',)
+]
+
+
+def bulk_upsert_addresses(addresses, validate=True, batch_size=ADDRESS_BATCH_SIZE):
+    """
+    Create or update many addresses, for any number of users, in one
+    transaction.
+
+    Unsaved instances are inserted with bulk_create and saved ones rewritten
+    with bulk_update. If several addresses in the batch claim the default for
+    the same user and type, the last one wins. Existing defaults for every
+    affected (user, type) pair are cleared with a single UPDATE first, so the
+    one-default constraint holds throughout. Returns (created, updated).
+    """
+    addresses = list(addresses)
+    winners = {}
+    for address in addresses:
+        if validate:
+            address.clean_fields(exclude=['user'])
+        if address.is_default:
+            winners[(address.user_id, address.address_type)] = address
+    for address in addresses:
+        if address.is_default and winners[(address.user_id, address.address_type)] is not address:
+            address.is_default = False
+
+    now = timezone.now()
+    new = [address for address in addresses if address.pk is None]
+    existing = [address for address in addresses if address.pk is not None]
+    for address in existing:
+        address.updated_at = now
+
+    with transaction.atomic():
+        if winners:
+            pairs = Q()
+            for user_id, address_type in winners:
+                pairs |= Q(user_id=user_id, address_type=address_type)
+            Address.objects.filter(pairs, is_default=True).update(is_default=False, updated_at=now)
+        Address.objects.bulk_update(existing, ADDRESS_UPDATE_FIELDS, batch_size=batch_size)
+        Address.objects.bulk_create(new, batch_size=batch_size)
+    return len(new), len(existing)
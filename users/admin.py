@@ -1,4 +1,4 @@
 from django.contrib import admin
-from users.models import User, PlatformUser, BuyerUser
+from users.models import User, PlatformUser, BuyerUser, LoyaltyTransaction, OrderEvent, ReferralPath
 
-admin.site.register((User,PlatformUser, BuyerUser))
+admin.site.register((User,PlatformUser, BuyerUser, LoyaltyTransaction, OrderEvent, ReferralPath))
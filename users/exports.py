@@ -0,0 +1,97 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from users.models import User, BuyerUser
+
+# (column name, ORM lookup) pairs, in output order.
+EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('email', 'email'),
+    ('first_name', 'first_name'),
+    ('last_name', 'last_name'),
+    ('phone_number', 'phone_number'),
+    ('user_type', 'user_type'),
+    ('is_active', 'is_active'),
+    ('date_joined', 'date_joined'),
+    ('role', 'platform_user__role'),
+    ('department', 'platform_user__department'),
+    ('employee_id', 'platform_user__employee_id'),
+    ('tier', 'buyer_user__tier'),
+    ('status', 'buyer_user__status'),
+    ('lifetime_value', 'buyer_user__lifetime_value'),
+    ('average_order_value', 'buyer_user__average_order_value'),
+    ('order_count', 'buyer_user__order_count'),
+    ('last_order_date', 'buyer_user__last_order_date'),
+    ('loyalty_points', 'buyer_user__loyalty_points'),
+    ('loyalty_points_earned', 'buyer_user__loyalty_points_earned'),
+    ('loyalty_points_redeemed', 'buyer_user__loyalty_points_redeemed'),
+    ('account_balance', 'buyer_user__account_balance'),
+    ('referral_code', 'buyer_user__referral_code'),
+)
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def export_queryset(user_type=None, status=None, tier=None):
+    """
+    Build the export queryset, validating each filter against its choices.
+    """
+    users = User.objects.all()
+    if user_type:
+        if user_type not in User.UserType.values:
+            raise ValueError(f"Unknown user type '{user_type}'.")
+        users = users.filter(user_type=user_type)
+    if status:
+        if status not in BuyerUser.Status.values:
+            raise ValueError(f"Unknown buyer status '{status}'.")
+        users = users.filter(buyer_user__status=status)
+    if tier:
+        if tier not in BuyerUser.Tier.values:
+            raise ValueError(f"Unknown buyer tier '{tier}'.")
+        users = users.filter(buyer_user__tier=tier)
+    return users
+
+
+def iter_export_rows(users, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield one tuple per user in primary key order.
+
+    Rows are fetched in keyset chunks (id > last id seen), so only one chunk
+    is ever held in memory and no chunk pays for an OFFSET scan.
+    """
+    lookups = [lookup for _, lookup in EXPORT_COLUMNS]
+    users = users.order_by('id').values_list(*lookups)
+    last_id = 0
+    while True:
+        chunk = list(users.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last_id = chunk[-1][0]
+
+
+class _Echo:
+    """File-like object whose write() just hands the line back to csv.writer."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_jsonl(rows):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv'),
+    'jsonl': (stream_jsonl, 'application/x-ndjson'),
+}
@@ -0,0 +1,239 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from agpkart.db.routers import read_from_primary
+from users.models import User, PlatformUser, BuyerUser
+from users.referrals import assign_referral_codes
+
+IMPORT_BATCH_SIZE = 1000
+
+# Columns read from each input row, grouped by the model they belong to.
+USER_COLUMNS = ('email', 'phone_number', 'first_name', 'last_name', 'gender', 'user_type')
+PLATFORM_COLUMNS = ('role', 'department', 'employee_id')
+BUYER_COLUMNS = ('tier', 'status')
+
+
+class MalformedRow:
+    """A record that could not be parsed; clean_row rejects it like an invalid row."""
+    def __init__(self, raw, error):
+        self.raw = raw
+        self.error = error
+
+
+class ImportResult:
+    """Running totals for a bulk import, plus the rows that were rejected."""
+    def __init__(self):
+        self.created = 0
+        self.rejected = []
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.created / self.elapsed if self.elapsed else 0.0
+
+    def reject(self, line, row, errors):
+        if isinstance(row, MalformedRow):
+            row = {'raw': row.raw}
+        elif not isinstance(row, dict):
+            row = {'raw': row}
+        row = {k: v for k, v in row.items() if k != 'password'}
+        self.rejected.append((line, row, errors))
+
+    def summary(self):
+        return (
+            f"Created {self.created} users, rejected {len(self.rejected)} rows "
+            f"in {self.elapsed:.2f}s ({self.rows_per_second:.0f} rows/s)."
+        )
+
+
+def read_rows(stream, file_format):
+    """
+    Yield one dict per record from a CSV or JSONL text stream. A JSONL line
+    that is not valid JSON is yielded as a MalformedRow, so it is rejected
+    on its own instead of ending the import.
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+    elif file_format == 'jsonl':
+        for line in stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as exc:
+                    yield MalformedRow(line.strip(), f"Invalid JSON: {exc}")
+    else:
+        raise ValueError(f"Unsupported import format '{file_format}'.")
+
+
+def clean_row(row):
+    """
+    Validate a raw row against the model fields and return cleaned values.
+
+    Raises ValidationError with a {column: [messages]} dict on failure.
+    Uniqueness is checked per batch in import_users, not here.
+    """
+    if isinstance(row, MalformedRow):
+        raise ValidationError({'row': [row.error]})
+    if not isinstance(row, dict):
+        raise ValidationError({'row': [f"Expected an object, got {type(row).__name__}."]})
+    cleaned, errors = {}, {}
+    user_type = row.get('user_type') or User.UserType.UNASSIGNED
+    columns = [(User, c) for c in USER_COLUMNS]
+    if user_type == User.UserType.PLATFORM:
+        columns += [(PlatformUser, c) for c in PLATFORM_COLUMNS]
+    elif user_type == User.UserType.BUYER:
+        columns += [(BuyerUser, c) for c in BUYER_COLUMNS]
+
+    for model, column in columns:
+        field = model._meta.get_field(column)
+        value = row.get(column)
+        if isinstance(value, str):
+            value = value.strip()
+        if value in (None, ''):
+            if field.has_default():
+                continue
+            value = None if field.null else ''
+        try:
+            cleaned[column] = field.clean(value, None)
+        except ValidationError as exc:
+            errors[column] = exc.messages
+
+    if not errors.get('email') and cleaned.get('email'):
+        cleaned['email'] = User.objects.normalize_email(cleaned['email'])
+    if errors:
+        raise ValidationError(errors)
+    cleaned['user_type'] = user_type
+    cleaned['password'] = row.get('password') or None
+    return cleaned
+
+
+def _setup_worker():
+    # Spawned workers start without Django configured; forked ones already are.
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agpkart.settings')
+    django.setup()
+
+
+def hash_passwords(passwords, pool=None, workers=1):
+    """Hash a batch of raw passwords, spreading the work across `pool` if given."""
+    if pool is None:
+        return [make_password(p) for p in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def _find_duplicates(batch):
+    """Return {index: errors} for rows clashing with the database or earlier rows."""
+    emails = {c['email'] for _, c in batch}
+    phones = {c['phone_number'] for _, c in batch if c.get('phone_number')}
+    employee_ids = {c['employee_id'] for _, c in batch if c.get('employee_id')}
+    taken = {
+        'email': set(User.objects.filter(email__in=emails).values_list('email', flat=True)),
+        'phone_number': set(User.objects.filter(phone_number__in=phones).values_list('phone_number', flat=True)),
+        'employee_id': set(PlatformUser.objects.filter(employee_id__in=employee_ids).values_list('employee_id', flat=True)),
+    }
+    duplicates = {}
+    for index, (_, cleaned) in enumerate(batch):
+        values = {column: cleaned.get(column) for column in taken if cleaned.get(column)}
+        errors = {
+            column: [f"Duplicate {column} '{value}'."]
+            for column, value in values.items() if value in taken[column]
+        }
+        if errors:
+            duplicates[index] = errors
+            continue
+        for column, value in values.items():
+            taken[column].add(value)
+    return duplicates
+
+
+def _insert_batch(batch, passwords):
+    users = []
+    for (_, cleaned), password in zip(batch, passwords):
+        fields = {c: cleaned[c] for c in USER_COLUMNS if c in cleaned}
+        users.append(User(password=password, **fields))
+
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        if any(user.pk is None for user in users):
+            # Backends without RETURNING support leave pks unset.
+            ids = dict(User.objects.filter(email__in=[u.email for u in users]).values_list('email', 'id'))
+            for user in users:
+                user.pk = ids[user.email]
+
+        platform_users, buyer_users = [], []
+        for user, (_, cleaned) in zip(users, batch):
+            if user.user_type == User.UserType.PLATFORM:
+                fields = {c: cleaned[c] for c in PLATFORM_COLUMNS if c in cleaned}
+                platform_users.append(PlatformUser(user=user, **fields))
+            elif user.user_type == User.UserType.BUYER:
+                fields = {c: cleaned[c] for c in BUYER_COLUMNS if c in cleaned}
+                buyer_users.append(BuyerUser(user=user, **fields))
+        assign_referral_codes(buyer_users)
+        PlatformUser.objects.bulk_create(platform_users)
+        BuyerUser.objects.bulk_create(buyer_users)
+    return len(users)
+
+
+def import_users(rows, batch_size=IMPORT_BATCH_SIZE, workers=None, progress=None):
+    """
+    Validate and insert users with their profiles in batches.
+
+    Each batch is validated, checked for duplicates with one query per unique
+    column, has its passwords hashed across a process pool and is inserted
+    with bulk_create inside its own transaction. Invalid rows are skipped and
+    reported in the returned ImportResult. `progress`, if given, is called
+    with the result after every batch.
+    """
+    result = ImportResult()
+    workers = os.cpu_count() if workers is None else workers
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) if workers > 1 else None
+
+    def flush(batch):
+        # The previous batch may not have reached a replica yet.
+        with read_from_primary():
+            duplicates = _find_duplicates(batch)
+        for index in sorted(duplicates, reverse=True):
+            line, cleaned = batch.pop(index)
+            result.reject(line, cleaned, duplicates[index])
+        if batch:
+            passwords = hash_passwords([cleaned['password'] for _, cleaned in batch], pool, workers)
+            result.created += _insert_batch(batch, passwords)
+        result.elapsed = time.monotonic() - result.started
+        if progress:
+            progress(result)
+
+    try:
+        batch = []
+        for line, row in enumerate(rows, start=1):
+            try:
+                batch.append((line, clean_row(row)))
+            except ValidationError as exc:
+                result.reject(line, row, exc.message_dict)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    result.elapsed = time.monotonic() - result.started
+    return result
+
+
+def write_rejections(result, stream):
+    """Write rejected rows as CSV with their line number and errors."""
+    writer = csv.writer(stream)
+    writer.writerow(['line', 'errors', 'row'])
+    for line, row, errors in result.rejected:
+        writer.writerow([line, json.dumps(errors), json.dumps(row, default=str)])
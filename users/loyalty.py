@@ -0,0 +1,183 @@
+from collections import defaultdict
+from contextlib import nullcontext
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from agpkart.db.transactions import atomic_write
+from users.models import BuyerUser, LoyaltyTransaction
+
+COUNTER_FIELDS = ('loyalty_points', 'loyalty_points_earned', 'loyalty_points_redeemed')
+LEDGER_BATCH_SIZE = 500
+
+
+class InsufficientPoints(ValueError):
+    pass
+
+
+def post_points(buyer, points, kind, reason=""):
+    """
+    Record a ledger entry and apply it to the buyer's counters.
+
+    The counters are changed with a single conditional UPDATE of just those
+    columns, so concurrent postings never lose each other's updates and a
+    redemption or expiry can never take the balance below zero.
+    """
+    if points <= 0:
+        raise ValueError("Points must be a positive number.")
+    buyers = BuyerUser.objects.filter(pk=buyer.pk)
+    with transaction.atomic():
+        if kind == LoyaltyTransaction.Kind.EARN:
+            updated = buyers.update(
+                loyalty_points=F('loyalty_points') + points,
+                loyalty_points_earned=F('loyalty_points_earned') + points,
+            )
+        elif kind == LoyaltyTransaction.Kind.REDEEM:
+            updated = buyers.filter(loyalty_points__gte=points).update(
+                loyalty_points=F('loyalty_points') - points,
+                loyalty_points_redeemed=F('loyalty_points_redeemed') + points,
+            )
+        elif kind == LoyaltyTransaction.Kind.EXPIRE:
+            updated = buyers.filter(loyalty_points__gte=points).update(
+                loyalty_points=F('loyalty_points') - points,
+            )
+        else:
+            raise ValueError(f"Unknown loyalty transaction kind '{kind}'.")
+        if not updated:
+            raise InsufficientPoints(f"Buyer {buyer.pk} has fewer than {points} points.")
+        entry = LoyaltyTransaction.objects.create(buyer_id=buyer.pk, kind=kind, points=points, reason=reason)
+    buyer.refresh_from_db(fields=COUNTER_FIELDS)
+    return entry
+
+
+def post_earned_points_batch(entries, batch_size=LEDGER_BATCH_SIZE):
+    """
+    Award points to many buyers at once.
+
+    `entries` is an iterable of (buyer_id, points, reason) tuples. Each batch
+    is one bulk INSERT into the ledger plus one UPDATE whose CASE adds every
+    buyer's total, all in a single transaction. Returns the number of
+    ledger entries written.
+    """
+    written = 0
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            written += _post_earned_batch(batch)
+            batch = []
+    if batch:
+        written += _post_earned_batch(batch)
+    return written
+
+
+def _post_earned_batch(batch):
+    totals = defaultdict(int)
+    ledger = []
+    for buyer_id, points, reason in batch:
+        if points <= 0:
+            raise ValueError("Points must be a positive number.")
+        totals[buyer_id] += points
+        ledger.append(LoyaltyTransaction(
+            buyer_id=buyer_id, kind=LoyaltyTransaction.Kind.EARN, points=points, reason=reason,
+        ))
+    delta = Case(*[When(pk=pk, then=Value(total)) for pk, total in totals.items()], default=Value(0))
+    with transaction.atomic():
+        LoyaltyTransaction.objects.bulk_create(ledger)
+        BuyerUser.objects.filter(pk__in=totals).update(
+            loyalty_points=F('loyalty_points') + delta,
+            loyalty_points_earned=F('loyalty_points_earned') + delta,
+        )
+    return len(ledger)
+
+
+def _ledger_totals(first_pk, last_pk):
+    zero = Value(0)
+    rows = LoyaltyTransaction.objects.filter(buyer_id__gte=first_pk, buyer_id__lte=last_pk).order_by()
+    rows = rows.values('buyer_id').annotate(
+        earned=Coalesce(Sum('points', filter=Q(kind=LoyaltyTransaction.Kind.EARN)), zero),
+        redeemed=Coalesce(Sum('points', filter=Q(kind=LoyaltyTransaction.Kind.REDEEM)), zero),
+        expired=Coalesce(Sum('points', filter=Q(kind=LoyaltyTransaction.Kind.EXPIRE)), zero),
+    )
+    return {
+        row['buyer_id']: (row['earned'] - row['redeemed'] - row['expired'], row['earned'], row['redeemed'])
+        for row in rows
+    }
+
+
+def reconcile_balances(batch_size=LEDGER_BATCH_SIZE, fix=False):
+    """
+    Compare each buyer's counters against the ledger, a primary key range at
+    a time, and return [(buyer_id, counters, ledger)] for every mismatch.
+
+    With fix=True each range is read in one transaction with its buyer rows
+    locked (where the backend supports it), and the counters are corrected
+    by the difference found rather than overwritten: a posting landing after
+    the read moves the counters and the ledger alike, so the correction
+    still holds once it is applied.
+    """
+    drift = []
+    last_pk = None
+    buyers = BuyerUser.objects.order_by('pk').values_list('pk', *COUNTER_FIELDS)
+    if fix:
+        buyers = buyers.select_for_update()
+    while True:
+        with atomic_write() if fix else nullcontext():
+            chunk = list((buyers if last_pk is None else buyers.filter(pk__gt=last_pk))[:batch_size])
+            if not chunk:
+                return drift
+            last_pk = chunk[-1][0]
+            totals = _ledger_totals(chunk[0][0], last_pk)
+            corrections = {}
+            for pk, *counters in chunk:
+                expected = totals.get(pk, (0, 0, 0))
+                if tuple(counters) != expected:
+                    drift.append((pk, tuple(counters), expected))
+                    corrections[pk] = [want - have for want, have in zip(expected, counters)]
+            if fix and corrections:
+                BuyerUser.objects.filter(pk__in=corrections).update(**{
+                    field: F(field) + Case(
+                        *[When(pk=pk, then=Value(delta[i])) for pk, delta in corrections.items()], default=Value(0),
+                    )
+                    for i, field in enumerate(COUNTER_FIELDS)
+                })
+
+
+def compact_ledger(before, batch_size=LEDGER_BATCH_SIZE):
+    """
+    Collapse each buyer's ledger entries older than `before` into one entry
+    per kind, keeping every total intact. Returns the number of rows removed.
+    """
+    removed = 0
+    last_pk = None
+    old = LoyaltyTransaction.objects.filter(created_at__lt=before).order_by()
+    buyer_ids = old.order_by('buyer_id').values_list('buyer_id', flat=True).distinct()
+    while True:
+        chunk = list((buyer_ids if last_pk is None else buyer_ids.filter(buyer_id__gt=last_pk))[:batch_size])
+        if not chunk:
+            return removed
+        last_pk = chunk[-1]
+        in_range = old.filter(buyer_id__gte=chunk[0], buyer_id__lte=last_pk)
+        groups = list(in_range.values('buyer_id', 'kind').annotate(
+            total=Sum('points'), entries=Count('id'), latest=Max('created_at'),
+        ).filter(entries__gt=1))
+        if not groups:
+            continue
+        summaries = [
+            LoyaltyTransaction(
+                buyer_id=group['buyer_id'],
+                kind=group['kind'],
+                points=group['total'],
+                reason=f"Compacted {group['entries']} entries",
+                created_at=group['latest'],
+            )
+            for group in groups
+        ]
+        compacted = Q()
+        for group in groups:
+            compacted |= Q(buyer_id=group['buyer_id'], kind=group['kind'])
+        with transaction.atomic():
+            deleted, _ = in_range.filter(compacted).delete()
+            LoyaltyTransaction.objects.bulk_create(summaries)
+        removed += deleted - len(summaries)
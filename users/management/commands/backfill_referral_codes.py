@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.referrals import backfill_referral_codes
+
+
+class Command(BaseCommand):
+    help = "Assign referral codes to buyers that were created without one."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = backfill_referral_codes(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Assigned referral codes to {updated} buyers."))
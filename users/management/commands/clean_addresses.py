@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from users.postal_codes import VALIDATION_BATCH_SIZE, validate_addresses
+
+
+class Command(BaseCommand):
+    help = "Validate stored addresses against the postal code directory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Correct city/state from the directory.")
+        parser.add_argument("--batch-size", type=int, default=VALIDATION_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        stats = validate_addresses(fix=options["fix"], batch_size=options["batch_size"])
+        self.stdout.write(
+            "Checked {checked} addresses: {unknown} unknown postal codes, "
+            "{mismatched} city/state mismatches, {fixed} fixed.".format(**stats)
+        )
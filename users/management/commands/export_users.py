@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.exports import EXPORT_FORMATS, EXPORT_CHUNK_SIZE, export_queryset, iter_export_rows
+
+
+class Command(BaseCommand):
+    help = "Stream users joined with their platform/buyer profiles as CSV or JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv")
+        parser.add_argument("--output", help="File to write to (defaults to stdout).")
+        parser.add_argument("--user-type", help="Only export users of this type.")
+        parser.add_argument("--status", help="Only export buyers with this status.")
+        parser.add_argument("--tier", help="Only export buyers in this tier.")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            users = export_queryset(
+                user_type=options["user_type"],
+                status=options["status"],
+                tier=options["tier"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        stream, _ = EXPORT_FORMATS[options["format"]]
+        rows = iter_export_rows(users, chunk_size=options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as out:
+                out.writelines(stream(rows))
+        else:
+            for line in stream(rows):
+                self.stdout.write(line, ending="")
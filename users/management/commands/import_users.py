@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.imports import IMPORT_BATCH_SIZE, import_users, read_rows, write_rejections
+
+
+class Command(BaseCommand):
+    help = "Bulk import users and their platform/buyer profiles from a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file to import.")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument("--workers", type=int, help="Password hashing processes (defaults to CPU count).")
+        parser.add_argument("--rejects", help="Write rejected rows and their errors to this CSV file.")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"File '{path}' does not exist.")
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        if file_format not in ("csv", "jsonl"):
+            raise CommandError("Cannot infer the format; pass --format csv or --format jsonl.")
+
+        def progress(result):
+            if options["verbosity"] > 1:
+                self.stdout.write(result.summary())
+
+        with path.open(newline="", encoding="utf-8") as stream:
+            result = import_users(
+                read_rows(stream, file_format),
+                batch_size=options["batch_size"],
+                workers=options["workers"],
+                progress=progress,
+            )
+
+        if options["rejects"] and result.rejected:
+            with open(options["rejects"], "w", newline="", encoding="utf-8") as out:
+                write_rejections(result, out)
+        for line, _, errors in result.rejected[:20]:
+            self.stderr.write(f"Line {line}: {errors}")
+        self.stdout.write(self.style.SUCCESS(result.summary()))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.postal_codes import BUNDLED_POSTAL_CODES, load_postal_codes, read_postal_codes
+
+
+class Command(BaseCommand):
+    help = "Load postal code reference data (the bundled seed file by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default=BUNDLED_POSTAL_CODES,
+                            help="CSV file with postal_code,city,state[,country] columns.")
+
+    def handle(self, *args, **options):
+        try:
+            loaded = load_postal_codes(read_postal_codes(options["path"]))
+        except (OSError, KeyError) as exc:
+            raise CommandError(f"Could not read postal codes: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Loaded {loaded} postal codes."))
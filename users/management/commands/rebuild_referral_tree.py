@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.referral_tree import PATH_BATCH_SIZE, rebuild_tree
+
+
+class Command(BaseCommand):
+    help = "Recreate the referral closure table from BuyerUser.referred_by, one level at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=PATH_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        paths = rebuild_tree(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the referral tree with {paths} paths."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import BuyerUser
+from users.tiers import TIER_BATCH_SIZE, recalculate_tiers
+
+
+class Command(BaseCommand):
+    help = "Recompute buyer tiers from lifetime value with set-based batched updates."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--status", help="Only recalculate buyers with this status.")
+        parser.add_argument("--batch-size", type=int, default=TIER_BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Report transitions without writing them.")
+
+    def handle(self, *args, **options):
+        buyers = BuyerUser.objects.all()
+        if options["status"]:
+            if options["status"] not in BuyerUser.Status.values:
+                raise CommandError(f"Unknown buyer status '{options['status']}'.")
+            buyers = buyers.filter(status=options["status"])
+
+        transitions = recalculate_tiers(buyers, batch_size=options["batch_size"], dry_run=options["dry_run"])
+        for (old, new), count in sorted(transitions.items()):
+            self.stdout.write(f"{old} -> {new}: {count}")
+        verb = "Would move" if options["dry_run"] else "Moved"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {sum(transitions.values())} buyers between tiers."))
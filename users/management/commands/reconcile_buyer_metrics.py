@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from users.purchases import RECONCILE_BATCH_SIZE, reconcile_metrics
+
+
+class Command(BaseCommand):
+    help = "Verify buyer purchase metrics against the order history, a batch of buyers at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Rewrite drifted metrics from the order history.")
+        parser.add_argument("--batch-size", type=int, default=RECONCILE_BATCH_SIZE)
+        parser.add_argument("--pause", type=float, default=0, help="Seconds to sleep between batches.")
+
+    def handle(self, *args, **options):
+        drift = reconcile_metrics(batch_size=options["batch_size"], fix=options["fix"], pause=options["pause"])
+        for buyer_id, stored, expected in drift[:50]:
+            self.stdout.write(f"Buyer {buyer_id}: metrics {stored} != history {expected}")
+        if drift:
+            action = "fixed" if options["fix"] else "found"
+            self.stdout.write(self.style.WARNING(f"Drift {action} on {len(drift)} buyers."))
+        else:
+            self.stdout.write(self.style.SUCCESS("All buyer metrics match the order history."))
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.loyalty import LEDGER_BATCH_SIZE, compact_ledger, reconcile_balances
+
+
+class Command(BaseCommand):
+    help = "Verify buyer loyalty balances against the ledger and optionally compact old entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Rewrite drifted counters from the ledger.")
+        parser.add_argument("--compact-days", type=int,
+                            help="Collapse ledger entries older than this many days first.")
+        parser.add_argument("--batch-size", type=int, default=LEDGER_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options["compact_days"] is not None:
+            before = timezone.now() - timedelta(days=options["compact_days"])
+            removed = compact_ledger(before, batch_size=options["batch_size"])
+            self.stdout.write(f"Compacted ledger, removed {removed} entries.")
+
+        drift = reconcile_balances(batch_size=options["batch_size"], fix=options["fix"])
+        for buyer_id, counters, expected in drift[:50]:
+            self.stdout.write(f"Buyer {buyer_id}: counters {counters} != ledger {expected}")
+        if drift:
+            action = "fixed" if options["fix"] else "found"
+            self.stdout.write(self.style.WARNING(f"Drift {action} on {len(drift)} buyers."))
+        else:
+            self.stdout.write(self.style.SUCCESS("All loyalty balances match the ledger."))
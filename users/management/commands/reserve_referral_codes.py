@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.referrals import reserve_stored_codes
+
+
+class Command(BaseCommand):
+    help = "Reserve the sequence positions of stored referral codes; run after changing REFERRAL_CODE_KEY."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        reserved = reserve_stored_codes(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Reserved {reserved} referral code positions."))
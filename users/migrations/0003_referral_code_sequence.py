@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-16 22:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferralCodeSequence',
+            fields=[
+                ('name', models.CharField(help_text='The sequence identifier', max_length=50, primary_key=True, serialize=False, verbose_name='name')),
+                ('next_value', models.PositiveBigIntegerField(default=0, help_text='The next unallocated position in the sequence', verbose_name='next value')),
+            ],
+            options={
+                'verbose_name': 'referral code sequence',
+                'verbose_name_plural': 'referral code sequences',
+            },
+        ),
+    ]
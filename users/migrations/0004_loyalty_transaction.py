@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-16 22:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_referral_code_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoyaltyTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('EARN', 'Earned'), ('REDEEM', 'Redeemed'), ('EXPIRE', 'Expired')], help_text='Whether points were earned, redeemed or expired', max_length=10, verbose_name='kind')),
+                ('points', models.PositiveIntegerField(help_text='The number of points moved by this transaction', verbose_name='points')),
+                ('reason', models.CharField(blank=True, help_text='Why the points were moved, e.g. an order reference', max_length=255, verbose_name='reason')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When this transaction was posted', verbose_name='created at')),
+                ('buyer', models.ForeignKey(help_text='The buyer whose balance this transaction changes', on_delete=django.db.models.deletion.CASCADE, related_name='loyalty_transactions', to='users.buyeruser', verbose_name='buyer')),
+            ],
+            options={
+                'verbose_name': 'loyalty transaction',
+                'verbose_name_plural': 'loyalty transactions',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['buyer', 'created_at'], name='users_loyal_buyer_i_b980b0_idx'), models.Index(fields=['created_at'], name='users_loyal_created_a5c2f1_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-16 22:30
+
+from django.db import migrations, models
+
+
+def demote_duplicate_defaults(apps, schema_editor):
+    """Keep only the most recently updated default per user and address type."""
+    Address = apps.get_model('users', 'Address')
+    defaults = Address.objects.filter(is_default=True).order_by('user_id', 'address_type', '-updated_at', '-id')
+    seen = set()
+    demote = []
+    for pk, user_id, address_type in defaults.values_list('pk', 'user_id', 'address_type').iterator():
+        if (user_id, address_type) in seen:
+            demote.append(pk)
+        else:
+            seen.add((user_id, address_type))
+    for start in range(0, len(demote), 500):
+        Address.objects.filter(pk__in=demote[start:start + 500]).update(is_default=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_loyalty_transaction'),
+    ]
+
+    operations = [
+        migrations.RunPython(demote_duplicate_defaults, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='address',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('user', 'address_type'), name='users_address_one_default_per_type', violation_error_message='This user already has a default address of this type.'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-16 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_address_one_default_per_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostalCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('postal_code', models.CharField(help_text='The postal code or ZIP code', max_length=20, verbose_name='postal code')),
+                ('city', models.CharField(help_text='The city or locality', max_length=100, verbose_name='city')),
+                ('state', models.CharField(help_text='The state, province, or region', max_length=100, verbose_name='state/province/region')),
+                ('country', models.CharField(default='India', help_text='The country', max_length=100, verbose_name='country')),
+            ],
+            options={
+                'verbose_name': 'postal code',
+                'verbose_name_plural': 'postal codes',
+                'ordering': ['country', 'postal_code'],
+                'constraints': [models.UniqueConstraint(fields=('country', 'postal_code'), name='users_postalcode_unique_per_country')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-16 23:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_postal_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('PLACED', 'Placed'), ('REFUNDED', 'Refunded')], help_text='Whether an order was placed or money was refunded', max_length=10, verbose_name='kind')),
+                ('reference', models.CharField(help_text='Order or refund number; an event is recorded once per reference', max_length=64, verbose_name='reference')),
+                ('amount', models.DecimalField(decimal_places=2, help_text='The order total or the refunded amount', max_digits=12, verbose_name='amount')),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When the order was placed or the refund issued', verbose_name='occurred at')),
+                ('buyer', models.ForeignKey(help_text='The buyer whose metrics this event changes', on_delete=django.db.models.deletion.CASCADE, related_name='order_events', to='users.buyeruser', verbose_name='buyer')),
+            ],
+            options={
+                'verbose_name': 'order event',
+                'verbose_name_plural': 'order events',
+                'ordering': ['-occurred_at'],
+                'indexes': [models.Index(fields=['buyer', 'kind', 'occurred_at'], name='users_order_buyer_i_6b48e1_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'reference'), name='unique_order_event_reference')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-16 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0007_order_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='platformuser',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='When this staff profile was last updated', verbose_name='updated at'),
+        ),
+        migrations.AddIndex(
+            model_name='buyeruser',
+            index=models.Index(fields=['updated_at'], name='users_buyer_updated_d4ca2d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='platformuser',
+            index=models.Index(fields=['updated_at'], name='users_platf_updated_645a4d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['last_updated'], name='users_user_last_up_9acacd_idx'),
+        ),
+    ]
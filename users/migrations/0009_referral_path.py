@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-16 23:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_change_stamp_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferralPath',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField(help_text='1 for a direct referral, 2 for a referral of a referral, and so on', verbose_name='depth')),
+                ('joined_at', models.DateTimeField(help_text='When the descendant joined, for time-bounded referral counts', verbose_name='joined at')),
+                ('ancestor', models.ForeignKey(help_text='The buyer higher up the referral chain', on_delete=django.db.models.deletion.CASCADE, related_name='downline_paths', to='users.buyeruser', verbose_name='ancestor')),
+                ('descendant', models.ForeignKey(help_text='The buyer referred, directly or indirectly', on_delete=django.db.models.deletion.CASCADE, related_name='upline_paths', to='users.buyeruser', verbose_name='descendant')),
+            ],
+            options={
+                'verbose_name': 'referral path',
+                'verbose_name_plural': 'referral paths',
+                'indexes': [models.Index(fields=['ancestor', 'depth'], name='users_refer_ancesto_eaf737_idx'), models.Index(fields=['descendant', 'depth'], name='users_refer_descend_6ed224_idx'), models.Index(fields=['depth', 'joined_at'], name='users_refer_depth_934b91_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_referral_path')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-17 00:29
+
+from django.db import migrations, models
+
+
+def reserve_legacy_codes(apps, schema_editor):
+    """Reserve the positions of codes handed out before the sequence allocator."""
+    from users.referrals import reserve_stored_codes
+    reserve_stored_codes(
+        apps.get_model('users', 'BuyerUser'),
+        apps.get_model('users', 'ReferralCodeSequence'),
+        apps.get_model('users', 'ReservedReferralCode'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_referral_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservedReferralCode',
+            fields=[
+                ('position', models.PositiveBigIntegerField(help_text='Sequence position whose code is already taken', primary_key=True, serialize=False, verbose_name='position')),
+                ('code', models.CharField(help_text='The referral code held at that position', max_length=20, verbose_name='code')),
+            ],
+            options={
+                'verbose_name': 'reserved referral code',
+                'verbose_name_plural': 'reserved referral codes',
+            },
+        ),
+        migrations.AddField(
+            model_name='referralcodesequence',
+            name='next_reserved',
+            field=models.PositiveBigIntegerField(blank=True, help_text='The first reserved position at or after the next value, if any', null=True, verbose_name='next reserved'),
+        ),
+        migrations.RunPython(reserve_legacy_codes, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,20 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.core.validators import RegexValidator
+from agpkart.db.transactions import atomic_write
+from users.permissions import (
+    PLATFORM_ACCESS_FIELDS, USER_ACCESS_FIELDS, PlatformUserQuerySet, UserQuerySet, access_changed, access_state,
+    invalidate_access,
+)
 
 
 class UserManager(BaseUserManager):
+    def get_queryset(self):
+        return UserQuerySet(self.model, using=self._db)
+
     def _create_user(self, email, password=None, phone_number=None, **extra_fields):
         """
         Creates and saves a user with the given email and password.
@@ -200,11 +208,46 @@ class User(AbstractBaseUser, PermissionsMixin):
             models.Index(fields=['phone_number']),
             models.Index(fields=['user_type']),
             models.Index(fields=['last_name', 'first_name']),
+            models.Index(fields=['date_joined', 'id']),
+            models.Index(fields=['user_type', 'date_joined', 'id']),
+            models.Index(fields=['is_active', 'date_joined', 'id']),
+            models.Index(fields=['last_updated']),
         ]
 
     def __str__(self):
         return self.get_display_name()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_access = access_state(instance, USER_ACCESS_FIELDS)
+        # The stored name, so save() can tell a new upload from a resave.
+        instance._loaded_picture = instance.__dict__.get('profile_picture')
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        changed = access_changed(self, USER_ACCESS_FIELDS, update_fields)
+        super().save(*args, **kwargs)
+        # user_type and is_active feed role checks, so drop cached access.
+        if changed:
+            invalidate_access(self.pk)
+            self._loaded_access = access_state(self, USER_ACCESS_FIELDS)
+        if update_fields is None or 'profile_picture' in update_fields:
+            from products.images import schedule_derivatives
+            schedule_derivatives(self.profile_picture, getattr(self, '_loaded_picture', None))
+            self._loaded_picture = self.profile_picture.name
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        from users.referral_tree import detach_referrals
+        with atomic_write():
+            # The buyer profile goes with the account; its referrals stay in the tree without it.
+            detach_referrals(user_id)
+            result = super().delete(*args, **kwargs)
+        invalidate_access(user_id)
+        return result
+
     def clean(self):
         super().clean()
         if not (self.email or self.phone_number):
@@ -365,6 +408,14 @@ class PlatformUser(models.Model):
         help_text=_('Internal notes about this staff member')
     )
 
+    updated_at = models.DateTimeField(
+        _('updated at'),
+        auto_now=True,
+        help_text=_('When this staff profile was last updated')
+    )
+
+    objects = PlatformUserQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('platform user')
         verbose_name_plural = _('platform users')
@@ -373,17 +424,34 @@ class PlatformUser(models.Model):
             models.Index(fields=['role']),
             models.Index(fields=['department']),
             models.Index(fields=['is_management']),
+            models.Index(fields=['updated_at']),
         ]
 
     def __str__(self):
         return f"{self.user.get_display_name()} ({self.get_role_display()})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_access = access_state(instance, PLATFORM_ACCESS_FIELDS)
+        return instance
+
     def save(self, *args, **kwargs):
         # Ensure the user type is set to PLATFORM
         if self.user.user_type != User.UserType.PLATFORM:
             self.user.user_type = User.UserType.PLATFORM
-            self.user.save(update_fields=['user_type'])
+            self.user.save(update_fields=['user_type', 'last_updated'])
+        changed = access_changed(self, PLATFORM_ACCESS_FIELDS, kwargs.get('update_fields'))
         super().save(*args, **kwargs)
+        if changed:
+            invalidate_access(self.user_id)
+            self._loaded_access = access_state(self, PLATFORM_ACCESS_FIELDS)
+
+    def delete(self, *args, **kwargs):
+        user_id = self.user_id
+        result = super().delete(*args, **kwargs)
+        invalidate_access(user_id)
+        return result
 
     def is_super_admin(self):
         """Check if this staff member is a super administrator."""
@@ -589,6 +657,7 @@ class BuyerUser(models.Model):
             models.Index(fields=['lifetime_value']),
             models.Index(fields=['last_order_date']),
             models.Index(fields=['referral_code']),
+            models.Index(fields=['updated_at']),
         ]
 
     def __str__(self):
@@ -598,44 +667,295 @@ class BuyerUser(models.Model):
         # Ensure the user type is set to BUYER
         if self.user.user_type != User.UserType.BUYER:
             self.user.user_type = User.UserType.BUYER
-            self.user.save(update_fields=['user_type'])
+            self.user.save(update_fields=['user_type', 'last_updated'])
         
-        # Generate referral code if not set
-        if not self.referral_code:
+        # Generate referral code if not set, unless this save leaves it out
+        update_fields = kwargs.get('update_fields')
+        if not self.referral_code and (update_fields is None or 'referral_code' in update_fields):
             self.referral_code = self.generate_referral_code()
         
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or 'referred_by' in update_fields:
+                from users.referral_tree import sync_parent
+                sync_parent(self)
+
+    def delete(self, *args, **kwargs):
+        from users.referral_tree import detach_referrals
+        with atomic_write():
+            detach_referrals(self.pk)
+            return super().delete(*args, **kwargs)
 
     def generate_referral_code(self):
         """Generate a unique referral code for this buyer."""
-        from django.utils.crypto import get_random_string
-        code = get_random_string(8).upper()
-        while BuyerUser.objects.filter(referral_code=code).exists():
-            code = get_random_string(8).upper()
-        return code
+        from users.referrals import allocate_referral_codes
+        return allocate_referral_codes(1)[0]
 
     def update_tier(self):
         """Automatically update buyer tier based on lifetime value."""
-        if self.lifetime_value >= 50000:
-            self.tier = self.Tier.VIP
-        elif self.lifetime_value >= 20000:
-            self.tier = self.Tier.PLATINUM
-        elif self.lifetime_value >= 10000:
-            self.tier = self.Tier.GOLD
-        elif self.lifetime_value >= 5000:
-            self.tier = self.Tier.SILVER
-        else:
-            self.tier = self.Tier.STANDARD
-        self.save()
+        from users.tiers import tier_for
+        self.tier = tier_for(self.lifetime_value)
+        self.save(update_fields=['tier', 'updated_at'])
 
     def add_loyalty_points(self, points, reason=""):
         """Add loyalty points to the buyer's account with an optional reason."""
-        self.loyalty_points += points
-        self.loyalty_points_earned += points
-        self.save()
+        from users.loyalty import post_points
+        post_points(self, points, LoyaltyTransaction.Kind.EARN, reason)
+        return self.loyalty_points
+
+    def redeem_loyalty_points(self, points, reason=""):
+        """Redeem loyalty points; raises InsufficientPoints if the balance is too low."""
+        from users.loyalty import post_points
+        post_points(self, points, LoyaltyTransaction.Kind.REDEEM, reason)
         return self.loyalty_points
 
 
+class LoyaltyTransaction(models.Model):
+    """
+    Append-only ledger of loyalty point movements. BuyerUser's loyalty
+    counters are derived from it and can be reconciled against it.
+    """
+    class Kind(models.TextChoices):
+        EARN = 'EARN', _('Earned')
+        REDEEM = 'REDEEM', _('Redeemed')
+        EXPIRE = 'EXPIRE', _('Expired')
+
+    buyer = models.ForeignKey(
+        BuyerUser,
+        on_delete=models.CASCADE,
+        related_name='loyalty_transactions',
+        verbose_name=_('buyer'),
+        help_text=_('The buyer whose balance this transaction changes')
+    )
+    kind = models.CharField(
+        _('kind'),
+        max_length=10,
+        choices=Kind.choices,
+        help_text=_('Whether points were earned, redeemed or expired')
+    )
+    points = models.PositiveIntegerField(
+        _('points'),
+        help_text=_('The number of points moved by this transaction')
+    )
+    reason = models.CharField(
+        _('reason'),
+        max_length=255,
+        blank=True,
+        help_text=_('Why the points were moved, e.g. an order reference')
+    )
+    created_at = models.DateTimeField(
+        _('created at'),
+        default=timezone.now,
+        help_text=_('When this transaction was posted')
+    )
+
+    class Meta:
+        verbose_name = _('loyalty transaction')
+        verbose_name_plural = _('loyalty transactions')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['buyer', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.points} points ({self.reason or '-'})"
+
+
+class OrderEvent(models.Model):
+    """
+    Append-only history of a buyer's orders and refunds. BuyerUser's
+    purchase metrics are maintained from it incrementally and can be
+    reconciled against it (see users.purchases).
+    """
+    class Kind(models.TextChoices):
+        PLACED = 'PLACED', _('Placed')
+        REFUNDED = 'REFUNDED', _('Refunded')
+
+    buyer = models.ForeignKey(
+        BuyerUser,
+        on_delete=models.CASCADE,
+        related_name='order_events',
+        verbose_name=_('buyer'),
+        help_text=_('The buyer whose metrics this event changes')
+    )
+    kind = models.CharField(
+        _('kind'),
+        max_length=10,
+        choices=Kind.choices,
+        help_text=_('Whether an order was placed or money was refunded')
+    )
+    reference = models.CharField(
+        _('reference'),
+        max_length=64,
+        help_text=_('Order or refund number; an event is recorded once per reference')
+    )
+    amount = models.DecimalField(
+        _('amount'),
+        max_digits=12,
+        decimal_places=2,
+        help_text=_('The order total or the refunded amount')
+    )
+    occurred_at = models.DateTimeField(
+        _('occurred at'),
+        default=timezone.now,
+        help_text=_('When the order was placed or the refund issued')
+    )
+
+    class Meta:
+        verbose_name = _('order event')
+        verbose_name_plural = _('order events')
+        ordering = ['-occurred_at']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'reference'], name='unique_order_event_reference'),
+        ]
+        indexes = [
+            models.Index(fields=['buyer', 'kind', 'occurred_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.reference} ({self.amount})"
+
+
+class ReferralPath(models.Model):
+    """
+    Closure table over BuyerUser.referred_by: one row per (ancestor,
+    descendant) pair in the referral tree, at the number of hops between
+    them. Maintained by BuyerUser.save and delete (see users.referral_tree).
+    """
+    ancestor = models.ForeignKey(
+        BuyerUser,
+        on_delete=models.CASCADE,
+        related_name='downline_paths',
+        verbose_name=_('ancestor'),
+        help_text=_('The buyer higher up the referral chain')
+    )
+    descendant = models.ForeignKey(
+        BuyerUser,
+        on_delete=models.CASCADE,
+        related_name='upline_paths',
+        verbose_name=_('descendant'),
+        help_text=_('The buyer referred, directly or indirectly')
+    )
+    depth = models.PositiveSmallIntegerField(
+        _('depth'),
+        help_text=_('1 for a direct referral, 2 for a referral of a referral, and so on')
+    )
+    joined_at = models.DateTimeField(
+        _('joined at'),
+        help_text=_('When the descendant joined, for time-bounded referral counts')
+    )
+
+    class Meta:
+        verbose_name = _('referral path')
+        verbose_name_plural = _('referral paths')
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_referral_path'),
+        ]
+        indexes = [
+            models.Index(fields=['ancestor', 'depth']),
+            models.Index(fields=['descendant', 'depth']),
+            models.Index(fields=['depth', 'joined_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+
+class ReferralCodeSequence(models.Model):
+    """
+    Counter feeding the referral code allocator; each value maps to exactly
+    one code through a keyed permutation (see users.referrals).
+    """
+    name = models.CharField(
+        _('name'),
+        max_length=50,
+        primary_key=True,
+        help_text=_('The sequence identifier')
+    )
+    next_value = models.PositiveBigIntegerField(
+        _('next value'),
+        default=0,
+        help_text=_('The next unallocated position in the sequence')
+    )
+    next_reserved = models.PositiveBigIntegerField(
+        _('next reserved'),
+        null=True,
+        blank=True,
+        help_text=_('The first reserved position at or after the next value, if any')
+    )
+
+    class Meta:
+        verbose_name = _('referral code sequence')
+        verbose_name_plural = _('referral code sequences')
+
+    def __str__(self):
+        return f"{self.name} @ {self.next_value}"
+
+
+class ReservedReferralCode(models.Model):
+    """
+    A sequence position the allocator skips because a buyer already holds
+    its code: a legacy random code, or one minted under an earlier key.
+    """
+    position = models.PositiveBigIntegerField(
+        _('position'),
+        primary_key=True,
+        help_text=_('Sequence position whose code is already taken')
+    )
+    code = models.CharField(
+        _('code'),
+        max_length=20,
+        help_text=_('The referral code held at that position')
+    )
+
+    class Meta:
+        verbose_name = _('reserved referral code')
+        verbose_name_plural = _('reserved referral codes')
+
+    def __str__(self):
+        return f"{self.code} @ {self.position}"
+
+
+class PostalCode(models.Model):
+    """
+    Reference table of postal codes and the locality they belong to, used
+    for address autocomplete and validation (see users.postal_codes).
+    """
+    postal_code = models.CharField(
+        _('postal code'),
+        max_length=20,
+        help_text=_('The postal code or ZIP code')
+    )
+    city = models.CharField(
+        _('city'),
+        max_length=100,
+        help_text=_('The city or locality')
+    )
+    state = models.CharField(
+        _('state/province/region'),
+        max_length=100,
+        help_text=_('The state, province, or region')
+    )
+    country = models.CharField(
+        _('country'),
+        max_length=100,
+        default='India',
+        help_text=_('The country')
+    )
+
+    class Meta:
+        verbose_name = _('postal code')
+        verbose_name_plural = _('postal codes')
+        ordering = ['country', 'postal_code']
+        constraints = [
+            models.UniqueConstraint(fields=['country', 'postal_code'], name='users_postalcode_unique_per_country'),
+        ]
+
+    def __str__(self):
+        return f"{self.postal_code} - {self.city}, {self.state}"
+
+
 class Address(models.Model):
     """
     Address model for storing buyer shipping and billing addresses.
@@ -768,19 +1088,34 @@ class Address(models.Model):
             models.Index(fields=['postal_code']),
             models.Index(fields=['country']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'address_type'],
+                condition=models.Q(is_default=True),
+                name='users_address_one_default_per_type',
+                violation_error_message=_('This user already has a default address of this type.'),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.full_name}, {self.address_line_1}, {self.city}"
 
     def save(self, *args, **kwargs):
-        if self.is_default:
-            # Ensure no other address of the same type is marked as default
-            Address.objects.filter(
-                user=self.user,
-                address_type=self.address_type,
-                is_default=True
-            ).exclude(pk=self.pk).update(is_default=False)
-        super().save(*args, **kwargs)
+        if not self.is_default:
+            return super().save(*args, **kwargs)
+        # The unique constraint rejects a second default, so only demote the
+        # old one (an extra UPDATE) when the optimistic save actually clashes.
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                Address.objects.filter(
+                    user_id=self.user_id,
+                    address_type=self.address_type,
+                    is_default=True
+                ).exclude(pk=self.pk).update(is_default=False)
+            return super().save(*args, **kwargs)
 
     def get_formatted_address(self):
         """Return a properly formatted address string."""
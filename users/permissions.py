@@ -0,0 +1,140 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import models, transaction
+
+from agpkart.db.routers import read_from_primary
+from agpkart.db.transactions import atomic_write
+
+# Process-local copies of resolved access, keyed by user id and tagged with
+# the version token they were built from.
+_local_access = {}
+LOCAL_CACHE_SIZE = 10000
+SHARED_CACHE_TIMEOUT = 60 * 60
+# Fields whose changes alter a user's access; saves touching none of them
+# (a last_login stamp, a profile edit) keep the cached copies.
+USER_ACCESS_FIELDS = ('user_type', 'is_active')
+PLATFORM_ACCESS_FIELDS = (
+    'role', 'can_manage_users', 'can_manage_products', 'can_manage_orders', 'can_manage_content', 'can_view_reports',
+)
+
+
+def _version_key(user_id):
+    return f"users:access:version:{user_id}"
+
+
+def _access_key(user_id, version):
+    return f"users:access:{user_id}:{version}"
+
+
+def _load_access(user_id):
+    from users.models import PlatformUser
+    try:
+        platform_user = PlatformUser.objects.get(user_id=user_id)
+    except PlatformUser.DoesNotExist:
+        return {'role': None, 'permissions': frozenset()}
+    return {
+        'role': platform_user.role,
+        'permissions': frozenset(platform_user.get_permissions()),
+    }
+
+
+def get_access(user_id):
+    """
+    Return {'role': ..., 'permissions': frozenset(...)} for a user.
+
+    Lookups go process cache -> shared cache -> database. Entries are keyed
+    by a per-user version token held in the shared cache, so bumping the
+    token (see invalidate_access) retires every stale copy at once.
+    """
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), uuid.uuid4().hex, None)
+        version = cache.get(_version_key(user_id))
+        if version is None:
+            # A dummy cache cannot carry invalidations; always read through.
+            return _load_access(user_id)
+
+    local = _local_access.get(user_id)
+    if local is not None and local[0] == version:
+        return local[1]
+
+    access = cache.get(_access_key(user_id, version))
+    if access is None:
+        with read_from_primary():
+            access = _load_access(user_id)
+        cache.set(_access_key(user_id, version), access, SHARED_CACHE_TIMEOUT)
+
+    if len(_local_access) >= LOCAL_CACHE_SIZE:
+        _local_access.clear()
+    _local_access[user_id] = (version, access)
+    return access
+
+
+def invalidate_access(user_id):
+    """
+    Retire the cached role and permissions of a user in every process once
+    the current transaction commits; a reload any earlier would cache the
+    old rows under the new version.
+    """
+    def retire():
+        cache.set(_version_key(user_id), uuid.uuid4().hex, None)
+        _local_access.pop(user_id, None)
+    transaction.on_commit(retire)
+
+
+def access_state(instance, fields):
+    # Read from __dict__ so deferred fields are not loaded just to compare.
+    return tuple(instance.__dict__.get(name) for name in fields)
+
+
+def access_changed(instance, fields, update_fields=None):
+    """Whether saving `instance` changes any of `fields` from the values it was loaded with."""
+    if update_fields is not None and set(update_fields).isdisjoint(fields):
+        return False
+    loaded = getattr(instance, '_loaded_access', None)
+    return loaded is None or loaded != access_state(instance, fields)
+
+
+class AccessQuerySet(models.QuerySet):
+    """
+    A queryset whose update() and bulk_update() retire the cached access of
+    the users they touch, when they write any of `access_fields`.
+    """
+
+    access_fields = ()
+    user_field = 'pk'
+
+    def update(self, **kwargs):
+        if kwargs.keys().isdisjoint(self.access_fields):
+            return super().update(**kwargs)
+        with atomic_write(using=self.db):
+            # Before the update, which may change what the filter matches.
+            user_ids = list(self.values_list(self.user_field, flat=True))
+            updated = super().update(**kwargs)
+            for user_id in user_ids:
+                invalidate_access(user_id)
+        return updated
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            updated = super().bulk_update(objs, fields, batch_size)
+            if not set(fields).isdisjoint(self.access_fields):
+                for obj in objs:
+                    invalidate_access(getattr(obj, self.user_field))
+        return updated
+
+
+class UserQuerySet(AccessQuerySet):
+    access_fields = USER_ACCESS_FIELDS
+
+
+class PlatformUserQuerySet(AccessQuerySet):
+    access_fields = PLATFORM_ACCESS_FIELDS
+    user_field = 'user_id'
+
+
+def has_permissions(user_id, permissions):
+    """Check that the user holds every permission string in `permissions`."""
+    return get_access(user_id)['permissions'].issuperset(permissions)
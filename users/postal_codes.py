@@ -0,0 +1,177 @@
+import csv
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+
+from django.core.cache import cache
+from django.db import transaction
+
+from agpkart.db.routers import read_from_primary
+from users.models import Address, PostalCode
+
+BUNDLED_POSTAL_CODES = Path(__file__).resolve().parent / 'data' / 'postal_codes.csv'
+DEFAULT_COUNTRY = 'India'
+VALIDATION_BATCH_SIZE = 1000
+
+_VERSION_KEY = 'users:postal_codes:version'
+# country -> (version token, PostalCodeIndex), only for countries with
+# postal data, so the cache never grows past what the table holds.
+_indexes = {}
+# (version token, countries with postal data)
+_countries = (None, frozenset())
+
+
+def normalize_postal_code(value):
+    return ''.join((value or '').split()).upper()
+
+
+class UnknownCountry(LookupError):
+    pass
+
+
+class PostalCodeIndex:
+    """
+    Sorted array of postal codes with parallel (city, state) values.
+
+    Exact lookups and prefix completion are both a bisect into the sorted
+    codes, so they stay in the microsecond range for the full directory.
+    """
+    def __init__(self, rows):
+        rows = sorted(rows)
+        self.codes = [code for code, _, _ in rows]
+        self.places = [(city, state) for _, city, state in rows]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def lookup(self, postal_code):
+        """Return (city, state) for an exact postal code, or None."""
+        postal_code = normalize_postal_code(postal_code)
+        i = bisect_left(self.codes, postal_code)
+        if i < len(self.codes) and self.codes[i] == postal_code:
+            return self.places[i]
+        return None
+
+    def complete(self, prefix, limit=10):
+        """Return up to `limit` (postal_code, city, state) tuples starting with `prefix`."""
+        prefix = normalize_postal_code(prefix)
+        if not prefix:
+            return []
+        results = []
+        i = bisect_left(self.codes, prefix)
+        while i < len(self.codes) and len(results) < limit and self.codes[i].startswith(prefix):
+            results.append((self.codes[i],) + self.places[i])
+            i += 1
+        return results
+
+
+def _version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        cache.add(_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(_VERSION_KEY)
+    return version
+
+
+def postal_countries():
+    """The countries the directory has postal codes for, reloaded with the index version."""
+    global _countries
+    version = _version()
+    if version is None or _countries[0] != version:
+        with read_from_primary():
+            countries = frozenset(PostalCode.objects.order_by().values_list('country', flat=True).distinct())
+        _countries = (version, countries)
+    return _countries[1]
+
+
+def get_index(country=DEFAULT_COUNTRY):
+    """
+    Return this process's index for `country`, rebuilding it from the
+    database only when load_postal_codes has bumped the shared version.
+    Raises UnknownCountry for a country without postal data.
+    """
+    if country not in postal_countries():
+        raise UnknownCountry(f"No postal codes are loaded for '{country}'.")
+    version = _version()
+    cached = _indexes.get(country)
+    if cached is not None and version is not None and cached[0] == version:
+        return cached[1]
+    rows = PostalCode.objects.filter(country=country).order_by().values_list('postal_code', 'city', 'state')
+    with read_from_primary():
+        index = PostalCodeIndex(rows)
+    _indexes[country] = (version, index)
+    return index
+
+
+def invalidate_index():
+    global _countries
+    cache.set(_VERSION_KEY, uuid.uuid4().hex, None)
+    _indexes.clear()
+    _countries = (None, frozenset())
+
+
+def read_postal_codes(path=BUNDLED_POSTAL_CODES):
+    """Yield PostalCode instances from a postal_code,city,state[,country] CSV file."""
+    with open(path, newline='', encoding='utf-8') as stream:
+        for row in csv.DictReader(stream):
+            yield PostalCode(
+                postal_code=normalize_postal_code(row['postal_code']),
+                city=row['city'].strip(),
+                state=row['state'].strip(),
+                country=(row.get('country') or DEFAULT_COUNTRY).strip(),
+            )
+
+
+def load_postal_codes(postal_codes, batch_size=VALIDATION_BATCH_SIZE):
+    """Insert or update reference rows in bulk and retire every cached index."""
+    postal_codes = list(postal_codes)
+    with transaction.atomic():
+        PostalCode.objects.bulk_create(
+            postal_codes,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['country', 'postal_code'],
+            update_fields=['city', 'state'],
+        )
+    invalidate_index()
+    return len(postal_codes)
+
+
+def validate_addresses(queryset=None, fix=False, batch_size=VALIDATION_BATCH_SIZE):
+    """
+    Check stored addresses against the reference index in primary key batches.
+
+    Returns counts of 'checked', 'unknown' (postal code not in the directory),
+    'mismatched' (city or state disagree) and 'fixed' rows. With fix=True,
+    mismatched rows get their postal code normalized and city/state taken
+    from the directory, one bulk_update per batch.
+    """
+    if queryset is None:
+        queryset = Address.objects.all()
+    queryset = queryset.order_by('pk').only('pk', 'postal_code', 'city', 'state', 'country')
+    stats = {'checked': 0, 'unknown': 0, 'mismatched': 0, 'fixed': 0}
+    last_pk = None
+    while True:
+        batch = list((queryset if last_pk is None else queryset.filter(pk__gt=last_pk))[:batch_size])
+        if not batch:
+            return stats
+        last_pk = batch[-1].pk
+        stale = []
+        for address in batch:
+            stats['checked'] += 1
+            try:
+                place = get_index(address.country).lookup(address.postal_code)
+            except UnknownCountry:
+                place = None
+            if place is None:
+                stats['unknown'] += 1
+                continue
+            city, state = place
+            if (address.city.strip().lower(), address.state.strip().lower()) != (city.lower(), state.lower()):
+                stats['mismatched'] += 1
+                address.postal_code = normalize_postal_code(address.postal_code)
+                address.city, address.state = city, state
+                stale.append(address)
+        if fix and stale:
+            Address.objects.bulk_update(stale, ['postal_code', 'city', 'state'])
+            stats['fixed'] += len(stale)
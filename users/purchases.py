@@ -0,0 +1,140 @@
+import time
+from contextlib import nullcontext
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least, NullIf, Round
+from django.utils import timezone
+
+from agpkart.db.transactions import atomic_write
+from users.models import BuyerUser, OrderEvent
+from users.tiers import tier_case
+
+METRIC_FIELDS = ('order_count', 'lifetime_value', 'average_order_value', 'first_order_date', 'last_order_date')
+RECONCILE_BATCH_SIZE = 1000
+CENT = Decimal('0.01')
+
+
+def _average(lifetime_value, order_count):
+    """Average order value computed in SQL from the new sum and count."""
+    return Coalesce(
+        Round(lifetime_value / NullIf(order_count, 0), 2, output_field=DecimalField(max_digits=10, decimal_places=2)),
+        Value(Decimal('0.00')),
+    )
+
+
+def _record(buyer_id, kind, reference, amount, occurred_at):
+    """Append an event unless its reference was recorded already. Returns True if it was new."""
+    try:
+        with transaction.atomic():
+            OrderEvent.objects.create(buyer_id=buyer_id, kind=kind, reference=reference, amount=amount, occurred_at=occurred_at)
+    except IntegrityError:
+        return False
+    return True
+
+
+def record_order(buyer_id, reference, total, placed_at=None):
+    """
+    Record a placed order and fold it into the buyer's metrics with one
+    relative UPDATE, so concurrent orders never lose each other's changes.
+    The average is derived from the updated sum and count in the same
+    statement. Returns False if the order was recorded before.
+    """
+    total = Decimal(total)
+    placed_at = placed_at or timezone.now()
+    with transaction.atomic():
+        if not _record(buyer_id, OrderEvent.Kind.PLACED, reference, total, placed_at):
+            return False
+        lifetime_value = F('lifetime_value') + total
+        order_count = F('order_count') + 1
+        placed = Value(placed_at)
+        buyers = BuyerUser.objects.filter(pk=buyer_id)
+        buyers.update(
+            order_count=order_count,
+            lifetime_value=lifetime_value,
+            average_order_value=_average(lifetime_value, order_count),
+            # Events can arrive out of order, so widen the range rather than overwrite it.
+            first_order_date=Least(Coalesce('first_order_date', placed), placed),
+            last_order_date=Greatest(Coalesce('last_order_date', placed), placed),
+            updated_at=timezone.now(),
+        )
+        buyers.update(tier=tier_case())
+    return True
+
+
+def record_refund(buyer_id, reference, amount, refunded_at=None):
+    """Take a refund off the buyer's lifetime value. Returns False if it was recorded before."""
+    amount = Decimal(amount)
+    with transaction.atomic():
+        if not _record(buyer_id, OrderEvent.Kind.REFUNDED, reference, amount, refunded_at or timezone.now()):
+            return False
+        lifetime_value = F('lifetime_value') - amount
+        buyers = BuyerUser.objects.filter(pk=buyer_id)
+        buyers.update(
+            lifetime_value=lifetime_value,
+            average_order_value=_average(lifetime_value, F('order_count')),
+            updated_at=timezone.now(),
+        )
+        buyers.update(tier=tier_case())
+    return True
+
+
+def _event_totals(first_pk, last_pk):
+    placed = Q(kind=OrderEvent.Kind.PLACED)
+    zero = Value(Decimal('0.00'))
+    rows = OrderEvent.objects.filter(buyer_id__gte=first_pk, buyer_id__lte=last_pk).order_by()
+    rows = rows.values('buyer_id').annotate(
+        orders=Count('id', filter=placed),
+        spent=Coalesce(Sum('amount', filter=placed), zero),
+        refunded=Coalesce(Sum('amount', filter=Q(kind=OrderEvent.Kind.REFUNDED)), zero),
+        first=Min('occurred_at', filter=placed),
+        last=Max('occurred_at', filter=placed),
+    )
+    totals = {}
+    for row in rows:
+        lifetime_value = (row['spent'] - row['refunded']).quantize(CENT)
+        average = (lifetime_value / row['orders']).quantize(CENT, ROUND_HALF_UP) if row['orders'] else Decimal('0.00')
+        totals[row['buyer_id']] = (row['orders'], lifetime_value, average, row['first'], row['last'])
+    return totals
+
+
+def _matches(stored, expected):
+    # The database may round the average from a binary float, so allow a cent either way.
+    return stored[:2] == expected[:2] and stored[3:] == expected[3:] and abs(stored[2] - expected[2]) <= CENT
+
+
+def reconcile_metrics(batch_size=RECONCILE_BATCH_SIZE, fix=False, pause=0):
+    """
+    Recompute purchase metrics from the order history, a primary key range
+    of buyers at a time with one aggregate query per range, and return
+    [(buyer_id, stored, expected)] for every buyer that drifted. With
+    fix=True the drifted rows are rewritten and re-tiered, each range read
+    and written in one transaction so an order recorded in between cannot
+    be overwritten. `pause` seconds are slept between ranges to leave room
+    for live traffic.
+    """
+    drift = []
+    last_pk = None
+    buyers = BuyerUser.objects.order_by('pk').values_list('pk', *METRIC_FIELDS)
+    empty = (0, Decimal('0.00'), Decimal('0.00'), None, None)
+    while True:
+        if pause and last_pk is not None:
+            time.sleep(pause)
+        with atomic_write() if fix else nullcontext():
+            chunk = list((buyers if last_pk is None else buyers.filter(pk__gt=last_pk))[:batch_size])
+            if not chunk:
+                return drift
+            last_pk = chunk[-1][0]
+            totals = _event_totals(chunk[0][0], last_pk)
+            mismatched = []
+            for pk, *stored in chunk:
+                expected = totals.get(pk, empty)
+                if not _matches(tuple(stored), expected):
+                    drift.append((pk, tuple(stored), expected))
+                    mismatched.append(BuyerUser(pk=pk, **dict(zip(METRIC_FIELDS, expected))))
+            if fix and mismatched:
+                BuyerUser.objects.bulk_update(mismatched, METRIC_FIELDS)
+                BuyerUser.objects.filter(pk__in=[buyer.pk for buyer in mismatched]).update(
+                    tier=tier_case(), updated_at=timezone.now(),
+                )
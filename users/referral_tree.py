@@ -0,0 +1,165 @@
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from agpkart.db.transactions import atomic_write
+from users.models import BuyerUser, ReferralPath
+
+PATH_BATCH_SIZE = 1000
+# A rebuild stops here even if referred_by holds a cycle.
+MAX_DEPTH = 100
+
+
+def _ancestors(buyer_id):
+    return list(ReferralPath.objects.filter(descendant_id=buyer_id).values_list('ancestor_id', 'depth'))
+
+
+def _crossing(buyer_id, ancestor_ids):
+    """Paths from `ancestor_ids` to the buyer and to everyone below it."""
+    below = ReferralPath.objects.filter(ancestor_id=buyer_id).values('descendant_id')
+    return ReferralPath.objects.filter(
+        Q(descendant_id=buyer_id) | Q(descendant_id__in=below), ancestor_id__in=ancestor_ids,
+    )
+
+
+def move(buyer_id, parent_id):
+    """
+    Hang a buyer and everyone below it under `parent_id`, or make it a root
+    when that is None. The paths from its old ancestors into its subtree are
+    dropped and paths from the new ancestors added; paths inside the
+    subtree are left alone.
+    """
+    with atomic_write():
+        joined_at = BuyerUser.objects.filter(pk=buyer_id).values_list('created_at', flat=True).get()
+        subtree = [(buyer_id, 0, joined_at)]
+        subtree += ReferralPath.objects.filter(ancestor_id=buyer_id).values_list('descendant_id', 'depth', 'joined_at')
+        if parent_id is not None and parent_id in {pk for pk, _, _ in subtree}:
+            raise ValueError("A buyer cannot be referred by itself or by someone it referred.")
+        old = [pk for pk, _ in _ancestors(buyer_id)]
+        if old:
+            _crossing(buyer_id, old).delete()
+        if parent_id is None:
+            return
+        ancestors = [(parent_id, 1)] + [(pk, depth + 1) for pk, depth in _ancestors(parent_id)]
+        ReferralPath.objects.bulk_create(
+            [
+                ReferralPath(ancestor_id=ancestor, descendant_id=descendant, depth=up + down, joined_at=joined)
+                for ancestor, up in ancestors
+                for descendant, down, joined in subtree
+            ],
+            batch_size=PATH_BATCH_SIZE,
+        )
+
+
+def sync_parent(buyer):
+    """Re-hang a saved buyer if its referred_by no longer matches the tree; one query otherwise."""
+    parents = ReferralPath.objects.filter(descendant_id=buyer.pk, depth=1).values_list('ancestor_id', flat=True)
+    parent_id = parents.first()
+    if parent_id != buyer.referred_by_id:
+        move(buyer.pk, buyer.referred_by_id)
+
+
+def detach_referrals(buyer_id):
+    """
+    Drop the paths that run through a buyer about to be deleted. Its
+    referrals become roots, as referred_by is set to NULL for them; paths
+    from the buyer itself go with it by cascade.
+    """
+    ancestors = [pk for pk, _ in _ancestors(buyer_id)]
+    if ancestors:
+        _crossing(buyer_id, ancestors).delete()
+
+
+def upline(buyer_id):
+    """Ids of the buyers above `buyer_id`, nearest referrer first."""
+    return list(
+        ReferralPath.objects.filter(descendant_id=buyer_id).order_by('depth').values_list('ancestor_id', flat=True)
+    )
+
+
+def downline_count(buyer_id, max_depth=None):
+    """How many buyers `buyer_id` referred, directly or down to `max_depth` hops."""
+    paths = ReferralPath.objects.filter(ancestor_id=buyer_id)
+    if max_depth is not None:
+        paths = paths.filter(depth__lte=max_depth)
+    return paths.count()
+
+
+def downline_by_depth(buyer_id, max_depth=None):
+    """{depth: number of buyers} below `buyer_id`."""
+    paths = ReferralPath.objects.filter(ancestor_id=buyer_id)
+    if max_depth is not None:
+        paths = paths.filter(depth__lte=max_depth)
+    return dict(paths.order_by('depth').values('depth').annotate(buyers=Count('id')).values_list('depth', 'buyers'))
+
+
+def downline_counts(buyer_ids, max_depth=None):
+    """{buyer_id: downline size} for many buyers with one grouped query."""
+    paths = ReferralPath.objects.filter(ancestor_id__in=buyer_ids)
+    if max_depth is not None:
+        paths = paths.filter(depth__lte=max_depth)
+    counts = paths.order_by().values('ancestor_id').annotate(buyers=Count('id'))
+    return dict(counts.values_list('ancestor_id', 'buyers'))
+
+
+def top_referrers(limit=10, since=None, max_depth=1):
+    """
+    [(buyer_id, referrals)] for the buyers who brought in the most buyers
+    that joined since `since`, counting `max_depth` levels down (direct
+    referrals only by default).
+    """
+    paths = ReferralPath.objects.filter(depth__lte=max_depth)
+    if since is not None:
+        paths = paths.filter(joined_at__gte=since)
+    return list(
+        paths.values('ancestor_id').annotate(referrals=Count('id'))
+        .order_by('-referrals', 'ancestor_id').values_list('ancestor_id', 'referrals')[:limit]
+    )
+
+
+def rebuild_tree(batch_size=PATH_BATCH_SIZE):
+    """
+    Recreate the closure table from referred_by, one level at a time: the
+    direct referrals first, then each level from the one before it by
+    following the ancestor's own referrer. Returns the number of paths.
+    """
+    with transaction.atomic():
+        ReferralPath.objects.all().delete()
+        direct = (
+            BuyerUser.objects.filter(referred_by__isnull=False).exclude(referred_by=F('pk'))
+            .annotate(descendant=F('pk'))
+            .order_by('pk').values_list('pk', 'referred_by_id', 'descendant', 'created_at')
+        )
+        total = _copy_level(direct, 1, batch_size)
+        depth, written = 1, total
+        while written and depth < MAX_DEPTH:
+            level = (
+                ReferralPath.objects.filter(depth=depth, ancestor__referred_by__isnull=False)
+                .exclude(ancestor__referred_by=F('descendant_id'))
+                .order_by('pk').values_list('pk', 'ancestor__referred_by_id', 'descendant_id', 'joined_at')
+            )
+            depth += 1
+            written = _copy_level(level, depth, batch_size)
+            total += written
+    return total
+
+
+def _copy_level(rows, depth, batch_size):
+    """
+    Insert a path at `depth` for each row and return how many were new. A
+    referral cycle yields only pairs already stored, which ignore_conflicts
+    skips; bulk_create still returns them, so the table is counted instead.
+    """
+    last_pk = None
+    while True:
+        batch = list((rows if last_pk is None else rows.filter(pk__gt=last_pk))[:batch_size])
+        if not batch:
+            # The table was emptied first, so every path at this depth is new.
+            return ReferralPath.objects.filter(depth=depth).count()
+        last_pk = batch[-1][0]
+        ReferralPath.objects.bulk_create(
+            [
+                ReferralPath(ancestor_id=ancestor, descendant_id=descendant, depth=depth, joined_at=joined)
+                for _, ancestor, descendant, joined in batch
+            ],
+            ignore_conflicts=True,
+        )
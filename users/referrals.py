@@ -0,0 +1,182 @@
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import F, OuterRef, Subquery
+
+from agpkart.db.transactions import atomic_write
+
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+CODE_LENGTH = 8
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH
+SEQUENCE_NAME = 'referral_code'
+ALLOCATION_CHUNK = 900
+RESERVE_BATCH_SIZE = 1000
+
+# A balanced Feistel network over 42 bits covers CODE_SPACE (~2**41.4);
+# values that land outside it are cycle-walked back in.
+_HALF_BITS = 21
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+
+
+def _key():
+    return getattr(settings, 'REFERRAL_CODE_KEY', settings.SECRET_KEY).encode()
+
+
+def _feistel(value, key):
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for round_no in range(_ROUNDS):
+        digest = hmac.new(key, f"{round_no}:{right}".encode(), hashlib.sha256).digest()
+        left, right = right, left ^ (int.from_bytes(digest[:4], 'big') & _HALF_MASK)
+    return (left << _HALF_BITS) | right
+
+
+def permute(value, key=None):
+    """Map a sequence position onto a unique, unguessable point of the code space."""
+    if not 0 <= value < CODE_SPACE:
+        raise ValueError("Referral code sequence exhausted.")
+    key = key or _key()
+    value = _feistel(value, key)
+    while value >= CODE_SPACE:
+        value = _feistel(value, key)
+    return value
+
+
+def _feistel_inverse(value, key):
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for round_no in reversed(range(_ROUNDS)):
+        digest = hmac.new(key, f"{round_no}:{left}".encode(), hashlib.sha256).digest()
+        left, right = right ^ (int.from_bytes(digest[:4], 'big') & _HALF_MASK), left
+    return (left << _HALF_BITS) | right
+
+
+def position(code, key=None):
+    """The sequence position that mints `code`, or None if no position can."""
+    if len(code) != CODE_LENGTH or any(char not in ALPHABET for char in code):
+        return None
+    key = key or _key()
+    value = 0
+    for char in code:
+        value = value * len(ALPHABET) + ALPHABET.index(char)
+    value = _feistel_inverse(value, key)
+    while value >= CODE_SPACE:
+        value = _feistel_inverse(value, key)
+    return value
+
+
+def encode(value):
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, digit = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def reserve_positions(count):
+    """
+    Atomically claim `count` consecutive sequence positions. Returns the
+    first, and the lowest reserved position the claim may run into (None
+    when there is none left).
+    """
+    from users.models import ReferralCodeSequence
+    with transaction.atomic():
+        sequences = ReferralCodeSequence.objects.filter(name=SEQUENCE_NAME)
+        if not sequences.update(next_value=F('next_value') + count):
+            try:
+                with transaction.atomic():
+                    ReferralCodeSequence.objects.create(name=SEQUENCE_NAME, next_value=count)
+                return 0, None
+            except IntegrityError:
+                sequences.update(next_value=F('next_value') + count)
+        next_value, next_reserved = sequences.values_list('next_value', 'next_reserved').get()
+        return next_value - count, next_reserved
+
+
+def _mark_next_reserved(sequence_model, reserved_model):
+    """Point the sequence at the first reserved position it has not reached yet."""
+    sequence_model.objects.filter(name=SEQUENCE_NAME).update(next_reserved=Subquery(
+        reserved_model.objects.filter(position__gte=OuterRef('next_value')).order_by('position').values('position')[:1]
+    ))
+
+
+def allocate_referral_codes(count):
+    """
+    Return `count` referral codes that are unique across all allocations.
+
+    Codes are a keyed permutation of a database sequence, so they never
+    collide with each other. Positions whose codes were already held when
+    the allocator was adopted are reserved once (see reserve_stored_codes)
+    and skipped here; only a claim that reaches one reads the reservations.
+    """
+    from users.models import ReferralCodeSequence, ReservedReferralCode
+    codes = []
+    key = _key()
+    while len(codes) < count:
+        needed = min(count - len(codes), ALLOCATION_CHUNK)
+        start, next_reserved = reserve_positions(needed)
+        end = start + needed
+        skip = set()
+        if next_reserved is not None and next_reserved < end:
+            skip = set(ReservedReferralCode.objects.filter(position__gte=start, position__lt=end)
+                       .values_list('position', flat=True))
+            _mark_next_reserved(ReferralCodeSequence, ReservedReferralCode)
+        codes.extend(encode(permute(n, key)) for n in range(start, end) if n not in skip)
+    return codes
+
+
+def reserve_stored_codes(buyer_model=None, sequence_model=None, reserved_model=None, batch_size=RESERVE_BATCH_SIZE):
+    """
+    Reserve the sequence positions of codes buyers already hold, so the
+    allocator never mints them again. Needed once for legacy random codes
+    (the migration adding reservations does it) and again after changing
+    REFERRAL_CODE_KEY, since every stored code then maps to a new position.
+    Returns the number of positions reserved.
+    """
+    if buyer_model is None:
+        from users.models import BuyerUser as buyer_model, ReferralCodeSequence as sequence_model
+        from users.models import ReservedReferralCode as reserved_model
+    key = _key()
+    reserved = 0
+    with atomic_write():
+        sequence, _ = sequence_model.objects.get_or_create(name=SEQUENCE_NAME)
+        reserved_model.objects.all().delete()
+        codes = buyer_model.objects.exclude(referral_code__isnull=True).exclude(referral_code='')
+        batch = []
+        for code in codes.order_by().values_list('referral_code', flat=True).iterator(chunk_size=batch_size):
+            n = position(code, key)
+            # Positions behind the sequence were handed out already.
+            if n is not None and n >= sequence.next_value:
+                batch.append(reserved_model(position=n, code=code))
+            if len(batch) >= batch_size:
+                reserved += len(reserved_model.objects.bulk_create(batch))
+                batch = []
+        reserved += len(reserved_model.objects.bulk_create(batch))
+        _mark_next_reserved(sequence_model, reserved_model)
+    return reserved
+
+
+def assign_referral_codes(buyers):
+    """Fill in referral_code on unsaved or bulk-created buyers that lack one."""
+    missing = [buyer for buyer in buyers if not buyer.referral_code]
+    for buyer, code in zip(missing, allocate_referral_codes(len(missing))):
+        buyer.referral_code = code
+    return missing
+
+
+def backfill_referral_codes(queryset=None, batch_size=1000):
+    """Assign codes to stored buyers without one, one bulk_update per batch."""
+    from users.models import BuyerUser
+    if queryset is None:
+        queryset = BuyerUser.objects.all()
+    queryset = queryset.filter(referral_code__isnull=True).order_by('pk')
+    updated = 0
+    while True:
+        buyers = list(queryset.only('pk', 'referral_code')[:batch_size])
+        if not buyers:
+            return updated
+        with transaction.atomic():
+            assign_referral_codes(buyers)
+            BuyerUser.objects.bulk_update(buyers, ['referral_code'])
+        updated += len(buyers)
@@ -0,0 +1,46 @@
+from django.core.mail import send_mail
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from jobs.queue import enqueue, task
+from users import purchases
+from users.loyalty import post_points
+from users.models import BuyerUser, LoyaltyTransaction
+
+ORDER_QUEUE = 'orders'
+
+
+@task('users.record_order')
+def record_order(buyer_id, reference, total, placed_at, points=0):
+    """Fold one order into the buyer's purchase metrics and award its loyalty points."""
+    # Together, so a run cut short between the two is redone in full.
+    with transaction.atomic():
+        recorded = purchases.record_order(buyer_id, reference, total, parse_datetime(placed_at))
+        if recorded and points:
+            post_points(BuyerUser(pk=buyer_id), points, LoyaltyTransaction.Kind.EARN, f"Order {reference}")
+
+
+@task('users.send_order_confirmation')
+def send_order_confirmation(buyer_id, reference, total):
+    email = BuyerUser.objects.filter(pk=buyer_id).values_list('user__email', flat=True).get()
+    send_mail(
+        f"Your AGPKART order {reference}",
+        f"Thank you for your order. Your order total is ${total}.",
+        None,
+        [email],
+    )
+
+
+def order_placed(buyer, total, reference, points=0, placed_at=None):
+    """
+    Queue the follow-up work for a new order: metrics and loyalty in one
+    job, the confirmation email in another so a mail outage is retried on
+    its own. Call it inside the checkout transaction; it only writes two
+    queue rows.
+    """
+    placed_at = (placed_at or timezone.now()).isoformat()
+    enqueue(record_order, {
+        'buyer_id': buyer.pk, 'total': str(total), 'placed_at': placed_at, 'points': points, 'reference': reference,
+    }, queue=ORDER_QUEUE)
+    enqueue(send_order_confirmation, {'buyer_id': buyer.pk, 'total': str(total), 'reference': reference}, queue=ORDER_QUEUE)
@@ -1,3 +1,516 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from users.exports import export_queryset, iter_export_rows
+from users.imports import import_users, read_rows
+from jobs import queue
+from users import addresses, loyalty, permissions, postal_codes, purchases, referral_tree, referrals, tasks, tiers
+from users.models import User, PlatformUser, BuyerUser, Address, OrderEvent, PostalCode, ReferralPath
+
+
+class UserExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            user = User.objects.create_user(email=f"buyer{i}@example.com", password="secret")
+            BuyerUser.objects.create(
+                user=user,
+                tier=BuyerUser.Tier.GOLD if i % 2 else BuyerUser.Tier.STANDARD,
+                loyalty_points=i * 10,
+            )
+        User.objects.create_user(email="staff@example.com", password="secret")
+
+    def test_rows_are_chunked_in_id_order(self):
+        ids = [row[0] for row in iter_export_rows(export_queryset(), chunk_size=2)]
+        self.assertEqual(ids, sorted(User.objects.values_list('id', flat=True)))
+
+    def test_command_filters_and_writes_csv(self):
+        out = io.StringIO()
+        call_command("export_users", tier=BuyerUser.Tier.GOLD, stdout=out)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(all(row["tier"] == BuyerUser.Tier.GOLD for row in rows))
+
+    def test_command_writes_jsonl(self):
+        out = io.StringIO()
+        call_command("export_users", format="jsonl", user_type=User.UserType.BUYER, stdout=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(sorted(r["loyalty_points"] for r in records), [0, 10, 20, 30, 40])
+
+    def test_invalid_filter_is_rejected(self):
+        with self.assertRaises(ValueError):
+            export_queryset(tier="BRONZE")
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserImportTests(TestCase):
+    CSV = (
+        "email,password,user_type,role,employee_id,tier\n"
+        "admin@example.com,pw1,PLATFORM,ADMIN,E1,\n"
+        "Buyer@Example.COM,pw2,BUYER,,,GOLD\n"
+        "not-an-email,pw3,BUYER,,,\n"
+        "admin@example.com,pw4,UNASSIGNED,,,\n"
+        "bad-role@example.com,pw5,PLATFORM,JANITOR,,\n"
+    )
+
+    def run_import(self, **kwargs):
+        return import_users(read_rows(io.StringIO(self.CSV), 'csv'), **kwargs)
+
+    def test_valid_rows_are_created_with_profiles(self):
+        result = self.run_import(workers=1)
+        self.assertEqual(result.created, 2)
+        admin = User.objects.get_with_profile(email="admin@example.com")
+        self.assertEqual(admin.platform_user.employee_id, "E1")
+        self.assertTrue(admin.check_password("pw1"))
+        buyer = User.objects.get_with_profile(email="Buyer@example.com")
+        self.assertEqual(buyer.buyer_user.tier, BuyerUser.Tier.GOLD)
+
+    def test_invalid_and_duplicate_rows_are_reported(self):
+        result = self.run_import(workers=1, batch_size=2)
+        self.assertEqual(sorted(line for line, _, _ in result.rejected), [3, 4, 5])
+        errors = {line: errors for line, _, errors in result.rejected}
+        self.assertIn('email', errors[3])
+        self.assertIn('email', errors[4])
+        self.assertIn('role', errors[5])
+        self.assertTrue(all('password' not in row for _, row, _ in result.rejected))
+
+    def test_malformed_jsonl_lines_are_rejected_with_their_line(self):
+        stream = io.StringIO(
+            '{"email": "one@example.com", "password": "pw1"}\n'
+            '{"email": "two@example.com", \n'
+            '["three@example.com"]\n'
+            'null\n'
+            '{"email": "five@example.com", "password": "pw5"}\n'
+        )
+        result = import_users(read_rows(stream, 'jsonl'), workers=1)
+        self.assertEqual(result.created, 2)
+        errors = {line: errors for line, _, errors in result.rejected}
+        self.assertEqual(sorted(errors), [2, 3, 4])
+        self.assertTrue(all('row' in errors[line] for line in errors))
+        self.assertEqual(result.rejected[0][1], {'raw': '{"email": "two@example.com",'})
+
+    def test_passwords_hash_in_a_process_pool(self):
+        result = self.run_import(workers=2)
+        self.assertEqual(result.created, 2)
+        self.assertTrue(User.objects.get(email="admin@example.com").check_password("pw1"))
+
+
+class AccessCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        permissions._local_access.clear()
+        self.user = User.objects.create_user(email="staff@example.com", password="secret")
+        self.platform_user = PlatformUser.objects.create(
+            user=self.user, role=PlatformUser.Role.ANALYST, can_view_reports=True,
+        )
+
+    def test_access_is_served_from_cache(self):
+        permissions.get_access(self.user.pk)
+        with self.assertNumQueries(0):
+            access = permissions.get_access(self.user.pk)
+        self.assertEqual(access['role'], PlatformUser.Role.ANALYST)
+        self.assertEqual(access['permissions'], {'view_reports'})
+
+    def test_save_invalidates_cached_access_on_commit(self):
+        permissions.get_access(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.platform_user.can_manage_users = True
+            self.platform_user.save()
+            # Still the committed state until the transaction ends.
+            self.assertFalse(permissions.has_permissions(self.user.pk, ['manage_users']))
+        self.assertTrue(permissions.has_permissions(self.user.pk, ['manage_users', 'view_reports']))
+
+    def test_only_access_changes_invalidate(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            user.last_login = timezone.now()
+            user.save(update_fields=['last_login'])
+            user.first_name = "Renamed"
+            user.save()
+        self.assertEqual(callbacks, [])
+        with self.captureOnCommitCallbacks() as callbacks:
+            user.is_active = False
+            user.save()
+        self.assertEqual(len(callbacks), 1)
+
+    def test_queryset_updates_invalidate(self):
+        permissions.get_access(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            PlatformUser.objects.filter(pk=self.user.pk).update(role=PlatformUser.Role.SUPER_ADMIN)
+        self.assertEqual(permissions.get_access(self.user.pk)['role'], PlatformUser.Role.SUPER_ADMIN)
+        with self.captureOnCommitCallbacks() as callbacks:
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            User.objects.filter(pk=self.user.pk).update(first_name="Renamed")
+        self.assertEqual(len(callbacks), 1)
+
+    def test_shared_cache_survives_process_cache_loss(self):
+        permissions.get_access(self.user.pk)
+        permissions._local_access.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(permissions.get_access(self.user.pk)['role'], PlatformUser.Role.ANALYST)
+
+
+class ReferralCodeAllocatorTests(TestCase):
+    def test_permutation_is_collision_free(self):
+        codes = [referrals.encode(referrals.permute(n)) for n in range(5000)]
+        self.assertEqual(len(set(codes)), 5000)
+        self.assertTrue(all(len(code) == referrals.CODE_LENGTH for code in codes))
+
+    def test_batch_allocation_uses_constant_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            codes = referrals.allocate_referral_codes(1000)
+        self.assertLess(len(queries), 16)
+        self.assertEqual(len(set(codes)), 1000)
+        self.assertNotEqual(codes, referrals.allocate_referral_codes(1000))
+
+    def test_positions_map_back_from_codes(self):
+        for n in (0, 1, 12345, referrals.CODE_SPACE - 1):
+            self.assertEqual(referrals.position(referrals.encode(referrals.permute(n))), n)
+        self.assertIsNone(referrals.position("abc"))
+
+    def test_legacy_codes_are_reserved_once_and_skipped(self):
+        referrals.allocate_referral_codes(1)
+        legacy = [referrals.encode(referrals.permute(n)) for n in (2, 4)]
+        for i, code in enumerate(legacy + ["OLD-CODE"]):
+            user = User.objects.create_user(email=f"legacy{i}@example.com", password="secret")
+            BuyerUser.objects.create(user=user, referral_code=code)
+        self.assertEqual(referrals.reserve_stored_codes(), 2)
+
+        codes = referrals.allocate_referral_codes(3)
+        self.assertEqual(codes, [referrals.encode(referrals.permute(n)) for n in (1, 3, 5)])
+        # Past the reservations the allocator no longer reads them.
+        with CaptureQueriesContext(connection) as queries:
+            referrals.allocate_referral_codes(1)
+        self.assertFalse([q for q in queries if 'reservedreferralcode' in q['sql']])
+
+    def test_buyer_save_allocates_only_when_the_code_is_written(self):
+        user = User.objects.create_user(email="saver@example.com", password="secret")
+        buyer = BuyerUser.objects.create(user=user)
+        self.assertTrue(buyer.referral_code)
+        BuyerUser.objects.filter(pk=buyer.pk).update(referral_code=None)
+        buyer.referral_code = None
+        buyer.update_tier()
+        self.assertIsNone(buyer.referral_code)
+        self.assertIsNone(BuyerUser.objects.get(pk=buyer.pk).referral_code)
+
+    def test_backfill_assigns_codes_to_bulk_created_buyers(self):
+        users = [User.objects.create_user(email=f"bulk{i}@example.com", password="x") for i in range(3)]
+        BuyerUser.objects.bulk_create([BuyerUser(user=user) for user in users])
+        self.assertEqual(referrals.backfill_referral_codes(batch_size=2), 3)
+        self.assertFalse(BuyerUser.objects.filter(referral_code__isnull=True).exists())
+
+
+class TierRecalculationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        values = [0, 4999, 5000, 12000, 25000, 75000, 60000]
+        for i, value in enumerate(values):
+            user = User.objects.create_user(email=f"tier{i}@example.com", password="x")
+            BuyerUser.objects.create(user=user, lifetime_value=value, tier=BuyerUser.Tier.STANDARD)
+        BuyerUser.objects.filter(lifetime_value=60000).update(tier=BuyerUser.Tier.VIP)
+
+    def test_only_mismatched_rows_change(self):
+        transitions = tiers.recalculate_tiers(batch_size=1)
+        self.assertEqual(transitions, {
+            (BuyerUser.Tier.STANDARD, BuyerUser.Tier.SILVER): 1,
+            (BuyerUser.Tier.STANDARD, BuyerUser.Tier.GOLD): 1,
+            (BuyerUser.Tier.STANDARD, BuyerUser.Tier.PLATINUM): 1,
+            (BuyerUser.Tier.STANDARD, BuyerUser.Tier.VIP): 1,
+        })
+        for buyer in BuyerUser.objects.all():
+            self.assertEqual(buyer.tier, tiers.tier_for(buyer.lifetime_value))
+        self.assertEqual(tiers.recalculate_tiers(), {})
+
+    def test_dry_run_writes_nothing(self):
+        self.assertEqual(sum(tiers.recalculate_tiers(dry_run=True).values()), 4)
+        self.assertEqual(BuyerUser.objects.filter(tier=BuyerUser.Tier.STANDARD).count(), 6)
+
+
+class LoyaltyLedgerTests(TestCase):
+    def setUp(self):
+        self.buyers = []
+        for i in range(3):
+            user = User.objects.create_user(email=f"loyal{i}@example.com", password="x")
+            self.buyers.append(BuyerUser.objects.create(user=user))
+
+    def test_earn_and_redeem_update_counters_and_ledger(self):
+        buyer = self.buyers[0]
+        self.assertEqual(buyer.add_loyalty_points(100, "order #1"), 100)
+        self.assertEqual(buyer.redeem_loyalty_points(30, "checkout"), 70)
+        buyer.refresh_from_db()
+        self.assertEqual((buyer.loyalty_points_earned, buyer.loyalty_points_redeemed), (100, 30))
+        self.assertEqual(buyer.loyalty_transactions.count(), 2)
+        with self.assertRaises(loyalty.InsufficientPoints):
+            buyer.redeem_loyalty_points(71)
+        self.assertEqual(buyer.loyalty_transactions.count(), 2)
+
+    def test_updates_from_stale_instances_are_not_lost(self):
+        first = BuyerUser.objects.get(pk=self.buyers[0].pk)
+        second = BuyerUser.objects.get(pk=self.buyers[0].pk)
+        first.add_loyalty_points(10)
+        second.add_loyalty_points(5)
+        self.assertEqual(BuyerUser.objects.get(pk=self.buyers[0].pk).loyalty_points, 15)
+
+    def test_batch_posting_and_reconciliation(self):
+        entries = [(b.pk, 10, "promo") for b in self.buyers] + [(self.buyers[0].pk, 5, "bonus")]
+        self.assertEqual(loyalty.post_earned_points_batch(entries, batch_size=2), 4)
+        self.assertEqual(
+            list(BuyerUser.objects.order_by('pk').values_list('loyalty_points', flat=True)),
+            [15, 10, 10],
+        )
+        self.assertEqual(loyalty.reconcile_balances(), [])
+
+        BuyerUser.objects.filter(pk=self.buyers[1].pk).update(loyalty_points=999)
+        drift = loyalty.reconcile_balances(fix=True)
+        self.assertEqual([d[0] for d in drift], [self.buyers[1].pk])
+        self.assertEqual(loyalty.reconcile_balances(), [])
+
+    def test_reconciliation_keeps_postings_made_after_its_read(self):
+        loyalty.post_earned_points_batch([(b.pk, 10, "promo") for b in self.buyers])
+        BuyerUser.objects.filter(pk=self.buyers[1].pk).update(loyalty_points=999)
+        ledger_totals = loyalty._ledger_totals
+
+        def read_then_post(first_pk, last_pk):
+            totals = ledger_totals(first_pk, last_pk)
+            self.buyers[1].add_loyalty_points(7, "late")
+            return totals
+
+        with mock.patch.object(loyalty, '_ledger_totals', read_then_post):
+            loyalty.reconcile_balances(fix=True)
+        self.assertEqual(BuyerUser.objects.get(pk=self.buyers[1].pk).loyalty_points, 17)
+        self.assertEqual(loyalty.reconcile_balances(), [])
+
+    def test_compaction_preserves_totals(self):
+        buyer = self.buyers[0]
+        for _ in range(4):
+            buyer.add_loyalty_points(10)
+        buyer.redeem_loyalty_points(5)
+        removed = loyalty.compact_ledger(timezone.now() + timedelta(seconds=1))
+        self.assertEqual(removed, 3)
+        self.assertEqual(buyer.loyalty_transactions.count(), 2)
+        self.assertEqual(loyalty.reconcile_balances(), [])
+
+
+class OrderPlacedTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(email="orders@example.com", password="x")
+        self.buyer = BuyerUser.objects.create(user=user)
+
+    def test_order_work_is_queued_and_applied_by_the_worker(self):
+        now = timezone.now()
+        tasks.order_placed(self.buyer, Decimal('4000.00'), "A-1", points=40, placed_at=now)
+        tasks.order_placed(self.buyer, Decimal('2000.50'), "A-2", placed_at=now - timedelta(days=3))
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.order_count, 0)
+
+        self.assertEqual(queue.work([tasks.ORDER_QUEUE], burst=True), 4)
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.order_count, 2)
+        self.assertEqual(self.buyer.lifetime_value, Decimal('6000.50'))
+        self.assertEqual(self.buyer.average_order_value, Decimal('3000.25'))
+        # The older order arrived last but still counts as the first one.
+        self.assertEqual(self.buyer.first_order_date, now - timedelta(days=3))
+        self.assertEqual(self.buyer.last_order_date, now)
+        self.assertEqual(self.buyer.tier, BuyerUser.Tier.SILVER)
+        self.assertEqual(self.buyer.loyalty_points, 40)
+        self.assertEqual([m.subject for m in mail.outbox], ["Your AGPKART order A-1", "Your AGPKART order A-2"])
+
+    def test_events_are_applied_once_and_refunds_lower_the_average(self):
+        self.assertTrue(purchases.record_order(self.buyer.pk, "B-1", "300.00"))
+        self.assertFalse(purchases.record_order(self.buyer.pk, "B-1", "300.00"))
+        purchases.record_order(self.buyer.pk, "B-2", "100.00")
+        purchases.record_refund(self.buyer.pk, "R-1", "50.00")
+        self.buyer.refresh_from_db()
+        self.assertEqual(
+            (self.buyer.order_count, self.buyer.lifetime_value, self.buyer.average_order_value),
+            (2, Decimal('350.00'), Decimal('175.00')),
+        )
+        self.assertEqual(purchases.reconcile_metrics(), [])
+
+    def test_reconciliation_reports_and_fixes_drift_in_batches(self):
+        others = [
+            BuyerUser.objects.create(user=User.objects.create_user(email=f"drift{i}@example.com", password="x"))
+            for i in range(3)
+        ]
+        for i, buyer in enumerate([self.buyer, *others]):
+            purchases.record_order(buyer.pk, f"C-{i}", "6000.00")
+        OrderEvent.objects.create(buyer=others[1], kind=OrderEvent.Kind.PLACED, reference="C-lost", amount=100)
+        BuyerUser.objects.filter(pk=others[2].pk).update(order_count=7)
+
+        drift = purchases.reconcile_metrics(batch_size=2)
+        self.assertEqual([buyer_id for buyer_id, _, _ in drift], [others[1].pk, others[2].pk])
+        purchases.reconcile_metrics(batch_size=2, fix=True)
+        self.assertEqual(purchases.reconcile_metrics(), [])
+        buyer = BuyerUser.objects.get(pk=others[1].pk)
+        self.assertEqual((buyer.order_count, buyer.average_order_value), (2, Decimal('3050.00')))
+        self.assertEqual(buyer.tier, BuyerUser.Tier.SILVER)
+
+
+class ReferralTreeTests(TestCase):
+    def buyer(self, name, referred_by=None):
+        user = User.objects.create_user(email=f"{name}@example.com", password="x")
+        return BuyerUser.objects.create(user=user, referred_by=referred_by)
+
+    def setUp(self):
+        # a -> b -> c -> d, and a -> e
+        self.a = self.buyer("a")
+        self.b = self.buyer("b", self.a)
+        self.c = self.buyer("c", self.b)
+        self.d = self.buyer("d", self.c)
+        self.e = self.buyer("e", self.a)
+
+    def paths(self):
+        return set(ReferralPath.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def test_downline_and_upline_queries(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(referral_tree.downline_count(self.a.pk, max_depth=2), 3)
+        self.assertEqual(referral_tree.downline_by_depth(self.a.pk), {1: 2, 2: 1, 3: 1})
+        self.assertEqual(referral_tree.upline(self.d.pk), [self.c.pk, self.b.pk, self.a.pk])
+        self.assertEqual(referral_tree.downline_counts([self.a.pk, self.c.pk]), {self.a.pk: 4, self.c.pk: 1})
+        with self.assertNumQueries(1):
+            top = referral_tree.top_referrers(2, since=timezone.now() - timedelta(days=1))
+        self.assertEqual(top, [(self.a.pk, 2), (self.b.pk, 1)])
+
+    def test_reparenting_moves_the_whole_subtree(self):
+        built = self.paths()
+        self.c.referred_by = self.e
+        self.c.save()
+        self.assertEqual(referral_tree.upline(self.d.pk), [self.c.pk, self.e.pk, self.a.pk])
+        self.assertEqual(referral_tree.downline_count(self.b.pk), 0)
+        self.c.referred_by = None
+        self.c.save()
+        self.assertEqual(referral_tree.downline_count(self.a.pk), 2)
+        self.c.referred_by = self.b
+        self.c.save()
+        self.assertEqual(self.paths(), built)
+        with self.assertRaises(ValueError):
+            self.b.referred_by = self.d
+            self.b.save()
+        self.assertEqual(self.paths(), built)
+
+    def test_deleting_a_buyer_detaches_its_referrals(self):
+        self.b.user.delete()
+        self.assertEqual(referral_tree.downline_by_depth(self.a.pk), {1: 1})
+        self.assertEqual(referral_tree.upline(self.d.pk), [self.c.pk])
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        built = self.paths()
+        ReferralPath.objects.all().delete()
+        self.assertEqual(referral_tree.rebuild_tree(batch_size=2), len(built))
+        self.assertEqual(self.paths(), built)
+
+    def test_rebuild_stops_at_a_referral_cycle(self):
+        # Written around save(), which refuses cycles.
+        BuyerUser.objects.filter(pk=self.a.pk).update(referred_by=self.d)
+        with mock.patch.object(referral_tree, '_copy_level', wraps=referral_tree._copy_level) as copy_level:
+            referral_tree.rebuild_tree()
+        # Depth 5 only repeats pairs already stored, which ends the rebuild there.
+        self.assertEqual(copy_level.call_count, 5)
+        self.assertEqual(ReferralPath.objects.filter(ancestor=self.a, descendant=self.d).count(), 1)
+
+
+class AddressDefaultTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="home@example.com", password="x")
+
+    def make(self, **kwargs):
+        fields = dict(
+            user=self.user, full_name="A B", phone_number="+919876543210",
+            address_line_1="1 Road", city="Pune", state="MH", postal_code="411001",
+        )
+        fields.update(kwargs)
+        return Address(**fields)
+
+    def test_saving_a_new_default_demotes_the_old_one(self):
+        first = self.make(is_default=True)
+        first.save()
+        second = self.make(is_default=True, city="Mumbai")
+        second.save()
+        first.refresh_from_db()
+        self.assertFalse(first.is_default)
+        with CaptureQueriesContext(connection) as queries:
+            second.save()
+        writes = [q['sql'] for q in queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(len(writes), 1)
+
+    def test_constraint_rejects_a_second_default(self):
+        self.make(is_default=True).save()
+        other = self.make()
+        other.save()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Address.objects.filter(pk=other.pk).update(is_default=True)
+
+    def test_bulk_upsert_keeps_one_default_per_type(self):
+        existing = self.make(is_default=True)
+        existing.save()
+        other = User.objects.create_user(email="work@example.com", password="x")
+        batch = [
+            self.make(is_default=True, city="Delhi"),
+            self.make(is_default=True, city="Goa"),
+            self.make(user=other, is_default=True, address_type=Address.AddressType.WORK),
+        ]
+        existing.city = "Nagpur"
+        self.assertEqual(addresses.bulk_upsert_addresses([existing] + batch), (3, 1))
+        defaults = Address.objects.filter(is_default=True).values_list('user_id', 'city')
+        self.assertEqual(sorted(defaults), sorted([(self.user.pk, "Goa"), (other.pk, "Pune")]))
+        self.assertEqual(Address.objects.get(pk=existing.pk).city, "Nagpur")
+
+
+class PostalCodeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        postal_codes.load_postal_codes(postal_codes.read_postal_codes())
+
+    def test_prefix_completion_and_exact_lookup(self):
+        index = postal_codes.get_index()
+        self.assertEqual([code for code, _, _ in index.complete("4110")], ["411001", "411038"])
+        self.assertEqual(index.lookup(" 560 001"), ("Bengaluru", "Karnataka"))
+        self.assertIsNone(index.lookup("999999"))
+
+    def test_lookup_view_is_served_from_memory(self):
+        postal_codes.get_index()
+        with self.assertNumQueries(0):
+            response = self.client.get("/users/postal-codes/", {"q": "6000"})
+        self.assertEqual(
+            response.json()["results"][0],
+            {"postal_code": "600001", "city": "Chennai", "state": "Tamil Nadu"},
+        )
+
+    def test_unknown_countries_are_rejected_without_an_index(self):
+        postal_codes.get_index()
+        with self.assertNumQueries(0):
+            response = self.client.get("/users/postal-codes/", {"q": "6000", "country": "Atlantis"})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("Atlantis", postal_codes._indexes)
+
+    def test_reload_refreshes_the_index(self):
+        postal_codes.get_index()
+        postal_codes.load_postal_codes([PostalCode(postal_code="999999", city="Test", state="Nowhere")])
+        self.assertEqual(postal_codes.get_index().lookup("999999"), ("Test", "Nowhere"))
+
+    def test_validator_fixes_mismatched_addresses(self):
+        user = User.objects.create_user(email="pin@example.com", password="x")
+        common = dict(user=user, full_name="A", phone_number="+919876543210", address_line_1="1")
+        good = Address.objects.create(city="Pune", state="Maharashtra", postal_code="411001", **common)
+        bad = Address.objects.create(city="Bombay", state="MH", postal_code="400 001", **common)
+        Address.objects.create(city="X", state="Y", postal_code="000000", **common)
+        stats = postal_codes.validate_addresses(fix=True, batch_size=2)
+        self.assertEqual(stats, {'checked': 3, 'unknown': 1, 'mismatched': 1, 'fixed': 1})
+        bad.refresh_from_db()
+        self.assertEqual((bad.postal_code, bad.city, bad.state), ("400001", "Mumbai", "Maharashtra"))
+        good.refresh_from_db()
+        self.assertEqual(good.city, "Pune")
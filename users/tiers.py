@@ -0,0 +1,83 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, When, Value
+from django.utils import timezone
+
+from users.models import BuyerUser
+
+# Lowest lifetime value for each tier, highest tier first.
+TIER_THRESHOLDS = (
+    (Decimal('50000'), BuyerUser.Tier.VIP),
+    (Decimal('20000'), BuyerUser.Tier.PLATINUM),
+    (Decimal('10000'), BuyerUser.Tier.GOLD),
+    (Decimal('5000'), BuyerUser.Tier.SILVER),
+    (Decimal('0'), BuyerUser.Tier.STANDARD),
+)
+
+TIER_BATCH_SIZE = 5000
+
+
+def tier_for(lifetime_value):
+    """Return the tier a buyer with this lifetime value belongs in."""
+    for threshold, tier in TIER_THRESHOLDS:
+        if lifetime_value >= threshold:
+            return tier
+    return BuyerUser.Tier.STANDARD
+
+
+def tier_case():
+    """SQL CASE expression computing the tier from lifetime_value."""
+    return Case(
+        *[When(lifetime_value__gte=threshold, then=Value(tier)) for threshold, tier in TIER_THRESHOLDS[:-1]],
+        default=Value(BuyerUser.Tier.STANDARD),
+    )
+
+
+def tier_bands():
+    """Yield (tier, lower bound, upper bound) for each tier; open ends are None."""
+    upper = None
+    for threshold, tier in TIER_THRESHOLDS:
+        lower = threshold if tier != BuyerUser.Tier.STANDARD else None
+        yield tier, lower, upper
+        upper = threshold
+
+
+def recalculate_tiers(queryset=None, batch_size=TIER_BATCH_SIZE, dry_run=False):
+    """
+    Bring every buyer's tier in line with their lifetime value.
+
+    Each tier band is a range scan on the lifetime_value index restricted to
+    rows whose stored tier differs, so buyers already in the right tier are
+    never read or written. Mismatched rows are fixed in bounded batches with
+    a single UPDATE ... SET tier = CASE ... per batch.
+
+    Returns a Counter of (old tier, new tier) transitions.
+    """
+    if queryset is None:
+        queryset = BuyerUser.objects.all()
+    queryset = queryset.order_by()
+    transitions = Counter()
+
+    for tier, lower, upper in tier_bands():
+        band = queryset.exclude(tier=tier)
+        if lower is not None:
+            band = band.filter(lifetime_value__gte=lower)
+        if upper is not None:
+            band = band.filter(lifetime_value__lt=upper)
+        last_pk = None
+        while True:
+            page = band if last_pk is None else band.filter(pk__gt=last_pk)
+            rows = list(page.order_by('pk').values_list('pk', 'tier')[:batch_size])
+            if not rows:
+                break
+            transitions.update((old, tier) for _, old in rows)
+            if not dry_run:
+                # Same band, bounded to this batch's primary key range.
+                with transaction.atomic():
+                    page.filter(pk__lte=rows[-1][0]).update(
+                        tier=tier_case(), updated_at=timezone.now(),
+                    )
+            last_pk = rows[-1][0]
+    return transitions
@@ -1,6 +1,9 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
+from django.http import JsonResponse
 from users.models import User
+from cart.services import merge_carts
+from users.postal_codes import DEFAULT_COUNTRY, UnknownCountry, get_index
 from django.contrib.auth import authenticate, login, logout
 
 def user_register_view(request):
@@ -13,9 +16,28 @@ def user_login_view(request):
         pswd = data.get("psw")
         user = authenticate(request, username=usern, password=pswd)
         if user is not None:
+            # login() rotates the session key, so note the anonymous cart's first.
+            session_key = request.session.session_key
             login(request, user)
+            merge_carts(session_key, user)
     return render(request, "users/user_login.html")
 
 def user_logout_view(request):
     logout(request)
-    return redirect("/users/login/")
\ No newline at end of file
+    return redirect("/users/login/")
+
+def postal_code_lookup_view(request):
+    """Autocomplete postal codes: ?q=<prefix> returns matching city/state pairs."""
+    try:
+        limit = min(int(request.GET.get("limit", 10)), 50)
+    except ValueError:
+        limit = 10
+    try:
+        index = get_index(request.GET.get("country") or DEFAULT_COUNTRY)
+    except UnknownCountry as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    results = [
+        {"postal_code": code, "city": city, "state": state}
+        for code, city, state in index.complete(request.GET.get("q", ""), limit)
+    ]
+    return JsonResponse({"results": results})